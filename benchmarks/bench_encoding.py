@@ -0,0 +1,74 @@
+"""Bytes y milisegundos de la imagen del mapa según formato y esfuerzo de codificación.
+
+Compara el PNG RGB que se enviaba antes con el PNG indexado (paleta exacta)
+y WebP sin pérdida de map_encode, con cada esfuerzo, sobre el mapa actual y
+uno sintético de 5 000 casas con colores por estado y una casa seleccionada.
+
+Uso: python benchmarks/bench_encoding.py [num_casas ...]
+"""
+import io
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from PIL import ImageFont
+
+from benchmarks.synthetic import synthetic_dataset
+from map_data import load_residencial, parse_residencial
+from map_encode import EFFORTS, FORMATS, encode_image, webp_available
+from map_layout import compile_layout
+from map_render import ESTADO_COLORS, HOUSE_COLOR, draw_selection, render_base_layer
+
+WIDTH = 1050
+REPEAT = 5
+
+
+def timed(func):
+    """(mediana en ms, resultado) de varias ejecuciones"""
+    samples = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        result = func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), result
+
+
+def rgb_png(image):
+    output = io.BytesIO()
+    image.save(output, format='PNG')
+    return output.getvalue()
+
+
+def main():
+    sizes = [int(n) for n in sys.argv[1:]] or [None, 5000]
+    font = ImageFont.load_default()
+    formats = [name for name in FORMATS if name != 'webp' or webp_available()]
+    print(f"{'casas':>7} {'formato':>8} {'esfuerzo':>12} {'bytes':>8} {'ms':>7}")
+    for size in sizes:
+        if size is None:
+            data = load_residencial(os.path.join(ROOT, 'houses_data.json'))
+        else:
+            data = parse_residencial(synthetic_dataset(size))
+        table = compile_layout(data.condominios, data.layout, data.bounds)
+        colors = [ESTADO_COLORS.get(data.houses[house_id].estado, HOUSE_COLOR) if house_id in data.houses
+                  else HOUSE_COLOR for house_id in table.ids]
+        height = round(WIDTH * data.bounds[1] / data.bounds[0])
+        base = render_base_layer(data.areas, data.condominios, data.calles, table, WIDTH, height, font,
+                                 house_colors=colors)
+        image = draw_selection(base, table, table.ids[len(table) // 2], font)
+        label = len(table)
+
+        ms, content = timed(lambda: rgb_png(image))
+        print(f"{label:>7} {'png rgb':>8} {'(antes)':>12} {len(content):>8} {ms:>7.1f}")
+        for format in formats:
+            for effort in EFFORTS:
+                ms, content = timed(lambda: encode_image(image, format, effort))
+                print(f"{label:>7} {format:>8} {effort:>12} {len(content):>8} {ms:>7.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Exportación de un residencial sintético con map_export: tiempo y memoria.
+
+Cada medición es un proceso aparte que exporta el mapa completo por franjas
+(PNG y PDF) o las hojas por condominio. La memoria es el pico de RSS del
+proceso principal y, aparte, el del proceso del pool que más usó; la columna
+"imagen" es lo que ocuparía el mapa completo en RGB, que el export nunca
+tiene entero en memoria.
+
+Uso: python benchmarks/bench_export.py [num_casas ...] [--width N] [--workers N]
+"""
+import argparse
+import json
+import math
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import synthetic_dataset
+
+# Lienzo del residencial de 2 000 casas; los sintéticos crecen en superficie con la misma densidad
+SOURCE_WIDTH, SOURCE_HEIGHT = 1500, 900
+
+
+def child(argv):
+    """Exportar con map_export.main en este proceso; imprime el pico de memoria como JSON"""
+    import map_export
+    map_export.main(argv)
+    print(json.dumps({'principal': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                      'pool': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024}))
+
+
+def run(directory, argv):
+    env = dict(os.environ, RESIDENCIALES_DIR=directory, RESIDENCIAL_DB=os.path.join(directory, 'houses.db'))
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, __file__, '--hijo', *argv], check=True, capture_output=True,
+                            text=True, env=env, cwd=directory).stdout
+    return time.perf_counter() - start, json.loads(output.splitlines()[-1])
+
+
+def main():
+    if sys.argv[1:2] == ['--hijo']:
+        child(sys.argv[2:])
+        return
+
+    parser = argparse.ArgumentParser(description="Medir la exportación de mapas y hojas")
+    parser.add_argument('sizes', nargs='*', type=int, default=[2000, 20000])
+    parser.add_argument('--width', type=int, default=16000, help="ancho del mapa completo (16000)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    print(f"{'casas':>7} {'salida':>10} {'tamaño':>13} {'tiempo (s)':>10} {'principal (MB)':>14} "
+          f"{'pool (MB)':>9} {'imagen (MB)':>11} {'archivo (MB)':>12}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            factor = math.sqrt(size / 2000)
+            bounds = (round(SOURCE_WIDTH * factor), round(SOURCE_HEIGHT * factor))
+            with open(os.path.join(directory, 'sintetico.json'), 'w', encoding='utf-8') as file:
+                json.dump(synthetic_dataset(size, bounds=bounds), file, ensure_ascii=False)
+            height = round(args.width * bounds[1] / bounds[0])
+            output = os.path.join(directory, 'exports')
+            common = ['sintetico', '--output', output, '--workers', str(args.workers)]
+            cases = [('mapa png', ['--no-sheets', '--width', str(args.width), '--format', 'png'], 'mapa.png'),
+                     ('mapa pdf', ['--no-sheets', '--width', str(args.width), '--format', 'pdf'], 'mapa.pdf'),
+                     ('hojas pdf', ['--sheets-only', '--format', 'pdf'], 'condominios')]
+            for label, argv, name in cases:
+                seconds, memory = run(directory, common + argv)
+                path = os.path.join(output, 'sintetico', name)
+                if os.path.isdir(path):
+                    files = [os.path.join(path, filename) for filename in os.listdir(path)]
+                    megabytes = sum(os.path.getsize(file) for file in files) / 2**20
+                    shape = f"{len(files)} hojas"
+                    image = 0
+                else:
+                    megabytes = os.path.getsize(path) / 2**20
+                    shape = f"{args.width}x{height}"
+                    image = args.width * height * 3 / 2**20
+                print(f"{size:>7} {label:>10} {shape:>13} {seconds:>10.1f} {memory['principal']:>14.0f} "
+                      f"{memory['pool']:>9.0f} {image:>11.0f} {megabytes:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
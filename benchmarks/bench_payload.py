@@ -0,0 +1,98 @@
+"""Bytes enviados al navegador por interacción en el flujo de selectbox del panel.
+
+Compara la imagen en base64 dentro del HTML (antes) con la URL por hash de
+contenido servida desde app/static (después) y con el modo SVG, donde cada
+clic solo cambia el id de la casa resaltada.
+
+Uso: python benchmarks/bench_payload.py [casas_por_condominio]
+"""
+import base64
+import os
+import re
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from streamlit.testing.v1 import AppTest
+
+from residencial_map_web import STATIC_DIR
+
+
+def static_file(url):
+    return os.path.join(STATIC_DIR, url.split('/')[-1].split('?')[0])
+
+
+def map_html(at):
+    for element in at.main:
+        if getattr(element.proto, 'srcdoc', None):
+            return element.proto.srcdoc
+    return ''
+
+
+def walk_selections(at, houses_per_condo):
+    """Recorrer condominios y casas con los selectbox y devolver el HTML del mapa de cada interacción"""
+    pages = []
+    for condo_index in range(len(at.selectbox[0].options)):
+        for house_index in range(houses_per_condo):
+            # Se fijan ambos selectbox por índice en cada rerun (como el navegador)
+            at.selectbox[0].select_index(condo_index)
+            at.selectbox[1].select_index(0)
+            at.run()
+            if house_index >= len(at.selectbox[1].options):
+                break
+            at.selectbox[0].select_index(condo_index)
+            at.selectbox[1].select_index(house_index)
+            at.run()
+            pages.append(map_html(at))
+    return pages
+
+
+def referenced_bytes(pages):
+    """HTML de cada interacción más cada archivo estático la primera vez que aparece (caché fría)"""
+    total = 0
+    seen_urls = set()
+    for html in pages:
+        total += len(html.encode('utf-8'))
+        for static_url in re.findall(r'app/static/[^"]+', html):
+            if static_url not in seen_urls:
+                total += os.path.getsize(static_file(static_url))
+                seen_urls.add(static_url)
+    return total, total - sum(os.path.getsize(static_file(u)) for u in seen_urls)
+
+
+def main():
+    houses_per_condo = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    os.chdir(ROOT)
+    at = AppTest.from_file(os.path.join(ROOT, 'residencial_map_web.py'), default_timeout=60)
+    at.run()
+
+    pages = walk_selections(at, houses_per_condo)
+    inline_total = 0
+    for html in pages:
+        url = html.split('<img src="', 1)[1].split('"', 1)[0]
+        with open(static_file(url), 'rb') as file:
+            png = file.read()
+        # Antes: la imagen viajaba dentro del HTML en cada rerun
+        data_uri = "data:image/png;base64," + base64.b64encode(png).decode()
+        inline_total += len(html.replace(url, data_uri).encode('utf-8'))
+
+    # Después: HTML con URLs más cada archivo estático solo si el navegador no lo tiene en caché;
+    # al repetir el recorrido todas las imágenes ya están en la caché del navegador
+    referenced_total, repeat_total = referenced_bytes(pages)
+
+    # Modo SVG: el mapa vectorial se descarga una vez y la selección viaja como id
+    at.radio[0].set_value("Vectorial (SVG)")
+    svg_total, svg_repeat_total = referenced_bytes(walk_selections(at, houses_per_condo))
+
+    interactions = len(pages)
+    print(f"interacciones: {interactions}")
+    print(f"base64 en línea:      {inline_total / interactions:10.0f} bytes/interacción")
+    print(f"URL por hash (frío):  {referenced_total / interactions:10.0f} bytes/interacción")
+    print(f"URL por hash (caché): {repeat_total / interactions:10.0f} bytes/interacción")
+    print(f"SVG (frío):           {svg_total / interactions:10.0f} bytes/interacción")
+    print(f"SVG (caché):          {svg_repeat_total / interactions:10.0f} bytes/interacción")
+
+
+if __name__ == '__main__':
+    main()
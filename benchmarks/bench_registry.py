@@ -0,0 +1,113 @@
+"""Memoria y tiempo al cambiar entre muchos residenciales con la caché acotada de map_cache.
+
+Abrir un residencial es lo que hace una sesión la primera vez: leer sus datos,
+compilar la tabla de casas, dibujar la capa base y construir el índice de
+búsqueda. Cambiar a uno visitado hace poco debe ser un acierto de la caché, y
+la memoria debe quedarse en el presupuesto aunque crezca el número de residenciales.
+
+Uso: python benchmarks/bench_registry.py [casas_por_residencial] [presupuesto_MB]
+"""
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from PIL import ImageFont
+
+from benchmarks.synthetic import synthetic_dataset
+from map_cache import memory_cached, shared_cache
+from map_layout import compile_layout
+from map_live import LiveMap
+from map_occupancy import build_counters
+from map_registry import ResidencialRegistry
+from map_render import render_base_layer
+from map_search import build_search_index
+
+COUNTS = (4, 16, 64)
+WIDTH, HEIGHT = 1050, 630
+FONT = ImageFont.load_default()
+
+
+def rss_mb():
+    """Memoria residente actual del proceso (Linux) o, si no se puede leer, la máxima"""
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+@memory_cached
+def get_table(data_version, _data):
+    return compile_layout(_data.condominios, _data.layout, _data.bounds)
+
+
+@memory_cached
+def get_live_map(residencial_id, data_version, _data):
+    table = get_table(data_version, _data)
+    return LiveMap(residencial_id, table, build_counters(_data.houses), None)
+
+
+@memory_cached
+def get_search_index(residencial_id, data_version, _data):
+    return build_search_index(_data.houses, _data.condominios)
+
+
+def open_residencial(registry, residencial_id):
+    """Lo que necesita una sesión para mostrar un residencial (como el panel web, sin Streamlit)"""
+    data = registry.load(residencial_id)
+    table = get_table(data.version, data)
+    live = get_live_map(residencial_id, data.version, data)
+    live.base_layer(WIDTH, HEIGHT, lambda colors, clip=None: render_base_layer(
+        data.areas, data.condominios, data.calles, table, WIDTH, HEIGHT, FONT, house_colors=colors, clip=clip))
+    get_search_index(residencial_id, data.version, data)
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    budget_mb = float(sys.argv[2]) if len(sys.argv) > 2 else 64
+    cache = shared_cache()
+    cache.max_bytes = int(budget_mb * 2**20)
+
+    print(f"{size} casas por residencial, presupuesto de la caché {budget_mb:.0f} MB")
+    print(f"{'residenciales':>13} {'abrir (ms)':>11} {'cambiar (ms)':>13} {'caché (MB)':>11} "
+          f"{'desalojos':>10} {'RSS (MB)':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in COUNTS:
+            cache.clear()
+            evictions = cache.evictions
+            registry = ResidencialRegistry()
+            for n in range(count):
+                path = os.path.join(tmp, f"residencial_{n}.json")
+                if not os.path.exists(path):
+                    with open(path, 'w', encoding='utf-8') as file:
+                        json.dump(synthetic_dataset(size, seed=n), file, ensure_ascii=False)
+                registry.register(f"residencial_{n}", path, db_path=':memory:')
+
+            # Primera visita a cada uno: carga completa
+            opened = []
+            for residencial_id in registry:
+                start = time.perf_counter()
+                open_residencial(registry, residencial_id)
+                opened.append((time.perf_counter() - start) * 1000)
+
+            # Ir y volver entre el último visitado y el anterior: los dos siguen en la caché
+            ids = list(registry)[-2:]
+            switched = []
+            for i in range(50):
+                start = time.perf_counter()
+                open_residencial(registry, ids[i % len(ids)])
+                switched.append((time.perf_counter() - start) * 1000)
+
+            print(f"{count:>13} {statistics.median(opened):>11.1f} {statistics.median(switched):>13.3f} "
+                  f"{cache.bytes / 2**20:>11.1f} {cache.evictions - evictions:>10} {rss_mb():>9.0f}")
+
+
+if __name__ == '__main__':
+    main()
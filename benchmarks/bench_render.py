@@ -0,0 +1,76 @@
+"""Tiempo de render del mapa: casas dibujadas una por una con ImageDraw frente al lote NumPy.
+
+Uso: python benchmarks/bench_render.py [num_casas ...]
+"""
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from PIL import Image, ImageDraw, ImageFont
+
+from benchmarks.synthetic import synthetic_dataset
+from map_data import load_residencial, parse_residencial
+from map_layout import compile_layout
+from map_render import (SOURCE_WIDTH, SOURCE_HEIGHT, HOUSE_COLOR, canvas_to_image, draw_house, draw_labels_batch,
+                        fill_rects, new_canvas, render_base_layer)
+from map_sprites import SPRITES
+
+WIDTH = 1050
+HEIGHT = 630
+REPEAT = 7
+
+
+def timed(func):
+    """Mediana en milisegundos de varias ejecuciones (la primera calienta cachés)"""
+    func()
+    samples = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def houses_per_call(table, rects, font):
+    img = Image.new('RGB', (WIDTH, HEIGHT), 'white')
+    draw = ImageDraw.Draw(img)
+    for i in range(len(table)):
+        draw_house(draw, rects[4 * i:4 * i + 4], table.labels[i], font)
+
+
+def houses_batch(table, rects, font):
+    canvas = new_canvas(WIDTH, HEIGHT)
+    fill_rects(canvas, rects, HOUSE_COLOR)
+    draw_labels_batch(canvas, rects, table.labels, font)
+    canvas_to_image(canvas)
+
+
+def main():
+    sizes = [int(n) for n in sys.argv[1:]] or [None, 1000, 5000]
+    font = ImageFont.load_default()
+    print(f"{'casas':>7} {'por casa (ms)':>14} {'lote (ms)':>10} {'mapa completo (ms)':>19}")
+    for size in sizes:
+        if size is None:
+            data = load_residencial(os.path.join(ROOT, 'houses_data.json'))
+        else:
+            data = parse_residencial(synthetic_dataset(size))
+        table = compile_layout(data.condominios, data.layout)
+        rects = table.scaled_rects(WIDTH / SOURCE_WIDTH, HEIGHT / SOURCE_HEIGHT)
+
+        per_call = timed(lambda: houses_per_call(table, rects, font))
+        batch = timed(lambda: houses_batch(table, rects, font))
+        full = timed(lambda: render_base_layer(data.areas, data.condominios, data.calles,
+                                               table, WIDTH, HEIGHT, font))
+        print(f"{len(table):>7} {per_call:>14.2f} {batch:>10.2f} {full:>19.2f}")
+
+    stats = SPRITES.stats()
+    print(f"caché de etiquetas: {stats['hits']} aciertos, {stats['misses']} fallos, "
+          f"{stats['entries']} entradas ({stats['hit_rate']:.0%})")
+
+
+if __name__ == '__main__':
+    main()
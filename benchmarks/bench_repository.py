@@ -0,0 +1,69 @@
+"""Consultas filtradas y escrituras concurrentes del repositorio SQLite de casas.
+
+Uso: python benchmarks/bench_repository.py [num_casas ...]
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import synthetic_dataset
+from map_data import ESTADOS, parse_residencial
+from map_repository import HouseRepository
+
+REPEAT = 5
+WRITERS = 4
+WRITES_PER_WRITER = 50
+BATCH = 20
+
+
+def timed(func):
+    """Mediana en milisegundos de varias ejecuciones"""
+    samples = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    sizes = [int(n) for n in sys.argv[1:]] or [1000, 10000, 50000]
+    print(f"{'casas':>7} {'importar (ms)':>14} {'estado (ms)':>12} {'propietario (ms)':>17} "
+          f"{'tamaño+estado (ms)':>19} {f'{WRITERS} hilos x {WRITES_PER_WRITER} lotes (ms)':>26}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            residencial = parse_residencial(synthetic_dataset(size), version=str(size))
+            repository = HouseRepository(os.path.join(tmp, f"{size}.db"), pool_size=WRITERS)
+            start = time.perf_counter()
+            repository.import_residencial(residencial)
+            import_ms = (time.perf_counter() - start) * 1000
+            keys = sorted(residencial.houses)
+
+            estado_ms = timed(lambda: repository.find(estado='Reservada', limit=100))
+            propietario_ms = timed(lambda: repository.find(propietario='Propietario 19', limit=100))
+            combined_ms = timed(lambda: repository.find(estado='Disponible', tamano='90m²', limit=100))
+
+            # Sesiones que cambian estados a la vez: cada lote es una transacción
+            def writer(seed):
+                rng = random.Random(seed)
+                for _ in range(WRITES_PER_WRITER):
+                    repository.set_estados((rng.choice(keys), rng.choice(ESTADOS)) for _ in range(BATCH))
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(WRITERS) as pool:
+                list(pool.map(writer, range(WRITERS)))
+            write_ms = (time.perf_counter() - start) * 1000
+            repository.close()
+            print(f"{size:>7} {import_ms:>14.1f} {estado_ms:>12.2f} {propietario_ms:>17.2f} "
+                  f"{combined_ms:>19.2f} {write_ms:>26.1f}")
+
+
+if __name__ == '__main__':
+    main()
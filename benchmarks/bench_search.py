@@ -0,0 +1,70 @@
+"""Latencia del cuadro de búsqueda: construir el índice y consultar letra por letra.
+
+Uso: python benchmarks/bench_search.py [num_casas]
+"""
+import dataclasses
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import synthetic_dataset
+from map_data import parse_residencial
+from map_search import build_search_index
+
+TYPED_QUERIES = 200
+UPDATES = 1000
+
+
+def percentile(samples, fraction):
+    return sorted(samples)[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    residencial = parse_residencial(synthetic_dataset(size))
+    keys = sorted(residencial.houses)
+    rng = random.Random(0)
+
+    start = time.perf_counter()
+    index = build_search_index(residencial.houses, residencial.condominios)
+    build_ms = (time.perf_counter() - start) * 1000
+    print(f"{size} casas, {len(index.vocabulary)} palabras: índice construido en {build_ms:.0f} ms")
+
+    # Consultas como las escribe una persona: cada prefijo del texto es una búsqueda
+    texts = {
+        'clave': [rng.choice(keys) for _ in range(TYPED_QUERIES)],
+        'propietario': [residencial.houses[rng.choice(keys)].propietario for _ in range(TYPED_QUERIES)],
+        'dirección': [residencial.houses[rng.choice(keys)].direccion for _ in range(TYPED_QUERIES)],
+        # Palabras en otro orden: la calle y el número de la casa, sin el resto de la dirección
+        'calle+casa': [' '.join(residencial.houses[k].direccion.split(',')[0].split()[1:] + [k.split('-')[-1]])
+                       for k in (rng.choice(keys) for _ in range(TYPED_QUERIES))],
+    }
+    print(f"{'consulta':>12} {'búsquedas':>10} {'p50 (µs)':>9} {'p99 (µs)':>9} {'máx (µs)':>9}")
+    for name, values in texts.items():
+        samples = []
+        for text in values:
+            for end in range(1, len(text) + 1):
+                start = time.perf_counter()
+                index.search(text[:end])
+                samples.append((time.perf_counter() - start) * 1e6)
+        print(f"{name:>12} {len(samples):>10} {statistics.median(samples):>9.0f} "
+              f"{percentile(samples, 0.99):>9.0f} {max(samples):>9.0f}")
+
+    # Ediciones: reindexar una casa con otro propietario
+    samples = []
+    for i in range(UPDATES):
+        key = rng.choice(keys)
+        house = dataclasses.replace(residencial.houses[key], propietario=f"Propietario editado {i}")
+        start = time.perf_counter()
+        index.update(key, house)
+        samples.append((time.perf_counter() - start) * 1e6)
+    print(f"actualizar una casa: p50 {statistics.median(samples):.0f} µs, p99 {percentile(samples, 0.99):.0f} µs")
+
+
+if __name__ == '__main__':
+    main()
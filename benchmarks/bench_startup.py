@@ -0,0 +1,126 @@
+"""Tiempo hasta el primer mapa en un proceso nuevo, con y sin el paquete de map_bundle.
+
+Cada medición es un proceso de Python aparte (intérprete, imports y cachés
+vacías), como al arrancar una de las interfaces:
+
+- web: leer los datos y obtener los bytes de la imagen sin selección
+  (dibujar la capa base y codificarla, o leerla del paquete);
+- tk: leer los datos, la tabla de casas y las teselas que llenan la ventana
+  en el nivel inicial (dibujadas, o recortadas de la capa del paquete); sin
+  paquete incluye también el índice espacial, que con paquete se arma
+  después del primer cuadro.
+
+La columna total cuenta el proceso completo; la de pasos, solo lo que hace el
+proceso después de los imports.
+
+Uso: python benchmarks/bench_startup.py [num_casas ...]
+"""
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import synthetic_dataset
+
+# Lienzo del residencial de 2 000 casas; los sintéticos crecen en superficie con la misma densidad
+SOURCE_WIDTH, SOURCE_HEIGHT = 1500, 900
+REPEAT = 3
+
+
+def child(mode, path, assets, tiles):
+    """Pasos de un arranque en este proceso; imprime sus ms como JSON"""
+    start = time.perf_counter()
+    from map_bundle import DESKTOP_VIEW, WEB_WIDTH, load_bundle
+    from map_data import load_residencial
+    from map_encode import encode_image
+    from map_layout import compile_layout
+    from map_occupancy import build_counters, house_estados
+    from map_render import ESTADO_COLORS, HOUSE_COLOR, render_base_layer
+    from map_sprites import map_font
+    from map_tiles import TilePyramid, fit_zoom
+    imports = time.perf_counter()
+
+    font = map_font()
+    data = load_residencial(path)
+    bundle = load_bundle('bench', data.version, font, assets) if assets else None
+    if bundle is not None:
+        table = bundle.table(data.condominios, data.layout, data.bounds)
+    else:
+        table = compile_layout(data.condominios, data.layout, data.bounds)
+    colors = [ESTADO_COLORS.get(estado, HOUSE_COLOR) for estado in house_estados(table, build_counters(data.houses))]
+
+    def render(width, height, colors, clip=None):
+        layer = bundle.layer(width, height, colors, clip) if bundle is not None else None
+        if layer is None:
+            layer = render_base_layer(data.areas, data.condominios, data.calles, table, width, height, font,
+                                      house_colors=colors, clip=clip)
+        return layer
+
+    if mode == 'web':
+        width, height = WEB_WIDTH, round(WEB_WIDTH * data.bounds[1] / data.bounds[0])
+        content = bundle.encoded(width, height, colors, 'webp') if bundle is not None else None
+        if content is None:
+            content = encode_image(render(width, height, colors), 'webp')
+    else:
+        if bundle is None:
+            from map_index import build_index
+            from map_viewport import ViewportLayout
+            ViewportLayout(data.condominios, table, build_index(data.areas, data.condominios, data.calles, table))
+        pyramid = TilePyramid('bench', data.version, table, render, colors, tiles)
+        zoom = fit_zoom(data.bounds, *DESKTOP_VIEW)
+        for x, y in pyramid.visible_tiles(zoom, 0, 0, *DESKTOP_VIEW):
+            pyramid.tile(zoom, x, y)
+    print(json.dumps({'imports': (imports - start) * 1000, 'pasos': (time.perf_counter() - imports) * 1000}))
+
+
+def run(mode, path, assets):
+    with tempfile.TemporaryDirectory() as tiles:
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, __file__, '--hijo', mode, path, assets or '', tiles],
+                                check=True, capture_output=True, text=True).stdout
+        total = (time.perf_counter() - start) * 1000
+    return total, json.loads(output.splitlines()[-1])
+
+
+def main():
+    if sys.argv[1:2] == ['--hijo']:
+        mode, path, assets, tiles = sys.argv[2:6]
+        child(mode, path, assets, tiles)
+        return
+
+    from map_bundle import build_bundle, bundle_path, default_sizes, save_bundle
+    from map_data import load_residencial
+    from map_occupancy import build_counters
+    from map_sprites import map_font
+
+    sizes = [int(arg) for arg in sys.argv[1:]] or [2000, 20000, 100000]
+    print(f"{'casas':>7} {'interfaz':>8} {'paquete':>7} {'total (ms)':>10} {'imports (ms)':>12} {'pasos (ms)':>10} "
+          f"{'paquete (MB)':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            factor = math.sqrt(size / 2000)
+            bounds = (round(SOURCE_WIDTH * factor), round(SOURCE_HEIGHT * factor))
+            path = os.path.join(directory, f'bench_{size}.json')
+            with open(path, 'w', encoding='utf-8') as file:
+                json.dump(synthetic_dataset(size, bounds=bounds), file, ensure_ascii=False)
+            assets = os.path.join(directory, f'assets_{size}')
+            data = load_residencial(path)
+            save_bundle(bundle_path('bench', assets),
+                        build_bundle(data, build_counters(data.houses), map_font(), default_sizes(data.bounds)))
+            megabytes = os.path.getsize(bundle_path('bench', assets)) / 2**20
+            for mode in ('web', 'tk'):
+                for label, bundle_dir in (('no', None), ('sí', assets)):
+                    samples = sorted((run(mode, path, bundle_dir) for _ in range(REPEAT)), key=lambda s: s[0])
+                    total, steps = samples[len(samples) // 2]
+                    print(f"{size:>7} {mode:>8} {label:>7} {total:>10.0f} {steps['imports']:>12.0f} "
+                          f"{steps['pasos']:>10.0f} {megabytes if bundle_dir else 0:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
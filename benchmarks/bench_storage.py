@@ -0,0 +1,70 @@
+"""Tiempo de carga: houses_data.json (json + modelos) frente al formato binario .rmap de map_store.
+
+Uso: python benchmarks/bench_storage.py [num_casas ...]
+"""
+import hashlib
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import synthetic_dataset
+from map_data import parse_residencial
+from map_store import load_store, write_store
+
+REPEAT = 5
+LOOKUPS = 100
+
+
+def timed(func):
+    """Mediana en milisegundos de varias ejecuciones (la primera calienta la caché de páginas)"""
+    func()
+    samples = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def load_json(path):
+    with open(path, 'rb') as file:
+        raw = file.read()
+    return parse_residencial(json.loads(raw.decode('utf-8')), hashlib.sha1(raw).hexdigest())
+
+
+def main():
+    sizes = [int(n) for n in sys.argv[1:]] or [1000, 10000, 50000]
+    print(f"{'casas':>7} {'JSON (MB)':>10} {'.rmap (MB)':>11} {'JSON (ms)':>10} "
+          f"{'.rmap (ms)':>11} {f'.rmap + {LOOKUPS} casas (ms)':>24}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            data = synthetic_dataset(size)
+            json_path = os.path.join(tmp, f"{size}.json")
+            store_path = os.path.join(tmp, f"{size}.rmap")
+            # Mismo formato que houses_data.json: indentado con 2 espacios
+            with open(json_path, 'w', encoding='utf-8') as file:
+                json.dump(data, file, indent=2, ensure_ascii=False)
+            write_store(parse_residencial(data), store_path)
+            keys = random.Random(0).sample(sorted(data['houses']), min(LOOKUPS, len(data['houses'])))
+
+            def open_and_lookup():
+                houses = load_store(store_path).houses
+                for key in keys:
+                    houses[key]
+
+            json_ms = timed(lambda: load_json(json_path))
+            store_ms = timed(lambda: load_store(store_path))
+            lookup_ms = timed(open_and_lookup)
+            print(f"{size:>7} {os.path.getsize(json_path) / 1e6:>10.1f} {os.path.getsize(store_path) / 1e6:>11.1f} "
+                  f"{json_ms:>10.1f} {store_ms:>11.2f} {lookup_ms:>24.2f}")
+
+
+if __name__ == '__main__':
+    main()
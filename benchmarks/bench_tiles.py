@@ -0,0 +1,97 @@
+"""Costo de una vista de teselas frente al de dibujar el residencial completo.
+
+Los residenciales crecen en superficie con la misma densidad de casas que el
+de 2 000 (lienzo de 1500x900), así que la vista de 1050x630 en el nivel más
+detallado siempre abarca más o menos las mismas casas. Con teselas el costo
+de abrir esa vista, moverse o repintar tras un cambio de estado debe seguir a
+la vista; la capa completa del mismo nivel crece con el residencial. Preparar
+un nivel (geometría escalada y etiquetas de calles) se hace una vez por nivel
+y versión de datos.
+
+Uso: python benchmarks/bench_tiles.py [num_casas ...]
+"""
+import math
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from PIL import ImageFont
+
+from benchmarks.synthetic import synthetic_dataset
+from map_data import parse_residencial
+from map_labels import place_street_labels
+from map_layout import compile_layout
+from map_render import ESTADO_COLORS, HOUSE_COLOR, SOURCE_WIDTH, SOURCE_HEIGHT, render_base_layer
+from map_tiles import TilePyramid
+
+WIDTH, HEIGHT = 1050, 630
+# Hasta este tamaño (en píxeles) se dibuja también la capa completa del nivel para comparar
+FULL_LIMIT = 8192 * 8192
+
+
+def milliseconds(func):
+    start = time.perf_counter()
+    result = func()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [2000, 20000, 100000]
+    font = ImageFont.load_default()
+    print(f"{'casas':>7} {'nivel':>5} {'preparar nivel (ms)':>19} {'teselas':>7} {'vista fría (ms)':>15} "
+          f"{'vista en caché (ms)':>19} {'mover (ms)':>10} {'cambio (ms)':>11} {'capa completa (ms)':>18}")
+    for size in sizes:
+        factor = math.sqrt(size / 2000)
+        bounds = (round(SOURCE_WIDTH * factor), round(SOURCE_HEIGHT * factor))
+        data = parse_residencial(synthetic_dataset(size, bounds=bounds))
+        table = compile_layout(data.condominios, data.layout, data.bounds)
+        colors = [ESTADO_COLORS.get(data.houses[house_id].estado, HOUSE_COLOR) if house_id in data.houses
+                  else HOUSE_COLOR for house_id in table.ids]
+        labels = {}
+
+        def render(width, height, colors, clip=None):
+            if (width, height) not in labels:
+                labels[(width, height)] = place_street_labels(data.calles, font, *table.scale(width, height))
+            return render_base_layer(data.areas, data.condominios, data.calles, table, width, height, font,
+                                     street_labels=labels[(width, height)], house_colors=colors, clip=clip)
+
+        with tempfile.TemporaryDirectory() as directory:
+            pyramid = TilePyramid('bench', data.version, table, render, colors, directory)
+            zoom = pyramid.max_zoom
+            width, height = pyramid.level_size(zoom)
+            left, top = (width - WIDTH) // 2, (height - HEIGHT) // 2
+
+            def view(left, top):
+                tiles = pyramid.visible_tiles(zoom, left, top, left + WIDTH, top + HEIGHT)
+                return [pyramid.tile(zoom, x, y) for x, y in tiles]
+
+            # Una vez por nivel y versión de datos: geometría escalada y colocación de etiquetas de calles
+            prepare, _ = milliseconds(lambda: (table.scaled_layout(*table.scale(width, height)),
+                                               render(width, height, colors, clip=(0, 0, 1, 1))))
+            cold, tiles = milliseconds(lambda: view(left, top))
+            warm, _ = milliseconds(lambda: view(left, top))
+            moved, _ = milliseconds(lambda: view(left + WIDTH // 2, top))
+
+            # Cambio de estado de la casa más cercana al centro de la vista
+            rects = pyramid._house_rects(zoom)
+            distance = (abs((rects[:, 0] + rects[:, 2]) // 2 - (left + WIDTH // 2)) +
+                        abs((rects[:, 1] + rects[:, 3]) // 2 - (top + HEIGHT // 2)))
+            index = int(distance.argmin())
+            colors[index] = ESTADO_COLORS['Ocupada'] if colors[index] != ESTADO_COLORS['Ocupada'] else HOUSE_COLOR
+
+            def change():
+                pyramid.invalidate(index)
+                return view(left, top)
+            changed, _ = milliseconds(change)
+
+            full = f"{milliseconds(lambda: render(width, height, colors))[0]:.0f}" if width * height <= FULL_LIMIT else '-'
+        print(f"{size:>7} {zoom:>5} {prepare:>19.0f} {len(tiles):>7} {cold:>15.0f} {warm:>19.2f} {moved:>10.0f} {changed:>11.0f} "
+              f"{full:>18}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Trabajo por cuadro de la vista de Tk: qué texto va encima de las teselas al desplazarse.
+
+Para residenciales que crecen en superficie con la misma densidad de casas,
+mide la consulta de cada cuadro (nombres de condominio visibles o detalle de
+las casas visibles, según el nivel) mientras la vista de 1200x800 recorre el
+mapa. Los items del canvas que se crean o se mueven son tantos como los que
+reporta la columna de items, así que con tiempos e items planos el cuadro no
+depende del número de casas. No necesita pantalla.
+
+Uso: python benchmarks/bench_viewport.py [num_casas ...]
+"""
+import math
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import synthetic_dataset
+from map_data import parse_residencial
+from map_index import build_index
+from map_layout import compile_layout
+from map_render import SOURCE_WIDTH, SOURCE_HEIGHT
+from map_tiles import level_size, max_zoom
+from map_viewport import ViewportLayout, detail_text
+
+WIDTH, HEIGHT = 1200, 800
+FRAMES = 60
+# Lado del lienzo respecto al sintético de bench_tiles: casas más anchas, como las de houses_data.json,
+# para que el nivel más detallado muestre el detalle por casa
+SPREAD = 3
+
+
+def frame(viewport, records, condominios, scale_x, scale_y, region):
+    """Lo que calcula ResidencialMap.update_overlay para una vista"""
+    labels = viewport.condo_labels(scale_x, scale_y, *region)
+    items = {condo_id: (x, y, condominios[condo_id].descripcion) for condo_id, (x, y) in labels.items()}
+    for house_id, (x0, y0, x1, y1) in viewport.houses(scale_x, scale_y, *region).items():
+        items[house_id] = ((x0 + x1) / 2, y1 - 2, detail_text(records[house_id], x1 - x0))
+    return items
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [2000, 20000, 100000]
+    print(f"{'casas':>7} {'nivel':>5} {'detalle':>8} {'cuadro (ms)':>12} {'p95 (ms)':>9} {'items':>6}")
+    for size in sizes:
+        factor = SPREAD * math.sqrt(size / 2000)
+        data = parse_residencial(synthetic_dataset(
+            size, bounds=(round(SOURCE_WIDTH * factor), round(SOURCE_HEIGHT * factor))))
+        table = compile_layout(data.condominios, data.layout, data.bounds)
+        viewport = ViewportLayout(data.condominios, table, build_index(data.areas, data.condominios, data.calles, table))
+        deepest = max_zoom(data.bounds)
+        for zoom in (deepest - 3, deepest):
+            width, height = level_size(data.bounds, zoom)
+            scale_x, scale_y = table.scale(width, height)
+            table.scaled_layout(scale_x, scale_y)
+            samples = []
+            items = 0
+            # La vista avanza en diagonal por el centro del nivel, un tercio de pantalla por cuadro
+            for n in range(FRAMES):
+                left = (width / 2 + (n - FRAMES / 2) * WIDTH / 3) % max(width - WIDTH, 1)
+                top = (height / 2 + (n - FRAMES / 2) * HEIGHT / 3) % max(height - HEIGHT, 1)
+                start = time.perf_counter()
+                shown = frame(viewport, data.houses, data.condominios, scale_x, scale_y,
+                              (left, top, left + WIDTH, top + HEIGHT))
+                samples.append((time.perf_counter() - start) * 1000)
+                items = max(items, len(shown))
+            samples.sort()
+            print(f"{size:>7} {zoom:>5} {'sí' if viewport.house_detail(scale_x) else 'no':>8} "
+                  f"{statistics.median(samples):>12.2f} {samples[int(len(samples) * 0.95)]:>9.2f} {items:>6}")
+
+
+if __name__ == '__main__':
+    main()
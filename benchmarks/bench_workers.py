@@ -0,0 +1,98 @@
+"""Latencia de la imagen del mapa con muchas sesiones a la vez: en el hilo de cada sesión o en el pool.
+
+Cada usuario simulado es un hilo que pide la imagen del mapa con una casa
+seleccionada al mismo tiempo que los demás; las selecciones se reparten entre
+unas pocas casas populares, como cuando varias personas miran la misma. En el
+hilo, cada pedido compone y codifica su PNG mientras los demás esperan el GIL.
+Con RenderService la codificación va a los procesos del pool y los pedidos de
+la misma casa comparten un solo futuro (columna codificaciones). La primera
+ronda con el pool arranca sus procesos y no se cuenta.
+
+Uso: python benchmarks/bench_workers.py [num_usuarios ...]
+"""
+import os
+import random
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from PIL import ImageFont
+
+from map_data import load_residencial
+from map_encode import encode_image
+from map_layout import compile_layout
+from map_render import draw_selection, render_base_layer
+from map_workers import RenderService
+
+WIDTH, HEIGHT = 1050, 630
+# Casas distintas entre las que eligen los usuarios
+POPULAR = 10
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(int(len(samples) * fraction), len(samples) - 1)]
+
+
+def concurrent(users, request):
+    """Latencias (ms) de users pedidos lanzados a la vez"""
+    barrier = threading.Barrier(users)
+    latencies = [0.0] * users
+
+    def user(n):
+        barrier.wait()
+        start = time.perf_counter()
+        request(n)
+        latencies[n] = (time.perf_counter() - start) * 1000
+
+    threads = [threading.Thread(target=user, args=(n,)) for n in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1, 10, 50, 100]
+    font = ImageFont.load_default()
+    data = load_residencial(os.path.join(ROOT, 'houses_data.json'))
+    table = compile_layout(data.condominios, data.layout, data.bounds)
+    base = render_base_layer(data.areas, data.condominios, data.calles, table, WIDTH, HEIGHT, font)
+    houses = random.Random(0).sample(list(table.ids), POPULAR)
+
+    service = RenderService()
+    service.submit('calentar', encode_image, base).result()
+    print(f"procesos del pool: {service.workers}")
+    print(f"{'usuarios':>8} {'modo':>6} {'p50 (ms)':>9} {'p99 (ms)':>9} {'total (ms)':>11} {'codificaciones':>14}")
+    for users in sizes:
+        selections = [houses[n % POPULAR] for n in range(users)]
+
+        def inline(n):
+            encode_image(draw_selection(base, table, selections[n], font))
+
+        encodes = set()
+
+        def pooled(n):
+            key = (users, selections[n])
+            future = service.get(key)
+            if future is None:
+                encodes.add(key)
+                future = service.submit(key, encode_image, draw_selection(base, table, selections[n], font))
+            future.result()
+
+        for mode, request in (('hilo', inline), ('pool', pooled)):
+            start = time.perf_counter()
+            latencies = concurrent(users, request)
+            total = (time.perf_counter() - start) * 1000
+            count = users if mode == 'hilo' else len(encodes)
+            print(f"{users:>8} {mode:>6} {percentile(latencies, 0.5):>9.0f} {percentile(latencies, 0.99):>9.0f} "
+                  f"{total:>11.0f} {count:>14}")
+    service.shutdown()
+
+
+if __name__ == '__main__':
+    main()
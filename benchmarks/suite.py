@@ -0,0 +1,180 @@
+"""Suite de rendimiento del camino de datos y de dibujo, etapa por etapa, con resultados en JSON.
+
+Para cada tamaño genera un residencial sintético (benchmarks/synthetic.py) y
+mide por separado lo que hace un rerun del mapa: leer, decodificar y validar
+el JSON (load_house_data; la validación de map_schema también aparte),
+compilar la tabla de casas, colocar las etiquetas de
+calles, dibujar la capa base y componer la selección (draw_map), codificar la
+imagen (PNG RGB + base64 como antes, PNG indexado y WebP de map_encode),
+construir el índice espacial y resolver clics (hit-test). De cada etapa
+guarda la mediana y el mínimo en ms y el pico de memoria de Python y NumPy
+(tracemalloc, en una ejecución aparte para no alterar los tiempos).
+
+Los resultados se escriben en benchmarks/results/ con la fecha en el nombre
+(o en --output); --compare anterior.json agrega el cociente contra otra
+corrida para ver regresiones.
+
+Uso: python benchmarks/suite.py [num_casas ...] [--repeat N] [--output archivo.json] [--compare anterior.json]
+"""
+import argparse
+import base64
+import datetime
+import hashlib
+import io
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import PIL
+from PIL import ImageFont
+
+from benchmarks.synthetic import synthetic_dataset
+from map_encode import encode_image, webp_available
+from map_index import build_index
+from map_labels import place_street_labels
+from map_layout import compile_layout
+from map_render import ESTADO_COLORS, HOUSE_COLOR, draw_selection, render_base_layer
+from map_schema import check_geometry, normalize_residencial, validate_residencial
+
+SIZES = (10, 100, 1000, 5000, 10000, 50000)
+WIDTH = 1050
+REPEAT = 5
+# Clics simulados por medición de hit-test
+CLICKS = 1000
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+
+def measure(func, repeat):
+    """{'ms': mediana, 'min_ms': mínimo, 'pico_mb': pico de memoria} y el resultado de la última ejecución"""
+    func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        samples.append((time.perf_counter() - start) * 1000)
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'ms': round(statistics.median(samples), 3), 'min_ms': round(min(samples), 3),
+            'pico_mb': round(peak / 2**20, 2)}, result
+
+
+def stages(size, repeat, font):
+    """{etapa: medición} para un residencial sintético de size casas"""
+    raw = json.dumps(synthetic_dataset(size), indent=2, ensure_ascii=False).encode('utf-8')
+    results = {}
+
+    def run(name, func):
+        results[name], value = measure(func, repeat)
+        return value
+
+    data = run('carga', lambda: validate_residencial(json.loads(raw.decode('utf-8')), hashlib.sha1(raw).hexdigest()))
+    decoded = json.loads(raw.decode('utf-8'))
+    run('esquema', lambda: (normalize_residencial(decoded), check_geometry(data)))
+    height = round(WIDTH * data.bounds[1] / data.bounds[0])
+
+    def layout():
+        table = compile_layout(data.condominios, data.layout, data.bounds)
+        table.scaled_layout(*table.scale(WIDTH, height))
+        return table
+    table = run('tabla', layout)
+    scale = table.scale(WIDTH, height)
+    table.scaled_layout(*scale)
+    colors = [ESTADO_COLORS.get(data.houses[house_id].estado, HOUSE_COLOR) if house_id in data.houses
+              else HOUSE_COLOR for house_id in table.ids]
+
+    labels = run('etiquetas', lambda: place_street_labels(data.calles, font, *scale))
+    base = run('capa base', lambda: render_base_layer(data.areas, data.condominios, data.calles, table, WIDTH, height,
+                                                      font, street_labels=labels, house_colors=colors))
+    selected = table.ids[len(table) // 2]
+    image = run('selección', lambda: draw_selection(base, table, selected, font))
+
+    def png_base64():
+        output = io.BytesIO()
+        image.save(output, format='PNG')
+        return base64.b64encode(output.getvalue())
+    content = run('png+base64', png_base64)
+    results['png+base64']['bytes'] = len(content)
+    content = run('png indexado', lambda: encode_image(image, 'png'))
+    results['png indexado']['bytes'] = len(content)
+    if webp_available():
+        content = run('webp', lambda: encode_image(image, 'webp'))
+        results['webp']['bytes'] = len(content)
+
+    index = run('índice', lambda: build_index(data.areas, data.condominios, data.calles, table, *scale))
+    rng = random.Random(0)
+    clicks = [(rng.uniform(0, WIDTH), rng.uniform(0, height)) for _ in range(CLICKS)]
+    run('hit-test', lambda: [index.hit(x, y) for x, y in clicks])
+    return results
+
+
+def compare(current, previous):
+    """Cociente ms actual / ms anterior por (casas, etapa)"""
+    before = {(run['casas'], stage): value['ms'] for run in previous['resultados']
+              for stage, value in run['etapas'].items()}
+    return {(run['casas'], stage): value['ms'] / before[(run['casas'], stage)]
+            for run in current['resultados'] for stage, value in run['etapas'].items()
+            if before.get((run['casas'], stage))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Suite de rendimiento por etapas")
+    parser.add_argument('sizes', nargs='*', type=int, help=f"casas (por omisión {', '.join(map(str, SIZES))})")
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('--output', help="archivo JSON de resultados")
+    parser.add_argument('--compare', help="resultados anteriores para comparar")
+    args = parser.parse_args()
+
+    font = ImageFont.load_default()
+    report = {
+        'fecha': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pillow': PIL.__version__,
+        'plataforma': platform.platform(),
+        'ancho': WIDTH,
+        'repeticiones': args.repeat,
+        'clics': CLICKS,
+        'resultados': [],
+    }
+    for size in args.sizes or SIZES:
+        report['resultados'].append({'casas': size, 'etapas': stages(size, args.repeat, font)})
+    # ru_maxrss está en KB en Linux
+    report['rss_max_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+    ratios = {}
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            ratios = compare(report, json.load(file))
+
+    print(f"{'casas':>7} {'etapa':>13} {'ms':>9} {'mín (ms)':>9} {'pico (MB)':>10} {'bytes':>8}"
+          + (f" {'vs anterior':>12}" if args.compare else ''))
+    for run in report['resultados']:
+        for stage, value in run['etapas'].items():
+            ratio = ratios.get((run['casas'], stage))
+            print(f"{run['casas']:>7} {stage:>13} {value['ms']:>9.2f} {value['min_ms']:>9.2f} {value['pico_mb']:>10.2f} "
+                  f"{value.get('bytes', ''):>8}" + (f" {f'{ratio:.2f}x' if ratio else '-':>12}" if args.compare else ''))
+    print(f"memoria máxima del proceso: {report['rss_max_mb']} MB")
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"suite-{datetime.datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2, ensure_ascii=False)
+    print(f"resultados: {output}")
+
+
+if __name__ == '__main__':
+    main()
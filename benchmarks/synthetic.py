@@ -0,0 +1,113 @@
+"""Generador de residenciales sintéticos con el mismo esquema que houses_data.json.
+
+Uso: python benchmarks/synthetic.py num_casas salida.json [--seed N] [--bounds ANCHOxALTO]
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from map_data import ESTADOS
+from map_render import SOURCE_WIDTH, SOURCE_HEIGHT
+
+# Filas (o columnas) de casas de los condominios, en ciclo
+LINES = (1, 2, 1, 3)
+
+CALLES = ('ZAPOTE', 'JABIN', 'CHACA', 'CACAO', 'CHACTE', 'CAOBA', 'CEIBA', 'ROBLE', 'PINO', 'CEDRO')
+
+
+def synthetic_dataset(num_houses, houses_per_condo=40, street_width=30, seed=0, bounds=None):
+    """Residencial de num_houses casas repartidas en condominios dentro del lienzo de 1500x900.
+
+    Mezcla condominios horizontales y verticales (en damero donde la celda es
+    casi cuadrada) de una a tres filas/columnas, separados por una cuadrícula
+    de calles que crece con el residencial. bounds = (ancho, alto) usa otro lienzo.
+    """
+    rng = random.Random(seed)
+    width, height = bounds or (SOURCE_WIDTH, SOURCE_HEIGHT)
+    num_condos = max(1, math.ceil(num_houses / houses_per_condo))
+    cols = max(1, round(math.sqrt(num_condos * width / height)))
+    rows = math.ceil(num_condos / cols)
+    cell_width = width / cols
+    cell_height = height / rows
+    margin = street_width / 2
+
+    data = {'areas': {}, 'condominios': {}, 'calles': {}, 'houses': {}, 'layout': {}}
+    if bounds is not None:
+        data['bounds'] = list(bounds)
+    remaining = num_houses
+    for n in range(num_condos):
+        row, col = divmod(n, cols)
+        casas = min(houses_per_condo, remaining)
+        remaining -= casas
+        left = col * cell_width + margin
+        top = row * cell_height + margin
+        coords = [int(left), int(top), int(left + cell_width - 2 * margin), int(top + cell_height - 2 * margin)]
+        aspect = (coords[2] - coords[0]) / max(coords[3] - coords[1], 1)
+        horizontal = aspect >= 1.5 or (aspect > 2 / 3 and (row + col) % 2 == 0)
+        condo_id = f"sintetico_{n + 1}"
+        condo = {
+            'id': f"COND. SINTETICO {n + 1}",
+            'descripcion': f"Condominio Sintético {n + 1}",
+            'casas': casas,
+            'coords': coords,
+            'orientacion': "Horizontal" if horizontal else "Vertical",
+        }
+        lines = LINES[n % len(LINES)]
+        if lines > 1:
+            condo['filas' if horizontal else 'columnas'] = lines
+        data['condominios'][condo_id] = condo
+
+        for number in range(1, casas + 1):
+            house_id = f"{condo_id}-{number:02d}"
+            data['houses'][house_id] = {
+                'id': house_id,
+                'condominio': condo_id,
+                'direccion': f"Calle {rng.choice(CALLES).title()}, Cond. Sintético {n + 1}, Casa {number:02d}",
+                'propietario': rng.choice(('Por asignar', f"Propietario {rng.randrange(num_houses)}")),
+                'tamano': f"{rng.choice((90, 120, 150, 180))}m²",
+                'estado': rng.choice(ESTADOS),
+                'historial_pagos': [],
+                'deuda_actual': 0,
+            }
+
+    # Calles horizontales y verticales entre las celdas de la cuadrícula
+    for row in range(1, rows):
+        y = int(row * cell_height)
+        data['calles'][f"calle_h{row}"] = {
+            'id': f"CALLE {CALLES[row % len(CALLES)]} {row}", 'start': [0, y], 'end': [width, y],
+            'width': street_width,
+        }
+    for col in range(1, cols):
+        x = int(col * cell_width)
+        data['calles'][f"calle_v{col}"] = {
+            'id': f"CALLE {CALLES[col % len(CALLES)]} {col}", 'start': [x, 0], 'end': [x, height],
+            'width': street_width,
+        }
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generar un houses_data.json sintético")
+    parser.add_argument('casas', type=int)
+    parser.add_argument('salida')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--bounds', help="lienzo ANCHOxALTO (por omisión 1500x900)")
+    args = parser.parse_args()
+    bounds = tuple(int(v) for v in args.bounds.lower().split('x')) if args.bounds else None
+    data = synthetic_dataset(args.casas, seed=args.seed, bounds=bounds)
+    tmp_path = f"{args.salida}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(data, file, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, args.salida)
+    print(f"{args.salida}: {len(data['houses'])} casas, {len(data['condominios'])} condominios, "
+          f"{len(data['calles'])} calles")
+
+
+if __name__ == '__main__':
+    main()
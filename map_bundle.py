@@ -0,0 +1,267 @@
+"""Recursos precompilados del mapa, para que el primer mapa de cada interfaz sea leer un archivo.
+
+`python map_bundle.py` (el paso de build, al desplegar o después de editar los
+datos) guarda por residencial, en ASSETS_DIR/<id>.npz y para cada tamaño en
+que se muestra el mapa: la tabla de casas compilada con su geometría
+escalada, la colocación de las etiquetas de calles, la capa base dibujada con
+los estados de ese momento, la imagen sin selección ya codificada (PNG y
+WebP), el índice del navegador y los sprites de texto que se usaron.
+
+Al arrancar, load_bundle solo lo abre si es de la misma versión de datos,
+fuente y Pillow; si no, las interfaces dibujan como siempre. Las capas y las
+imágenes se usan solo donde las casas conservan los colores del build: una
+casa que cambió de estado después hace que esa parte se dibuje de nuevo.
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import PIL
+from PIL import Image
+
+from map_layout import HouseTable, compile_layout
+from map_sprites import SPRITES, font_key, map_font
+
+LOGGER = logging.getLogger(__name__)
+
+# Cambia cuando cambia lo que se guarda (por ejemplo, los textos del índice): los paquetes viejos se ignoran
+BUNDLE_FORMAT = 2
+
+ASSETS_DIR = os.environ.get('RESIDENCIAL_ASSETS', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets'))
+
+# Ancho del mapa de residencial_map_web.py y canvas de residencial_map.py: los tamaños que se precompilan
+WEB_WIDTH = 1050
+DESKTOP_VIEW = (1500, 900)
+
+
+def bundle_path(residencial_id, directory=ASSETS_DIR):
+    return os.path.join(directory, f"{residencial_id}.npz")
+
+
+def default_sizes(bounds):
+    """La imagen de la interfaz web y el nivel de teselas que llena la ventana de Tk"""
+    from map_tiles import fit_zoom, level_size
+    sizes = [(WEB_WIDTH, round(WEB_WIDTH * bounds[1] / bounds[0])),
+             level_size(bounds, fit_zoom(bounds, *DESKTOP_VIEW))]
+    return list(dict.fromkeys(sizes))
+
+
+class Bundle:
+    """Recursos de una versión de datos, ya leídos del archivo"""
+
+    def __init__(self, meta, arrays):
+        self.meta = meta
+        self.arrays = arrays
+        self.colors = arrays['colores']
+        self.sizes = {tuple(size['tamano']): i for i, size in enumerate(meta['tamanos'])}
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in self.arrays.values())
+
+    def table(self, condominios, overrides, bounds):
+        """Tabla de casas compilada, con la geometría de cada tamaño ya escalada"""
+        arrays = {name[len('tabla_'):]: array for name, array in self.arrays.items() if name.startswith('tabla_')}
+        return HouseTable.from_arrays(condominios, overrides, bounds, arrays)
+
+    def street_labels(self, width, height):
+        i = self.sizes.get((width, height))
+        if i is None:
+            return None
+        return {calle_id: tuple(placement) for calle_id, placement in self.meta['tamanos'][i]['calles'].items()}
+
+    def _unchanged(self, i, colors, clip=None):
+        # ¿Las casas que tocan clip (todas si es None) tienen los colores del build?
+        changed = np.asarray(colors, dtype=self.colors.dtype) != self.colors
+        if clip is not None:
+            left, top, right, bottom = clip
+            boxes = self.arrays[f'tabla_scaled_rects_{i}'].reshape(-1, 4)
+            changed &= ((boxes[:, 0] < right) & (boxes[:, 2] >= left) & (boxes[:, 1] < bottom) & (boxes[:, 3] >= top))
+        return not changed.any()
+
+    def layer(self, width, height, colors, clip=None):
+        """Ventana clip (o la capa completa) de la capa base, o None si no está o cambió alguna casa"""
+        i = self.sizes.get((width, height))
+        if i is None or len(colors) != len(self.colors) or not self._unchanged(i, colors, clip):
+            return None
+        layer = Image.fromarray(self.arrays[f'capa_{i}'])
+        return layer if clip is None else layer.crop(clip)
+
+    def encoded(self, width, height, colors, format, effort=None):
+        """Bytes de la imagen sin selección en ese formato (por omisión con IMAGE_EFFORT), o None si no
+        están o cambió alguna casa"""
+        if effort is None:
+            from map_encode import IMAGE_EFFORT
+            effort = IMAGE_EFFORT
+        i = self.sizes.get((width, height))
+        name = f'{format}_{i}'
+        if (i is None or name not in self.arrays or effort != self.meta['esfuerzo']
+                or len(colors) != len(self.colors) or not self._unchanged(i, colors)):
+            return None
+        return self.arrays[name].tobytes()
+
+    def client_index(self, width, height):
+        """Índice serializado para el navegador (map_index.to_client), o None"""
+        i = self.sizes.get((width, height))
+        return None if i is None else self.arrays[f'indice_{i}'].tobytes()
+
+
+def _sprite_arrays(font):
+    # Los sprites de la fuente en arrays concatenados; meta lleva la clave y dónde está cada uno
+    key = font_key(font)
+    entries, rgba, rows, cols, alpha = [], [], [], [], []
+    offsets = [0, 0]
+    for (kind, text, entry_font, angle, color, fraction_x, fraction_y), sprite in SPRITES.items():
+        if entry_font != key:
+            continue
+        if sprite is None:
+            place = None
+        elif kind == 'label':
+            image, (dx, dy) = sprite
+            pixels = np.asarray(image, dtype=np.uint8).reshape(-1)
+            place = [offsets[0], image.height, image.width, dx, dy]
+            rgba.append(pixels)
+            offsets[0] += len(pixels)
+        else:
+            glyph_rows, glyph_cols, glyph_alpha, bounds = sprite
+            place = [offsets[1], len(glyph_rows), *bounds]
+            rows.append(glyph_rows)
+            cols.append(glyph_cols)
+            alpha.append(glyph_alpha)
+            offsets[1] += len(glyph_rows)
+        entries.append([kind, text, angle, color, fraction_x, fraction_y, place])
+    return entries, {
+        'sprites_rgba': np.concatenate(rgba) if rgba else np.zeros(0, np.uint8),
+        'sprites_filas': np.concatenate(rows) if rows else np.zeros(0, np.int64),
+        'sprites_columnas': np.concatenate(cols) if cols else np.zeros(0, np.int64),
+        'sprites_alfa': np.concatenate(alpha) if alpha else np.zeros(0, np.uint8),
+    }
+
+
+def _load_sprites(entries, arrays, font):
+    key = font_key(font)
+    sprites = []
+    for kind, text, angle, color, fraction_x, fraction_y, place in entries:
+        sprite = None
+        if place is not None and kind == 'label':
+            offset, height, width, dx, dy = place
+            pixels = arrays['sprites_rgba'][offset:offset + height * width * 4].reshape(height, width, 4)
+            sprite = (Image.fromarray(pixels, 'RGBA'), (dx, dy))
+        elif place is not None:
+            offset, length, *bounds = place
+            window = slice(offset, offset + length)
+            sprite = (arrays['sprites_filas'][window], arrays['sprites_columnas'][window],
+                      arrays['sprites_alfa'][window], tuple(bounds))
+        sprites.append(((kind, text, key, angle, color, fraction_x, fraction_y), sprite))
+    SPRITES.update(sprites)
+
+
+def _stable_key(font):
+    key = font_key(font)
+    return isinstance(key, tuple) and all(isinstance(part, (str, int)) for part in key)
+
+
+def build_bundle(data, counters, font, sizes, effort=None):
+    """Arrays del paquete de data, con las casas pintadas según los estados de counters"""
+    from map_encode import FORMATS, IMAGE_EFFORT, encode_image, webp_available
+    from map_index import build_index
+    from map_labels import place_street_labels
+    from map_occupancy import house_estados
+    from map_render import ESTADO_COLORS, HOUSE_COLOR, render_base_layer
+
+    if effort is None:
+        effort = IMAGE_EFFORT
+    if not _stable_key(font):
+        raise ValueError("la fuente no tiene una clave estable para guardar sus sprites")
+    table = compile_layout(data.condominios, data.layout, data.bounds)
+    colors = [ESTADO_COLORS.get(estado, HOUSE_COLOR) for estado in house_estados(table, counters)]
+    formats = [format for format in FORMATS if format != 'webp' or webp_available()]
+    meta = {'formato': BUNDLE_FORMAT, 'version': data.version, 'pillow': PIL.__version__,
+            'fuente': list(font_key(font)), 'esfuerzo': effort, 'tamanos': []}
+    arrays = {'colores': np.array(colors, dtype=str)}
+    for i, (width, height) in enumerate(sizes):
+        scale = table.scale(width, height)
+        labels = place_street_labels(data.calles, font, *scale)
+        layer = render_base_layer(data.areas, data.condominios, data.calles, table, width, height, font,
+                                  street_labels=labels, house_colors=colors)
+        arrays[f'capa_{i}'] = np.asarray(layer, dtype=np.uint8)
+        for format in formats:
+            arrays[f'{format}_{i}'] = np.frombuffer(encode_image(layer, format, effort), dtype=np.uint8)
+        index = build_index(data.areas, data.condominios, data.calles, table, *scale)
+        content = json.dumps(index.to_client(), separators=(',', ':'), ensure_ascii=False)
+        arrays[f'indice_{i}'] = np.frombuffer(content.encode('utf-8'), dtype=np.uint8)
+        meta['tamanos'].append({'tamano': [width, height], 'calles': labels})
+    arrays.update({f'tabla_{name}': array for name, array
+                   in table.to_arrays([table.scale(width, height) for width, height in sizes]).items()})
+    meta['sprites'], sprite_arrays = _sprite_arrays(font)
+    arrays.update(sprite_arrays)
+    arrays['meta'] = np.frombuffer(json.dumps(meta, ensure_ascii=False).encode('utf-8'), dtype=np.uint8)
+    return arrays
+
+
+def save_bundle(path, arrays):
+    """Escribir el paquete sin compresión (se lee de una vez) con rename atómico"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as file:
+        np.savez(file, **arrays)
+    os.replace(tmp_path, path)
+
+
+def load_bundle(residencial_id, version, font, directory=ASSETS_DIR):
+    """Paquete del residencial si corresponde a version, font y este Pillow; None si no hay o no sirve"""
+    path = bundle_path(residencial_id, directory)
+    if not os.path.exists(path) or not _stable_key(font):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as archive:
+            meta = json.loads(archive['meta'].tobytes().decode('utf-8'))
+            if (meta.get('formato') != BUNDLE_FORMAT or meta.get('version') != version
+                    or meta.get('pillow') != PIL.__version__ or meta.get('fuente') != list(font_key(font))):
+                return None
+            arrays = {name: archive[name] for name in archive.files if name != 'meta'}
+    except (OSError, ValueError, KeyError) as error:
+        LOGGER.warning("Paquete de recursos ilegible (%s): %s", path, error)
+        return None
+    _load_sprites(meta['sprites'], arrays, font)
+    return Bundle(meta, arrays)
+
+
+def _size(value):
+    width, height = value.lower().split('x')
+    return int(width), int(height)
+
+
+def main():
+    from map_occupancy import build_counters
+    from map_registry import discover_registry
+
+    parser = argparse.ArgumentParser(description="Precompilar los recursos del mapa de cada residencial")
+    parser.add_argument('residenciales', nargs='*', help="ids del registro (por omisión, todos)")
+    parser.add_argument('--size', type=_size, action='append', metavar='ANCHOxALTO',
+                        help="tamaño a precompilar (por omisión, los de las dos interfaces)")
+    parser.add_argument('--dir', default=ASSETS_DIR, help=f"carpeta de salida (por omisión {ASSETS_DIR})")
+    args = parser.parse_args()
+
+    registry = discover_registry()
+    font = map_font()
+    for residencial_id in args.residenciales or list(registry):
+        start = time.perf_counter()
+        data = registry.load(residencial_id)
+        # Los colores salen de los estados actuales del repositorio, como al arrancar las interfaces
+        repository = registry.repository(residencial_id)
+        repository.sync_with(data)
+        counters = build_counters(dict(repository.find(limit=None)))
+        sizes = args.size or default_sizes(data.bounds)
+        path = bundle_path(residencial_id, args.dir)
+        save_bundle(path, build_bundle(data, counters, font, sizes))
+        print(f"{residencial_id}: {path} ({os.path.getsize(path) / 2**20:.1f} MB, "
+              f"{', '.join(f'{w}x{h}' for w, h in sizes)}) en {time.perf_counter() - start:.2f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+"""Caché LRU del proceso acotada por memoria, compartida por todas las sesiones y residenciales.
+
+Cada entrada se contabiliza con una estimación de sus bytes y, cuando el
+total pasa del presupuesto (RESIDENCIAL_CACHE_MB, 512 MB por omisión), se
+descartan las menos usadas. Así la memoria no crece con el número de
+residenciales: los que no se visitan salen de la caché y se vuelven a
+construir si alguien regresa a ellos.
+"""
+import functools
+import inspect
+import os
+import sys
+import threading
+from array import array
+from collections import OrderedDict, deque
+from collections.abc import Mapping
+from types import FunctionType, MethodType, ModuleType
+
+import numpy as np
+from PIL import Image
+
+from map_metrics import count
+
+CACHE_BYTES = int(float(os.environ.get('RESIDENCIAL_CACHE_MB', 512)) * 2**20)
+
+# Elementos de cada contenedor cuyo contenido se mide; el resto se extrapola
+SAMPLE = 32
+
+# Números: casi siempre compartidos (enteros pequeños, claves repetidas en índices), no se cuentan
+_SCALARS = (int, float, complex, bool, type(None))
+# Sin contenido aparte de su tamaño propio
+_LEAVES = (str, bytes, bytearray, array, np.ndarray, Image.Image)
+_OPAQUE = (type, ModuleType, FunctionType, MethodType, functools.partial)
+
+
+def _mapped(arr):
+    # Las vistas de un np.memmap son páginas del sistema compartidas, no memoria del proceso
+    while isinstance(arr, np.ndarray):
+        if isinstance(arr, np.memmap):
+            return True
+        arr = arr.base
+    return False
+
+
+def memory_size(value, sample=SAMPLE):
+    """Bytes aproximados de value y lo que contiene.
+
+    El tamaño propio de cada elemento de un contenedor se suma completo; lo
+    que cada elemento contiene a su vez se mide en una muestra de sample
+    elementos repartidos a lo largo del contenedor y se extrapola. Los objetos
+    pueden declarar su tamaño con un atributo nbytes (como los arrays).
+    """
+    # id -> objeto: se guarda la referencia porque un temporal liberado dejaría su id a otro
+    counted = {}
+    expanded = set()
+
+    def own(obj):
+        # Tamaño propio, solo la primera vez que aparece el objeto
+        if id(obj) in counted:
+            return 0
+        counted[id(obj)] = obj
+        if isinstance(obj, _SCALARS) or isinstance(obj, _OPAQUE) or callable(obj):
+            return 0
+        if isinstance(obj, np.ndarray):
+            return 0 if _mapped(obj) else obj.nbytes
+        if isinstance(obj, Image.Image):
+            return obj.width * obj.height * len(obj.getbands())
+        nbytes = getattr(obj, 'nbytes', None)
+        if isinstance(nbytes, int):
+            return nbytes
+        return sys.getsizeof(obj)
+
+    def contents(obj):
+        # Lo que obj contiene, sin su tamaño propio
+        if id(obj) in expanded or isinstance(obj, _SCALARS + _LEAVES + _OPAQUE) or callable(obj):
+            return 0
+        expanded.add(id(obj))
+        if isinstance(getattr(obj, 'nbytes', None), int):
+            return 0
+        extra = 0
+        if isinstance(obj, (list, tuple, set, frozenset, deque)):
+            items = zip(obj)
+        else:
+            if not isinstance(obj, Mapping):
+                fields = getattr(obj, '__dict__', None)
+                if fields is None:
+                    fields = {name: getattr(obj, name) for name in getattr(type(obj), '__slots__', ())
+                              if hasattr(obj, name)}
+                extra = sys.getsizeof(fields)
+                obj = fields
+            items = obj.items()
+        count = len(obj)
+        step = max(1, count // sample)
+        shallow = 0
+        deep = 0
+        sampled = 0
+        for position, item in enumerate(items):
+            shallow += sum(own(part) for part in item)
+            if position % step == 0 and sampled < sample:
+                deep += sum(contents(part) for part in item)
+                sampled += 1
+        return extra + shallow + (deep * count // sampled if sampled else 0)
+
+    return own(value) + contents(value)
+
+
+class MemoryLRU:
+    """Caché clave -> valor con presupuesto en bytes y desalojo del menos usado.
+
+    Los valores que exponen nbytes (por ejemplo LiveMap, que agrega capas) se
+    vuelven a medir en cada acceso; los demás se miden una vez al guardarlos.
+    La entrada más reciente se conserva aunque sola exceda el presupuesto.
+    """
+
+    def __init__(self, max_bytes=CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()   # clave -> [valor, bytes]
+        self._building = {}             # clave -> Lock de quien la está construyendo
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def _evict(self):
+        while self.bytes > self.max_bytes and len(self._entries) > 1:
+            value, nbytes = self._entries.popitem(last=False)[1]
+            self.bytes -= nbytes
+            self.evictions += 1
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        nbytes = getattr(entry[0], 'nbytes', None)
+        if isinstance(nbytes, int) and nbytes != entry[1]:
+            self.bytes += nbytes - entry[1]
+            entry[1] = nbytes
+            self._evict()
+        return entry
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, nbytes=None):
+        nbytes = memory_size(value) if nbytes is None else nbytes
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._entries[key] = [value, nbytes]
+            self.bytes += nbytes
+            self._evict()
+        return value
+
+    def get_or_create(self, key, factory):
+        """Valor de key, construido con factory() si falta; una sola construcción por clave a la vez"""
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+                building = self._building.setdefault(key, threading.Lock())
+        if entry is not None:
+            count('cache.aciertos')
+            return entry[0]
+        count('cache.fallos')
+        with building:
+            with self._lock:
+                entry = self._lookup(key)
+            if entry is not None:
+                return entry[0]
+            try:
+                return self.put(key, factory())
+            finally:
+                with self._lock:
+                    self._building.pop(key, None)
+
+    def discard(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.bytes -= entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        return {'entradas': len(self._entries), 'bytes': self.bytes, 'max_bytes': self.max_bytes,
+                'aciertos': self.hits, 'fallos': self.misses, 'desalojos': self.evictions}
+
+
+_shared = MemoryLRU()
+
+
+def shared_cache():
+    """Caché del proceso: la comparten las sesiones de Streamlit y todos los residenciales"""
+    return _shared
+
+
+def memory_cached(func):
+    """Como st.cache_resource, pero en la caché compartida y acotada por memoria.
+
+    Igual que en Streamlit, los parámetros que empiezan con _ no forman parte
+    de la clave. invalidate(*args) descarta la entrada de esos argumentos.
+    """
+    signature = inspect.signature(func)
+    names = [name for name in signature.parameters if not name.startswith('_')]
+    prefix = f"{func.__module__}.{func.__qualname__}"
+
+    def key_of(args, kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        return (prefix, *(bound.arguments[name] for name in names))
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return _shared.get_or_create(key_of(args, kwargs), lambda: func(*args, **kwargs))
+
+    wrapper.invalidate = lambda *args, **kwargs: _shared.discard(key_of(args, kwargs))
+    return wrapper
@@ -0,0 +1,219 @@
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping, Optional, Tuple
+
+from map_cache import shared_cache
+
+# Archivo de datos junto a los módulos, sin depender del directorio de trabajo; RESIDENCIAL_DATA
+# permite apuntar a otro archivo, por ejemplo al formato binario .rmap de map_store
+DATA_FILE = os.environ.get('RESIDENCIAL_DATA',
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), 'houses_data.json'))
+
+# Estados de una casa que ofrecen los paneles al editarla
+ESTADOS = ('Disponible', 'Ocupada', 'Reservada')
+
+# Lienzo de las coordenadas (ancho, alto) de un residencial cuyo JSON no trae 'bounds'
+DEFAULT_BOUNDS = (1500, 900)
+
+
+@dataclass(frozen=True)
+class Area:
+    id: str
+    tipo: str
+    descripcion: str
+    coords: Tuple[float, float, float, float]
+
+
+@dataclass(frozen=True)
+class Condominio:
+    id: str
+    descripcion: str
+    casas: int
+    coords: Tuple[float, float, float, float]
+    orientacion: str
+    filas: int = 1
+    columnas: int = 1
+    inicio_numeracion: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class Calle:
+    id: str
+    start: Tuple[float, float]
+    end: Tuple[float, float]
+    width: float = 30
+
+
+@dataclass(frozen=True)
+class House:
+    id: str
+    condominio: str
+    direccion: str
+    estado: str
+    propietario: Optional[str] = None
+    tamano: Optional[str] = None
+    historial_pagos: tuple = ()
+    deuda_actual: float = 0
+
+
+@dataclass(frozen=True)
+class Residencial:
+    """Contenido de houses_data.json, inmutable y compartido por todas las sesiones.
+
+    version es el SHA-1 de los bytes del archivo: cambia solo si cambia el contenido.
+    bounds es el lienzo (ancho, alto) sobre el que están todas las coordenadas.
+    """
+    version: str
+    houses: Mapping[str, House]
+    condominios: Mapping[str, Condominio]
+    areas: Mapping[str, Area]
+    calles: Mapping[str, Calle]
+    layout: Mapping[str, Tuple[float, float, float, float]]
+    bounds: Tuple[float, float] = DEFAULT_BOUNDS
+
+
+def _frozen(items):
+    return MappingProxyType(dict(items))
+
+
+def house_from_dict(house):
+    return House(
+        id=house['id'],
+        condominio=house['condominio'],
+        direccion=house['direccion'],
+        estado=house['estado'],
+        propietario=house.get('propietario'),
+        tamano=house.get('tamano'),
+        historial_pagos=tuple(MappingProxyType(dict(pago)) for pago in house.get('historial_pagos', ())),
+        deuda_actual=house.get('deuda_actual', 0),
+    )
+
+
+def house_to_dict(house):
+    data = {'id': house.id, 'condominio': house.condominio, 'direccion': house.direccion}
+    if house.propietario is not None:
+        data['propietario'] = house.propietario
+    if house.tamano is not None:
+        data['tamano'] = house.tamano
+    data['estado'] = house.estado
+    data['historial_pagos'] = [dict(pago) for pago in house.historial_pagos]
+    data['deuda_actual'] = house.deuda_actual
+    return data
+
+
+def _number(value):
+    # Las coordenadas del JSON son enteras; se conservan así al volver a escribirlo
+    return int(value) if float(value).is_integer() else value
+
+
+def parse_residencial(data, version=''):
+    """Convertir el JSON ya decodificado en modelos inmutables.
+
+    Si el JSON trae el metadato 'transform' (map_transform), sus coordenadas se
+    transforman aquí, una vez por versión de datos, y los modelos quedan ya en
+    coordenadas del lienzo.
+    """
+    if 'transform' in data:
+        from map_transform import apply_transform
+        data = apply_transform(data)
+    return Residencial(
+        version=version,
+        houses=_frozen((house_id, house_from_dict(house)) for house_id, house in data.get('houses', {}).items()),
+        condominios=_frozen((condo_id, Condominio(
+            id=condo['id'],
+            descripcion=condo['descripcion'],
+            casas=condo['casas'],
+            coords=tuple(condo['coords']),
+            orientacion=condo['orientacion'],
+            filas=condo.get('filas', 1),
+            columnas=condo.get('columnas', 1),
+            inicio_numeracion=condo.get('inicio_numeracion'),
+        )) for condo_id, condo in data.get('condominios', {}).items()),
+        areas=_frozen((area_id, Area(
+            id=area['id'],
+            tipo=area['tipo'],
+            descripcion=area['descripcion'],
+            coords=tuple(area['coords']),
+        )) for area_id, area in data.get('areas', {}).items()),
+        calles=_frozen((calle_id, Calle(
+            id=calle['id'],
+            start=tuple(calle['start']),
+            end=tuple(calle['end']),
+            width=calle.get('width', 30),
+        )) for calle_id, calle in data.get('calles', {}).items()),
+        layout=_frozen((house_id, tuple(rect)) for house_id, rect in data.get('layout', {}).items()),
+        bounds=tuple(data.get('bounds', DEFAULT_BOUNDS)),
+    )
+
+
+def residencial_to_dict(residencial):
+    """Inverso de parse_residencial: el esquema de houses_data.json, omitiendo los valores por defecto"""
+    condominios = {}
+    for condo_id, condo in residencial.condominios.items():
+        data = {'id': condo.id, 'descripcion': condo.descripcion, 'casas': condo.casas,
+                'coords': [_number(v) for v in condo.coords], 'orientacion': condo.orientacion}
+        if condo.filas != 1:
+            data['filas'] = condo.filas
+        if condo.columnas != 1:
+            data['columnas'] = condo.columnas
+        if condo.inicio_numeracion is not None:
+            data['inicio_numeracion'] = condo.inicio_numeracion
+        condominios[condo_id] = data
+    result = {
+        'areas': {area_id: {'id': area.id, 'tipo': area.tipo, 'descripcion': area.descripcion,
+                            'coords': [_number(v) for v in area.coords]}
+                  for area_id, area in residencial.areas.items()},
+        'condominios': condominios,
+        'calles': {calle_id: {'id': calle.id, 'start': [_number(v) for v in calle.start],
+                              'end': [_number(v) for v in calle.end], 'width': _number(calle.width)}
+                   for calle_id, calle in residencial.calles.items()},
+        'houses': {house_id: house_to_dict(house) for house_id, house in residencial.houses.items()},
+        'layout': {house_id: [_number(v) for v in rect] for house_id, rect in residencial.layout.items()},
+    }
+    if tuple(residencial.bounds) != DEFAULT_BOUNDS:
+        result['bounds'] = [_number(v) for v in residencial.bounds]
+    return result
+
+
+# Extensión del formato binario de map_store
+STORE_EXTENSION = '.rmap'
+
+_cache_lock = threading.Lock()
+
+
+def load_residencial(path=DATA_FILE):
+    """Residencial del archivo, leído y decodificado solo cuando cambian su mtime o su tamaño.
+
+    Cada llamada cuesta un os.stat; editar el JSON se refleja en la siguiente
+    llamada sin reiniciar la aplicación. Lo leído vive en la caché acotada del
+    proceso (map_cache), con clave ('residencial', ruta absoluta). El JSON pasa
+    por map_schema: si no cumple el esquema se lanza SchemaError (un ValueError).
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cache = shared_cache()
+    cached = cache.get(('residencial', path))
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    with _cache_lock:
+        cached = cache.get(('residencial', path))
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        if path.endswith(STORE_EXTENSION):
+            # Formato binario columnar, mapeado en memoria
+            from map_store import load_store
+            residencial = load_store(path)
+        else:
+            with open(path, 'rb') as file:
+                raw = file.read()
+            # Se valida una vez por versión: un archivo que no cumple el esquema no llega a la caché
+            from map_schema import validate_residencial
+            residencial = validate_residencial(json.loads(raw.decode('utf-8')), hashlib.sha1(raw).hexdigest())
+        cache.put(('residencial', path), (signature, residencial))
+        return residencial
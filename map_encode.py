@@ -0,0 +1,91 @@
+"""Codificación de las imágenes del mapa: PNG indexado o WebP sin pérdida, con esfuerzo configurable.
+
+El mapa tiene pocos colores planos, así que antes de codificar el PNG se pasa
+a una paleta exacta (modo "P", un byte por pixel) con sus colores; si alguna
+fuente con suavizado deja más de 256, se queda en RGB. WebP sin pérdida hace
+su propia paleta. El esfuerzo cambia tiempo de codificación por tamaño:
+'rapido', 'equilibrado' o 'compacto' (RESIDENCIAL_IMAGE_EFFORT).
+"""
+import io
+import os
+
+import numpy as np
+from PIL import Image, features
+
+# Formato: (formato de Pillow, tipo MIME, extensión)
+FORMATS = {
+    'png': ('PNG', 'image/png', 'png'),
+    'webp': ('WEBP', 'image/webp', 'webp'),
+}
+
+# Parámetros de Pillow de cada esfuerzo por formato. En WebP sin pérdida 'quality' no es calidad
+# sino esfuerzo de compresión (0 el más rápido, 100 el más compacto); crece con method de un
+# nivel al siguiente
+EFFORTS = {
+    'rapido': {'png': {'compress_level': 1}, 'webp': {'lossless': True, 'method': 0, 'quality': 0}},
+    'equilibrado': {'png': {'compress_level': 6}, 'webp': {'lossless': True, 'method': 1, 'quality': 0}},
+    'compacto': {'png': {'optimize': True}, 'webp': {'lossless': True, 'method': 4, 'quality': 100}},
+}
+
+IMAGE_EFFORT = os.environ.get('RESIDENCIAL_IMAGE_EFFORT', 'equilibrado')
+
+# 'auto' elige WebP si Pillow y el navegador lo admiten; 'png' o 'webp' lo fijan
+IMAGE_FORMAT = os.environ.get('RESIDENCIAL_IMAGE_FORMAT', 'auto')
+
+
+def webp_available():
+    return features.check('webp')
+
+
+def to_palette(image):
+    """La misma imagen en modo "P" con exactamente sus colores; sin cambios si tiene más de 256"""
+    if image.mode != 'RGB':
+        return image
+    colors = image.getcolors(256)
+    if colors is None:
+        return image
+    palette = Image.new('P', (1, 1))
+    palette.putpalette([value for count, color in colors for value in color])
+    # Sin tramado, quantize da a cada pixel el color más cercano de la paleta, que suele ser el mismo.
+    # Lo busca en una caché por celdas de color, así que el resultado depende solo del color: basta
+    # probarlo con un pixel de cada uno
+    sample = Image.new('RGB', (len(colors), 1))
+    sample.putdata([color for count, color in colors])
+    if sample.quantize(palette=palette, dither=Image.Dither.NONE).convert('RGB').tobytes() == sample.tobytes():
+        return image.quantize(palette=palette, dither=Image.Dither.NONE)
+    # La caché confunde colores casi iguales (bordes suavizados del texto): entonces cada pixel
+    # se ubica por su valor exacto
+    palette = np.array(sorted(color for count, color in colors), dtype=np.uint32)
+    keys = palette[:, 0] << 16 | palette[:, 1] << 8 | palette[:, 2]
+    pixels = np.asarray(image, dtype=np.uint32)
+    indices = np.searchsorted(keys, pixels[..., 0] << 16 | pixels[..., 1] << 8 | pixels[..., 2])
+    indexed = Image.fromarray(indices.astype(np.uint8), 'P')
+    indexed.putpalette(palette.astype(np.uint8).tobytes())
+    return indexed
+
+
+def encode_image(image, format='png', effort=IMAGE_EFFORT):
+    """Bytes de la imagen en el formato ('png' o 'webp') con el esfuerzo indicado"""
+    params = EFFORTS[effort][format]
+    if format == 'png':
+        image = to_palette(image)
+    output = io.BytesIO()
+    image.save(output, format=FORMATS[format][0], **params)
+    return output.getvalue()
+
+
+def choose_format(user_agent=None, setting=IMAGE_FORMAT):
+    """Formato para un navegador según su User-Agent: WebP salvo en los que no lo muestran"""
+    if setting != 'auto':
+        return setting
+    if not webp_available():
+        return 'png'
+    user_agent = user_agent or ''
+    if 'Trident' in user_agent or 'MSIE' in user_agent:
+        return 'png'
+    # Safari muestra WebP desde la versión 14
+    if 'Safari' in user_agent and 'Chrome' not in user_agent and 'Version/' in user_agent:
+        version = user_agent.split('Version/', 1)[1].split('.', 1)[0]
+        if version.isdigit() and int(version) < 14:
+            return 'png'
+    return 'webp'
@@ -0,0 +1,344 @@
+"""Exportación sin interfaz: mapas para imprimir a cualquier resolución y una hoja por condominio.
+
+El mapa completo se dibuja en franjas horizontales (ventanas de
+render_base_layer, con los mismos pixeles que la capa completa) y cada franja
+se comprime y escribe en el PNG o el PDF en cuanto llega, así que la memoria
+depende del ancho y no del alto. Las franjas y las hojas se reparten en un
+pool de procesos; cada proceso carga los datos de un residencial una vez y
+los reutiliza para todo lo que le toca. Los colores de las casas son los
+estados del repositorio SQLite, como en las interfaces.
+
+Uso:
+    python map_export.py                               # todos los residenciales, mapa y hojas
+    python map_export.py principal --width 16000 --format pdf --dpi 300
+    python map_export.py --sheets-only --output /srv/exports
+"""
+import argparse
+import math
+import multiprocessing
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from map_data import load_residencial
+from map_labels import place_street_labels
+from map_layout import compile_layout
+from map_live import PATCH_MARGIN
+from map_occupancy import build_counters, house_estados
+from map_registry import discover_registry
+from map_render import ESTADO_COLORS, HOUSE_COLOR, render_base_layer
+from map_repository import HouseRepository
+from map_sprites import map_font
+from map_workers import RENDER_WORKERS
+
+EXPORT_DIR = os.environ.get('RESIDENCIAL_EXPORT', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'exports'))
+
+# Ancho del mapa en pantalla y tamaño de su fuente: el texto de la exportación crece en la misma proporción
+SCREEN_WIDTH = 1050
+FONT_SIZE = 14
+
+# Filas de cada franja del mapa completo
+BAND_HEIGHT = 512
+
+# Hoja por condominio: A4 vertical u horizontal según la forma del condominio
+SHEET_MM = (210, 297)
+# Margen de la hoja y holgura alrededor del condominio (fracción de su lado mayor)
+SHEET_MARGIN = 0.05
+SHEET_PAD = 0.15
+
+FORMATS = ('png', 'pdf')
+
+
+@dataclass(frozen=True)
+class ExportJob:
+    """Lo que un proceso del pool necesita para dibujar un residencial: datos, base y tamaño"""
+    residencial: str
+    nombre: str
+    path: str
+    db_path: str
+    width: int = 0
+    height: int = 0
+    font_size: int = FONT_SIZE
+
+
+class _Context:
+    # Datos, tabla y colores de un residencial, cargados una vez por proceso
+    def __init__(self, job):
+        self.data = load_residencial(job.path)
+        self.table = compile_layout(self.data.condominios, self.data.layout, self.data.bounds)
+        repository = HouseRepository(job.db_path)
+        self.counters = build_counters(dict(repository.find(limit=None)))
+        repository.close()
+        self.colors = [ESTADO_COLORS.get(estado, HOUSE_COLOR) for estado in house_estados(self.table, self.counters)]
+        self.labels = (None, None)
+
+    def render(self, width, height, font, clip):
+        # Las franjas de un mapa comparten tamaño; cada hoja tiene el suyo, así que se guarda solo el último
+        key = (width, height, getattr(font, 'size', None))
+        if self.labels[0] != key:
+            self.labels = (key, place_street_labels(self.data.calles, font, *self.table.scale(width, height)))
+        return render_base_layer(self.data.areas, self.data.condominios, self.data.calles, self.table, width, height,
+                                 font, street_labels=self.labels[1], house_colors=self.colors, clip=clip)
+
+
+_contexts = {}
+
+
+def _context(job):
+    key = (job.residencial, job.path, os.stat(job.path).st_mtime_ns)
+    context = _contexts.get(key)
+    if context is None:
+        _contexts.clear()
+        context = _contexts[key] = _Context(job)
+    return context
+
+
+def band_margin(font_size):
+    """Filas de más que se dibujan arriba y abajo de una franja: más que cualquier texto que cruce su borde"""
+    return max(PATCH_MARGIN, 3 * font_size)
+
+
+def render_band(job, top, bottom):
+    """Filas [top, bottom) del mapa completo como bytes RGB"""
+    context = _context(job)
+    margin = band_margin(job.font_size)
+    clip = (0, max(top - margin, 0), job.width, min(bottom + margin, job.height))
+    window = context.render(job.width, job.height, map_font(job.font_size), clip)
+    return window.crop((0, top - clip[1], job.width, bottom - clip[1])).tobytes()
+
+
+class PNGWriter:
+    """PNG RGB escrito por franjas: cada franja se comprime y se agrega como IDAT al llegar"""
+
+    def __init__(self, file, width, height, dpi=None, level=6):
+        self.file = file
+        self.width = width
+        self._compressor = zlib.compressobj(level)
+        file.write(b'\x89PNG\r\n\x1a\n')
+        self._chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+        if dpi:
+            # Píxeles por metro, para que el programa de impresión tome el tamaño físico
+            per_meter = round(dpi / 0.0254)
+            self._chunk(b'pHYs', struct.pack('>IIB', per_meter, per_meter, 1))
+
+    def _chunk(self, kind, data):
+        self.file.write(struct.pack('>I', len(data)) + kind + data)
+        self.file.write(struct.pack('>I', zlib.crc32(kind + data) & 0xFFFFFFFF))
+
+    def write(self, rows):
+        # Cada fila lleva delante su tipo de filtro (0: ninguno)
+        pixels = np.frombuffer(rows, dtype=np.uint8).reshape(-1, self.width * 3)
+        filtered = np.zeros((len(pixels), self.width * 3 + 1), dtype=np.uint8)
+        filtered[:, 1:] = pixels
+        data = self._compressor.compress(filtered.tobytes())
+        if data:
+            self._chunk(b'IDAT', data)
+
+    def close(self):
+        self._chunk(b'IDAT', self._compressor.flush())
+        self._chunk(b'IEND', b'')
+
+
+class PDFWriter:
+    """PDF de una página con la imagen como un solo XObject Flate, escrito por franjas"""
+
+    def __init__(self, file, width, height, dpi=None, level=6):
+        self.file = file
+        self._compressor = zlib.compressobj(level)
+        self._offsets = {}
+        dpi = dpi or 72
+        page_width, page_height = width * 72 / dpi, height * 72 / dpi
+        file.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        self._object(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+        self._object(2, b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>')
+        self._object(3, (f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page_width:.2f} {page_height:.2f}] '
+                         f'/Resources << /XObject << /Im0 4 0 R >> >> /Contents 5 0 R >>').encode('ascii'))
+        content = f'q {page_width:.2f} 0 0 {page_height:.2f} 0 0 cm /Im0 Do Q'.encode('ascii')
+        self._object(5, b'<< /Length %d >>\nstream\n' % len(content) + content + b'\nendstream')
+        # La imagen va al final: su largo se conoce al cerrar y se escribe como objeto aparte
+        self._offsets[4] = file.tell()
+        file.write((f'4 0 obj\n<< /Type /XObject /Subtype /Image /Width {width} /Height {height} '
+                    f'/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /FlateDecode /Length 6 0 R >>\n'
+                    f'stream\n').encode('ascii'))
+        self._start = file.tell()
+
+    def _object(self, number, body):
+        self._offsets[number] = self.file.tell()
+        self.file.write(b'%d 0 obj\n' % number + body + b'\nendobj\n')
+
+    def write(self, rows):
+        self.file.write(self._compressor.compress(rows))
+
+    def close(self):
+        self.file.write(self._compressor.flush())
+        length = self.file.tell() - self._start
+        self.file.write(b'\nendstream\nendobj\n')
+        self._object(6, b'%d' % length)
+        xref = self.file.tell()
+        self.file.write(b'xref\n0 7\n0000000000 65535 f \n')
+        for number in range(1, 7):
+            self.file.write(b'%010d 00000 n \n' % self._offsets[number])
+        self.file.write(b'trailer\n<< /Size 7 /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % xref)
+
+
+WRITERS = {'png': PNGWriter, 'pdf': PDFWriter}
+
+
+def _atomic_path(path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def export_map(pool, job, path, format='png', dpi=None, band_height=BAND_HEIGHT, workers=RENDER_WORKERS):
+    """Escribir el mapa completo de job en path, con a lo sumo dos franjas por proceso en memoria"""
+    tmp_path = _atomic_path(path)
+    bands = deque()
+    in_flight = 2 * workers
+    try:
+        with open(tmp_path, 'wb') as file:
+            writer = WRITERS[format](file, job.width, job.height, dpi)
+            for top in range(0, job.height, band_height):
+                bands.append(pool.submit(render_band, job, top, min(top + band_height, job.height)))
+                if len(bands) >= in_flight:
+                    writer.write(bands.popleft().result())
+            while bands:
+                writer.write(bands.popleft().result())
+            writer.close()
+        os.replace(tmp_path, path)
+    except BaseException:
+        for future in bands:
+            future.cancel()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+def sheet_size(dpi, landscape=False):
+    width, height = (round(mm / 25.4 * dpi) for mm in SHEET_MM)
+    return (height, width) if landscape else (width, height)
+
+
+def render_sheet(job, condo_id, path, format='png', dpi=300):
+    """Hoja del condominio: título, ocupación por estado y el mapa alrededor del condominio"""
+    context = _context(job)
+    condo = context.data.condominios[condo_id]
+    x0, y0, x1, y1 = condo.coords
+    pad = SHEET_PAD * max(x1 - x0, y1 - y0)
+    region = (x0 - pad, y0 - pad, x1 + pad, y1 + pad)
+    page_width, page_height = sheet_size(dpi, landscape=(x1 - x0) > (y1 - y0))
+    margin = round(SHEET_MARGIN * page_width)
+    header = round(0.12 * page_width)
+
+    # Escala del lienzo a la hoja: la región cabe en el espacio bajo el encabezado
+    available = (page_width - 2 * margin, page_height - 2 * margin - header)
+    scale = min(available[0] / (region[2] - region[0]), available[1] / (region[3] - region[1]))
+    bounds = context.table.bounds
+    width, height = max(1, round(bounds[0] * scale)), max(1, round(bounds[1] * scale))
+    font_size = max(1, round(FONT_SIZE * width / SCREEN_WIDTH))
+    clip = (max(0, math.floor(region[0] * scale)), max(0, math.floor(region[1] * scale)),
+            min(width, math.ceil(region[2] * scale)), min(height, math.ceil(region[3] * scale)))
+    window = context.render(width, height, map_font(font_size), clip)
+
+    sheet = Image.new('RGB', (page_width, page_height), 'white')
+    sheet.paste(window, (margin + (available[0] - window.width) // 2, margin + header))
+    draw = ImageDraw.Draw(sheet)
+    title_font = map_font(max(1, header // 4))
+    text_font = map_font(max(1, header // 8))
+    draw.text((margin, margin), f"{job.nombre} · {condo.descripcion}", fill='black', font=title_font)
+    occupancy = context.counters.summary(condo_id)
+    line = margin + header // 2
+    draw.text((margin, line), f"{condo.casas} casas · orientación {condo.orientacion.lower()}",
+              fill='black', font=text_font)
+    # Leyenda: un cuadro del color de cada estado con su conteo
+    legend = [(estado, ESTADO_COLORS.get(estado, HOUSE_COLOR), count) for estado, count in occupancy.por_estado.items()]
+    if condo.casas > occupancy.casas:
+        legend.append(("Sin registro", HOUSE_COLOR, condo.casas - occupancy.casas))
+    x = margin
+    square = header // 8
+    y = line + square + header // 16
+    for estado, color, count in legend:
+        draw.rectangle([x, y, x + square, y + square], fill=color, outline='black')
+        label = f"{estado}: {count}"
+        draw.text((x + square + square // 2, y), label, fill='black', font=text_font)
+        x += square * 2 + round(draw.textlength(label, font=text_font)) + square
+
+    tmp_path = _atomic_path(path)
+    sheet.save(tmp_path, format=format.upper(), resolution=dpi)
+    os.replace(tmp_path, path)
+    return path
+
+
+def map_job(entry, width, font_size=None):
+    """ExportJob del mapa completo de entry con width píxeles de ancho (el alto sigue al lienzo)"""
+    bounds = load_residencial(entry.path).bounds
+    height = max(1, round(width * bounds[1] / bounds[0]))
+    return ExportJob(entry.id, entry.nombre, entry.path, entry.db_path, width, height,
+                     font_size or max(1, round(FONT_SIZE * width / SCREEN_WIDTH)))
+
+
+def _progress(message):
+    print(message, flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exportar mapas para imprimir y hojas por condominio")
+    parser.add_argument('residenciales', nargs='*', help="ids del registro (por omisión, todos)")
+    parser.add_argument('--width', type=int, default=8192, help="ancho del mapa completo en píxeles (8192)")
+    parser.add_argument('--dpi', type=int, default=300, help="resolución para imprimir (300)")
+    parser.add_argument('--format', choices=FORMATS, default='png')
+    parser.add_argument('--font-size', type=int, help="tamaño del texto del mapa completo (por omisión, "
+                                                      "proporcional al ancho)")
+    parser.add_argument('--sheets-only', action='store_true', help="solo las hojas por condominio")
+    parser.add_argument('--no-sheets', action='store_true', help="solo el mapa completo")
+    parser.add_argument('--band-height', type=int, default=BAND_HEIGHT)
+    parser.add_argument('--workers', type=int, default=RENDER_WORKERS)
+    parser.add_argument('--output', default=EXPORT_DIR, help=f"carpeta de salida (por omisión {EXPORT_DIR})")
+    args = parser.parse_args(argv)
+
+    registry = discover_registry()
+    ids = args.residenciales or list(registry)
+    for residencial_id in ids:
+        if residencial_id not in registry:
+            parser.error(f"residencial desconocido: {residencial_id}")
+        # Los estados salen del repositorio: se importa el JSON si cambió, una vez y antes de repartir
+        registry.repository(residencial_id).sync_with(registry.load(residencial_id))
+
+    start = time.perf_counter()
+    # spawn, como el pool de map_workers: cada proceso parte de un intérprete limpio
+    with ProcessPoolExecutor(args.workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        # Las hojas de todos los residenciales van primero al pool y lo mantienen ocupado
+        # mientras el proceso principal escribe las franjas de cada mapa
+        sheets = []
+        if not args.no_sheets:
+            for residencial_id in ids:
+                entry = registry[residencial_id]
+                job = ExportJob(entry.id, entry.nombre, entry.path, entry.db_path)
+                directory = os.path.join(args.output, residencial_id, 'condominios')
+                for condo_id in registry.load(residencial_id).condominios:
+                    path = os.path.join(directory, f"{condo_id}.{args.format}")
+                    sheets.append(pool.submit(render_sheet, job, condo_id, path, args.format, args.dpi))
+        if not args.sheets_only:
+            for residencial_id in ids:
+                job = map_job(registry[residencial_id], args.width, args.font_size)
+                path = os.path.join(args.output, residencial_id, f"mapa.{args.format}")
+                export_map(pool, job, path, args.format, args.dpi, args.band_height, args.workers)
+                _progress(f"{residencial_id}: {path} ({job.width}x{job.height}, "
+                          f"{os.path.getsize(path) / 2**20:.1f} MB)")
+        for future in sheets:
+            future.result()
+        if sheets:
+            _progress(f"{len(sheets)} hojas por condominio en {args.output}")
+    _progress(f"exportación terminada en {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == '__main__':
+    main()
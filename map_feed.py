@@ -0,0 +1,138 @@
+"""Canal de cambios por casa dentro del proceso (pub/sub sobre asyncio).
+
+Quien escribe en el repositorio publica los cambios de estado; cada lote se
+numera (una sola secuencia para todos los residenciales) y se reparte a los suscriptores desde un event loop propio en un hilo
+aparte, así que publicar nunca bloquea a la sesión que guardó. Un suscriptor
+lento no frena a los demás: si su cola se llena se marca como atrasado y se
+pone al día con since().
+"""
+import asyncio
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+
+LOGGER = logging.getLogger(__name__)
+
+# Deltas que se conservan para los suscriptores que se atrasan
+HISTORY_SIZE = 4096
+# Lotes pendientes por suscriptor antes de darlo por atrasado
+QUEUE_SIZE = 256
+
+
+@dataclass(frozen=True)
+class HouseDelta:
+    """Cambio de estado de una casa de un residencial; sequence crece en uno por delta publicado"""
+    sequence: int
+    residencial: str
+    key: str
+    condominio: str
+    estado_anterior: Optional[str]
+    estado: str
+
+
+class Subscription:
+    def __init__(self, queue):
+        self.queue = queue
+        self.lagged = False
+        self.future = None
+
+    def cancel(self):
+        if self.future is not None:
+            self.future.cancel()
+
+
+class ChangeFeed:
+    """Difusor de deltas de casas para todas las sesiones del proceso"""
+
+    def __init__(self, history_size=HISTORY_SIZE, queue_size=QUEUE_SIZE):
+        self.sequence = 0
+        self.history = deque(maxlen=history_size)
+        self.queue_size = queue_size
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='change-feed', daemon=True)
+        self._thread.start()
+
+    def publish(self, residencial, changes, origin=None):
+        """Numerar y difundir [(clave, condominio, estado_anterior, estado)] del residencial; devuelve los HouseDelta.
+
+        origin identifica a quien publicó (una sesión) para que pueda ignorar su propio eco.
+        """
+        with self._lock:
+            deltas = []
+            for key, condominio, anterior, estado in changes:
+                self.sequence += 1
+                deltas.append(HouseDelta(self.sequence, residencial, key, condominio, anterior, estado))
+            self.history.extend(deltas)
+        if deltas:
+            self._loop.call_soon_threadsafe(self._broadcast, (tuple(deltas), origin))
+        return deltas
+
+    def since(self, sequence):
+        """Deltas posteriores a sequence, o None si el historial ya no llega tan atrás"""
+        with self._lock:
+            if sequence >= self.sequence:
+                return []
+            if not self.history or self.history[0].sequence > sequence + 1:
+                return None
+            return [delta for delta in self.history if delta.sequence > sequence]
+
+    def _broadcast(self, batch):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            try:
+                subscription.queue.put_nowait(batch)
+            except asyncio.QueueFull:
+                subscription.lagged = True
+
+    def _register(self):
+        subscription = Subscription(asyncio.Queue(self.queue_size))
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def _unregister(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    async def stream(self, subscription=None):
+        """Iterador asíncrono de lotes (deltas, origin) publicados desde ahora"""
+        subscription = subscription or self._register()
+        try:
+            while True:
+                yield await subscription.queue.get()
+        finally:
+            self._unregister(subscription)
+
+    def subscribe(self, callback):
+        """Llamar callback(deltas, origin) en el hilo del canal por cada lote.
+
+        Si callback devuelve False la suscripción termina. Devuelve la
+        Subscription (su cancel() también la termina).
+        """
+        subscription = self._register()
+
+        async def consume():
+            try:
+                async for deltas, origin in self.stream(subscription):
+                    try:
+                        keep = callback(deltas, origin)
+                    except Exception:
+                        LOGGER.exception("Error en un suscriptor del canal de cambios")
+                        keep = True
+                    if keep is False:
+                        return
+            finally:
+                # Salir del for no cierra el generador de stream() hasta que se recolecta:
+                # la baja se da aquí para que no siga recibiendo lotes
+                self._unregister(subscription)
+
+        subscription.future = asyncio.run_coroutine_threadsafe(consume(), self._loop)
+        return subscription
+
+    def close(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
@@ -0,0 +1,150 @@
+import math
+
+# Orden de prioridad cuando varias entidades contienen el punto (la primera gana)
+KIND_PRIORITY = ('casa', 'calle', 'condominio', 'area')
+
+
+def _distance_to_segment(px, py, x0, y0, x1, y1):
+    dx = x1 - x0
+    dy = y1 - y0
+    length_sq = dx * dx + dy * dy
+    if length_sq == 0:
+        return math.hypot(px - x0, py - y0)
+    t = max(0.0, min(1.0, ((px - x0) * dx + (py - y0) * dy) / length_sq))
+    return math.hypot(px - (x0 + t * dx), py - (y0 + t * dy))
+
+
+class GridIndex:
+    """Índice espacial de cuadrícula uniforme para consultas punto -> entidad.
+
+    Cada celda guarda los índices de las entidades cuyo rectángulo la toca, en
+    orden de prioridad, así que una consulta solo revisa los candidatos de una celda.
+    """
+
+    def __init__(self, entities, cell_size=32):
+        # entities: (kind, entity_id, label, (x0, y0, x1, y1), segment o None)
+        self.entities = sorted(
+            entities,
+            key=lambda e: (KIND_PRIORITY.index(e[0]), (e[3][2] - e[3][0]) * (e[3][3] - e[3][1]))
+        )
+        self.cell_size = cell_size
+        width = max((e[3][2] for e in self.entities), default=0)
+        height = max((e[3][3] for e in self.entities), default=0)
+        self.cols = int(width // cell_size) + 1
+        self.rows = int(height // cell_size) + 1
+
+        cells = [[] for _ in range(self.cols * self.rows)]
+        for index, (kind, entity_id, label, rect, segment) in enumerate(self.entities):
+            col0, row0 = self._cell(rect[0], rect[1])
+            col1, row1 = self._cell(rect[2], rect[3])
+            for row in range(row0, row1 + 1):
+                for col in range(col0, col1 + 1):
+                    cells[row * self.cols + col].append(index)
+
+        # Formato CSR: offsets[i]..offsets[i+1] delimita los índices de la celda i
+        self.offsets = [0]
+        self.items = []
+        for cell in cells:
+            self.items.extend(cell)
+            self.offsets.append(len(self.items))
+
+    def _cell(self, x, y):
+        col = min(max(int(x // self.cell_size), 0), self.cols - 1)
+        row = min(max(int(y // self.cell_size), 0), self.rows - 1)
+        return col, row
+
+    def _contains(self, index, x, y):
+        kind, entity_id, label, rect, segment = self.entities[index]
+        if not (rect[0] <= x <= rect[2] and rect[1] <= y <= rect[3]):
+            return False
+        if segment is not None:
+            x0, y0, x1, y1, half_width = segment
+            return _distance_to_segment(x, y, x0, y0, x1, y1) <= half_width
+        return True
+
+    def lookup(self, x, y, kinds=None):
+        """Entidades que contienen el punto (x, y), en orden de prioridad"""
+        if x < 0 or y < 0:
+            return []
+        col, row = self._cell(x, y)
+        cell = row * self.cols + col
+        return [
+            self.entities[index]
+            for index in self.items[self.offsets[cell]:self.offsets[cell + 1]]
+            if (kinds is None or self.entities[index][0] in kinds) and self._contains(index, x, y)
+        ]
+
+    def query(self, x0, y0, x1, y1, kinds=None):
+        """Entidades cuyo rectángulo toca [x0, x1] x [y0, y1], en orden de prioridad; solo revisa las celdas que toca"""
+        col0, row0 = self._cell(x0, y0)
+        col1, row1 = self._cell(x1, y1)
+        found = set()
+        for row in range(row0, row1 + 1):
+            for cell in range(row * self.cols + col0, row * self.cols + col1 + 1):
+                for index in self.items[self.offsets[cell]:self.offsets[cell + 1]]:
+                    if index in found:
+                        continue
+                    kind, entity_id, label, rect, segment = self.entities[index]
+                    if ((kinds is None or kind in kinds) and
+                            rect[0] <= x1 and x0 <= rect[2] and rect[1] <= y1 and y0 <= rect[3]):
+                        found.add(index)
+        return [self.entities[index] for index in sorted(found)]
+
+    def hit(self, x, y, kinds=None):
+        """Entidad de mayor prioridad en (x, y) o None"""
+        matches = self.lookup(x, y, kinds)
+        return matches[0] if matches else None
+
+    def to_client(self):
+        """Forma compacta (columnar) del índice para el script del navegador"""
+        segments = {}
+        for index, entity in enumerate(self.entities):
+            if entity[4] is not None:
+                segments[index] = [round(v, 1) for v in entity[4]]
+        return {
+            'cell': self.cell_size,
+            'cols': self.cols,
+            'rows': self.rows,
+            'offsets': self.offsets,
+            'items': self.items,
+            'kinds': [KIND_PRIORITY.index(e[0]) for e in self.entities],
+            'ids': [e[1] for e in self.entities],
+            'labels': [e[2] for e in self.entities],
+            'rects': [int(v) for e in self.entities for v in e[3]],
+            'segments': segments,
+        }
+
+
+def build_index(areas, condominios, calles, table, scale_x=1.0, scale_y=1.0, cell_size=32):
+    """Construir el índice de áreas, condominios, casas y calles en coordenadas escaladas"""
+    entities = []
+
+    for area_id, area in areas.items():
+        coords = area.coords
+        rect = (int(coords[0] * scale_x), int(coords[1] * scale_y),
+                int(coords[2] * scale_x), int(coords[3] * scale_y))
+        entities.append(('area', area_id, area.descripcion, rect, None))
+
+    for condo_id, condo in condominios.items():
+        coords = condo.coords
+        rect = (int(coords[0] * scale_x), int(coords[1] * scale_y),
+                int(coords[2] * scale_x), int(coords[3] * scale_y))
+        entities.append(('condominio', condo_id, condo.descripcion, rect, None))
+
+    rects = table.scaled_rects(scale_x, scale_y)
+    for i, house_id in enumerate(table.ids):
+        condo = condominios[table.condo_ids[i]]
+        entities.append(('casa', house_id, f"{condo.descripcion} - Casa {table.labels[i]}",
+                         tuple(rects[4 * i:4 * i + 4]), None))
+
+    for calle_id, calle in calles.items():
+        x0 = int(calle.start[0] * scale_x)
+        y0 = int(calle.start[1] * scale_y)
+        x1 = int(calle.end[0] * scale_x)
+        y1 = int(calle.end[1] * scale_y)
+        half_width = calle.width * scale_x / 2
+        rect = (min(x0, x1) - half_width, min(y0, y1) - half_width,
+                max(x0, x1) + half_width, max(y0, y1) + half_width)
+        entities.append(('calle', calle_id, calle.id, rect, (x0, y0, x1, y1, half_width)))
+
+    return GridIndex(entities, cell_size)
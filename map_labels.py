@@ -0,0 +1,109 @@
+import math
+from collections import defaultdict
+
+from map_sprites import label_sprite
+
+# Dueño de las cajas de etiquetas ya colocadas en la cuadrícula de colisiones
+LABEL_OWNER = 'etiqueta'
+
+
+def street_angle(calle):
+    """Orientación de la etiqueta según la geometría: rotada -90 grados si la calle es más alta que ancha"""
+    dx = abs(calle.end[0] - calle.start[0])
+    dy = abs(calle.end[1] - calle.start[1])
+    return -90 if dy > dx else 0
+
+
+class CollisionGrid:
+    """Cuadrícula uniforme de cajas ocupadas; cada consulta revisa solo las celdas que toca"""
+
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        self.cells = defaultdict(list)
+        self.boxes = []
+
+    def _cells(self, box):
+        col0, row0 = int(box[0] // self.cell_size), int(box[1] // self.cell_size)
+        col1, row1 = int(box[2] // self.cell_size), int(box[3] // self.cell_size)
+        for row in range(row0, row1 + 1):
+            for col in range(col0, col1 + 1):
+                yield col, row
+
+    def insert(self, box, owner=None):
+        index = len(self.boxes)
+        self.boxes.append((box, owner))
+        for cell in self._cells(box):
+            self.cells[cell].append(index)
+
+    def collides(self, box, ignore=None, owners=None):
+        """¿Se enciman box y alguna caja ocupada? ignore excluye un dueño; owners limita a ciertos dueños"""
+        for cell in self._cells(box):
+            for index in self.cells.get(cell, ()):
+                other, owner = self.boxes[index]
+                if owner is not None and owner == ignore:
+                    continue
+                if owners is not None and owner not in owners:
+                    continue
+                if box[0] < other[2] and other[0] < box[2] and box[1] < other[3] and other[1] < box[3]:
+                    return True
+        return False
+
+
+def _candidates(length, label_length, step):
+    """Desplazamientos desde el punto medio: 0, +step, -step, +2*step... mientras quepa la etiqueta"""
+    yield 0.0
+    slack = (length - label_length) / 2
+    offset = step
+    while offset <= slack:
+        yield offset
+        yield -offset
+        offset += step
+
+
+def place_street_labels(calles, font, scale_x=1.0, scale_y=1.0, cell_size=64):
+    """Calcular dónde va la etiqueta de cada calle: calle_id -> (x, y, ángulo).
+
+    (x, y) es la esquina superior izquierda del sprite recortado. Cada etiqueta
+    se centra sobre su calle lo más cerca posible del punto medio sin tocar otras
+    etiquetas ni los cruces con otras calles; las calles con menos holgura se
+    colocan primero. cell_size es el de la cuadrícula de colisiones a escala 1;
+    crece con la escala para que una calle ampliada no ocupe miles de celdas.
+    """
+    grid = CollisionGrid(cell_size * max(1.0, scale_x, scale_y))
+    streets = []
+    for calle_id, calle in calles.items():
+        x0, y0 = calle.start[0] * scale_x, calle.start[1] * scale_y
+        x1, y1 = calle.end[0] * scale_x, calle.end[1] * scale_y
+        half_width = calle.width * scale_x / 2
+        grid.insert((min(x0, x1) - half_width, min(y0, y1) - half_width,
+                     max(x0, x1) + half_width, max(y0, y1) + half_width), owner=calle_id)
+
+        angle = street_angle(calle)
+        sprite = label_sprite(calle.id, font, 'white', angle)
+        if sprite is None:
+            continue
+        label_width, label_height = sprite[0].size
+        length = math.hypot(x1 - x0, y1 - y0)
+        label_length = label_height if angle else label_width
+        streets.append((length - label_length, calle_id, (x0, y0, x1, y1), length, label_length,
+                        label_width, label_height, angle))
+
+    placements = {}
+    for slack, calle_id, (x0, y0, x1, y1), length, label_length, label_width, label_height, angle in sorted(streets):
+        step = max(label_length / 2, 8)
+        boxes = []
+        for offset in _candidates(length, label_length, step):
+            t = 0.5 + offset / length if length else 0.5
+            center_x = x0 + (x1 - x0) * t
+            center_y = y0 + (y1 - y0) * t
+            left = int(round(center_x - label_width / 2))
+            top = int(round(center_y - label_height / 2))
+            boxes.append((left, top, left + label_width, top + label_height))
+
+        # Primero sin tocar cruces ni etiquetas; si no cabe, al menos sin encimar etiquetas
+        box = next((b for b in boxes if not grid.collides(b, ignore=calle_id)), None)
+        if box is None:
+            box = next((b for b in boxes if not grid.collides(b, owners=(LABEL_OWNER,))), boxes[0])
+        grid.insert(box, owner=LABEL_OWNER)
+        placements[calle_id] = (box[0], box[1], angle)
+    return placements
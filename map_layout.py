@@ -0,0 +1,217 @@
+import math
+from array import array
+from collections import OrderedDict
+
+import numpy as np
+
+from map_data import DEFAULT_BOUNDS
+
+# Esquina donde está la casa 1 si el condominio no define 'inicio_numeracion'
+DEFAULT_START = 'superior_izquierda'
+
+# Escalas cuya geometría conserva cada tabla (las menos usadas se descartan). La caché de
+# map_cache mide la tabla una sola vez, al guardarla, así que lo que crezca después debe estar acotado
+SCALED_LAYOUTS = 16
+
+
+class HouseTable:
+    """Tabla de geometría de casas compilada una vez por versión de datos.
+
+    Las casas de cada condominio ocupan un rango contiguo; los rectángulos se
+    guardan en coordenadas del JSON como array plano x0, y0, x1, y1. bounds es
+    el lienzo (ancho, alto) de esas coordenadas, del que sale la escala al dibujar.
+    """
+
+    def __init__(self, condominios=None, overrides=None, bounds=DEFAULT_BOUNDS):
+        self.condominios = condominios or {}
+        self.overrides = overrides or {}
+        self.bounds = tuple(bounds)
+        self._scaled = OrderedDict()
+        self.ids = []
+        self.condo_ids = []
+        self.numbers = array('i')
+        self.labels = []
+        self.rects = array('d')
+        self.by_condo = {}
+        self.positions = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, house_id, condo_id, number, rect):
+        self.positions[house_id] = len(self.ids)
+        self.ids.append(house_id)
+        self.condo_ids.append(condo_id)
+        self.numbers.append(number)
+        self.labels.append(str(number))
+        self.rects.extend(rect)
+
+    def rect(self, index):
+        return self.rects[4 * index:4 * index + 4]
+
+    def scale(self, width, height):
+        """Factores (x, y) para dibujar el lienzo del residencial en width x height píxeles"""
+        return width / self.bounds[0], height / self.bounds[1]
+
+    def scaled_layout(self, scale_x, scale_y):
+        """Rectángulos en píxeles enteros y centros de texto (arrays planos de NumPy) para una escala.
+
+        Como el dibujo original, la geometría se reparte sobre el rectángulo ya
+        escalado y truncado de cada condominio, así que se recalcula por escala; se
+        conservan las SCALED_LAYOUTS usadas más recientemente.
+        """
+        key = (scale_x, scale_y)
+        layout = self._scaled.get(key)
+        if layout is not None:
+            try:
+                self._scaled.move_to_end(key)
+            except KeyError:
+                # Otro hilo la descartó mientras tanto; el resultado sigue sirviendo
+                pass
+        else:
+            rects = array('d')
+            centers = array('d')
+            for condo_id in self.by_condo:
+                for number, rect, center in compile_condominio(self.condominios[condo_id], scale_x, scale_y):
+                    override = self.overrides.get(f"{condo_id}-{number:02d}")
+                    if override is not None:
+                        rect = (override[0] * scale_x, override[1] * scale_y,
+                                override[2] * scale_x, override[3] * scale_y)
+                        center = ((rect[0] + rect[2]) / 2, (rect[1] + rect[3]) / 2)
+                    rects.extend(rect)
+                    centers.extend(center)
+            layout = self._scaled[key] = (
+                np.frombuffer(rects, dtype=np.float64).astype(np.int32),
+                np.frombuffer(centers, dtype=np.float64)
+            )
+            while len(self._scaled) > SCALED_LAYOUTS:
+                try:
+                    self._scaled.popitem(last=False)
+                except KeyError:
+                    break
+        return layout
+
+    def scaled_rects(self, scale_x, scale_y):
+        """Rectángulos en píxeles enteros (array plano de NumPy) para un tamaño de salida"""
+        return self.scaled_layout(scale_x, scale_y)[0]
+
+    def scaled_centers(self, scale_x, scale_y):
+        """Centro (x, y) sin redondear donde va el número de cada casa"""
+        return self.scaled_layout(scale_x, scale_y)[1]
+
+    def to_arrays(self, scales=()):
+        """Arrays de NumPy con la tabla y su geometría escalada a cada (x, y) de scales, para guardarla"""
+        arrays = {
+            'ids': np.array(self.ids, dtype=str),
+            'condo_ids': np.array(self.condo_ids, dtype=str),
+            'numbers': np.frombuffer(self.numbers, dtype=np.int32),
+            'rects': np.frombuffer(self.rects, dtype=np.float64),
+            'condo_ranges': np.array(list(self.by_condo.values()), dtype=np.int64).reshape(-1, 2),
+            'scales': np.array(scales, dtype=np.float64).reshape(-1, 2),
+        }
+        for i, (scale_x, scale_y) in enumerate(scales):
+            arrays[f'scaled_rects_{i}'], arrays[f'scaled_centers_{i}'] = self.scaled_layout(scale_x, scale_y)
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, condominios, overrides, bounds, arrays):
+        """Tabla guardada con to_arrays; condominios y overrides son los de los mismos datos"""
+        table = cls(condominios, overrides, bounds)
+        table.ids = arrays['ids'].tolist()
+        table.condo_ids = arrays['condo_ids'].tolist()
+        table.numbers.frombytes(arrays['numbers'].astype(np.int32).tobytes())
+        table.labels = [str(number) for number in table.numbers]
+        table.rects.frombytes(arrays['rects'].astype(np.float64).tobytes())
+        table.positions = {house_id: i for i, house_id in enumerate(table.ids)}
+        # Los rangos van en el orden de condominios, como los arma compile_layout
+        table.by_condo = {condo_id: (first, last) for condo_id, (first, last)
+                          in zip(condominios, arrays['condo_ranges'].tolist())}
+        for i, (scale_x, scale_y) in enumerate(arrays['scales'].tolist()):
+            table._scaled[(scale_x, scale_y)] = (arrays[f'scaled_rects_{i}'], arrays[f'scaled_centers_{i}'])
+        return table
+
+    def condo_range(self, condo_id):
+        return range(*self.by_condo.get(condo_id, (0, 0)))
+
+    def locate(self, condo_id, number):
+        """Posición en la tabla de la casa number del condominio, o None"""
+        if number is None:
+            return None
+        return self.positions.get(f"{condo_id}-{number:02d}")
+
+
+def house_numbers(num_lines, per_line, num_houses):
+    """Numeración en serpentina: las líneas pares avanzan y las impares regresan.
+
+    Devuelve, por línea, el número de casa de cada posición en orden geométrico.
+    """
+    lines = []
+    for k in range(num_lines):
+        count = max(0, min(per_line, num_houses - k * per_line))
+        lines.append([k * per_line + i + 1 for i in range(count)])
+    for k in range(1, num_lines, 2):
+        lines[k].reverse()
+    return lines
+
+
+def compile_condominio(condo, scale_x=1.0, scale_y=1.0):
+    """Generar (número, rectángulo, centro) de cada casa según orientación, filas/columnas e inicio.
+
+    Con escala, las casas se reparten sobre las coordenadas escaladas y truncadas del condominio.
+    """
+    left, top, right, bottom = (int(condo.coords[0] * scale_x), int(condo.coords[1] * scale_y),
+                                int(condo.coords[2] * scale_x), int(condo.coords[3] * scale_y))
+    num_houses = condo.casas
+    vertical_start, horizontal_start = (condo.inicio_numeracion or DEFAULT_START).split('_')
+    width = right - left
+    height = bottom - top
+
+    if condo.orientacion == "Horizontal":
+        # Filas apiladas verticalmente; cada fila reparte su ancho entre sus casas
+        num_lines = condo.filas
+        per_line = math.ceil(num_houses / num_lines)
+        lines = house_numbers(num_lines, per_line, num_houses)
+        if vertical_start == 'inferior':
+            lines.reverse()
+        house_width = width / (per_line + 1)
+        house_height = height / (num_lines + 2)
+        for row, numbers in enumerate(lines):
+            if horizontal_start == 'derecha':
+                numbers = numbers[::-1]
+            y = top + (height * (row + 1)) / (num_lines + 1)
+            for i, number in enumerate(numbers):
+                x = left + ((i + 1) * house_width)
+                yield number, (x - house_width/2, y - house_height/2, x + house_width/2, y + house_height/2), (x, y)
+    else:  # Vertical
+        # Columnas lado a lado; cada columna reparte su alto entre sus casas
+        num_lines = condo.columnas
+        per_line = math.ceil(num_houses / num_lines)
+        lines = house_numbers(num_lines, per_line, num_houses)
+        if horizontal_start == 'derecha':
+            lines.reverse()
+        house_width = width / (num_lines + 2)
+        house_height = height / (per_line + 1)
+        for col, numbers in enumerate(lines):
+            if vertical_start == 'inferior':
+                numbers = numbers[::-1]
+            x = left + (width * (col + 1)) / (num_lines + 1)
+            for i, number in enumerate(numbers):
+                y = top + ((i + 1) * house_height)
+                yield number, (x - house_width/2, y - house_height/2, x + house_width/2, y + house_height/2), (x, y)
+
+
+def compile_layout(condominios, overrides=None, bounds=DEFAULT_BOUNDS):
+    """Compilar la geometría de todas las casas a partir de la especificación de cada condominio.
+
+    overrides es la sección 'layout' del JSON: house_id -> [x0, y0, x1, y1]
+    para ajustar a mano el rectángulo de una casa concreta; bounds, el lienzo del residencial.
+    """
+    overrides = overrides or {}
+    table = HouseTable(condominios, overrides, bounds)
+    for condo_id, condo in condominios.items():
+        first = len(table)
+        for number, rect, center in compile_condominio(condo):
+            house_id = f"{condo_id}-{number:02d}"
+            table.add(house_id, condo_id, number, overrides.get(house_id, rect))
+        table.by_condo[condo_id] = (first, len(table))
+    return table
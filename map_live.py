@@ -0,0 +1,112 @@
+import threading
+
+from map_cache import memory_size
+from map_occupancy import house_estados, house_number
+from map_render import ESTADO_COLORS, HOUSE_COLOR
+
+# Margen (px) de la ventana que se vuelve a dibujar alrededor de una casa: mayor que
+# cualquier número de casa, para que los textos que la tocan quepan completos
+PATCH_MARGIN = 32
+
+
+class LiveMap:
+    """Estado del mapa compartido por las sesiones y mantenido al día con los deltas del canal.
+
+    Un cambio de estado no vuelve a dibujar la capa base: se redibuja una
+    ventana alrededor de la casa y se pega solo su rectángulo (sobre una copia,
+    así que quien ya tiene la imagen anterior no la ve cambiar), se invalidan
+    las teselas que tocan la casa y se mueve la casa en los contadores. sequence es el último delta del canal que ya
+    reflejan las capas y los contadores (los de otros residenciales solo la
+    avanzan); revision, el último que cambió este residencial, sirve de clave
+    de caché para lo que se dibuja según el estado.
+    """
+
+    def __init__(self, residencial, table, counters, feed, sequence=0):
+        self.residencial = residencial
+        self.table = table
+        self.counters = counters
+        self.feed = feed
+        self.colors = None              # relleno de cada casa en el orden de la tabla
+        self.layers = {}                # (ancho, alto) -> capa base con los colores actuales
+        self.renderers = {}             # (ancho, alto) -> render(colores, clip) de esa capa
+        self.pyramid = None             # teselas (map_tiles), creadas al primer pedido
+        self.sequence = sequence
+        self.revision = sequence
+        self._lock = threading.Lock()
+        # Los contadores cambian de valores pero no de tamaño: se miden una vez
+        self._counters_bytes = memory_size(counters)
+
+    @property
+    def nbytes(self):
+        """Memoria de las capas y los contadores, para la caché de map_cache (la tabla se cuenta aparte)"""
+        layers = sum(layer.width * layer.height * len(layer.getbands()) for layer in list(self.layers.values()))
+        pyramid = self.pyramid.nbytes if self.pyramid is not None else 0
+        return layers + pyramid + self._counters_bytes
+
+    def house_colors(self):
+        """Relleno actual de cada casa en el orden de la tabla (la lista que actualizan los deltas)"""
+        if self.colors is None:
+            self.colors = [ESTADO_COLORS.get(estado, HOUSE_COLOR)
+                           for estado in house_estados(self.table, self.counters)]
+        return self.colors
+
+    def base_layer(self, width, height, render):
+        """Capa base de este tamaño; render(colores, clip=None) la dibuja completa solo la primera vez"""
+        with self._lock:
+            layer = self.layers.get((width, height))
+            if layer is None:
+                self.house_colors()
+                self.renderers[(width, height)] = render
+                layer = self.layers[(width, height)] = render(self.colors)
+            return layer
+
+    def tile_pyramid(self, create):
+        """Pirámide de teselas con los colores actuales; create(colores) la construye la primera vez"""
+        with self._lock:
+            if self.pyramid is None:
+                self.pyramid = create(self.house_colors())
+            return self.pyramid
+
+    def _repaint(self, size, index):
+        layer = self.layers[size]
+        rects, centers = self.table.scaled_layout(*self.table.scale(layer.width, layer.height))
+        x0, y0, x1, y1 = rects[4 * index:4 * index + 4].tolist()
+        x0, y0, x1, y1 = max(x0, 0), max(y0, 0), min(x1 + 1, layer.width), min(y1 + 1, layer.height)
+        if x0 >= x1 or y0 >= y1:
+            return
+        # La ventana repite el orden de dibujo de la capa completa (casas vecinas que se
+        # superponen, números, calles), así que dentro del rectángulo da los mismos pixeles
+        left, top = max(x0 - PATCH_MARGIN, 0), max(y0 - PATCH_MARGIN, 0)
+        clip = (left, top, min(x1 + PATCH_MARGIN, layer.width), min(y1 + PATCH_MARGIN, layer.height))
+        patch = self.renderers[size](self.colors, clip=clip)
+        layer = layer.copy()
+        layer.paste(patch.crop((x0 - left, y0 - top, x1 - left, y1 - top)), (x0, y0))
+        self.layers[size] = layer
+
+    def apply(self, deltas):
+        """Aplicar deltas en orden; los ya aplicados se ignoran, así que llegar dos veces no importa"""
+        with self._lock:
+            for delta in deltas:
+                if delta.sequence <= self.sequence:
+                    continue
+                if delta.residencial != self.residencial:
+                    self.sequence = delta.sequence
+                    continue
+                index = self.table.locate(delta.condominio, house_number(delta.key))
+                if index is not None and self.colors is not None:
+                    self.colors[index] = ESTADO_COLORS.get(delta.estado, HOUSE_COLOR)
+                    for size in self.layers:
+                        self._repaint(size, index)
+                    if self.pyramid is not None:
+                        self.pyramid.invalidate(index)
+                # Contadores y secuencia al final: quien los ve nuevos ya encuentra las capas repintadas
+                self.counters.set_estado(delta.key, delta.estado)
+                self.sequence = self.revision = delta.sequence
+
+    def sync(self):
+        """Ponerse al día con el canal; False si el historial ya no alcanza y hay que reconstruir"""
+        deltas = self.feed.since(self.sequence)
+        if deltas is None:
+            return False
+        self.apply(deltas)
+        return True
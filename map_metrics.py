@@ -0,0 +1,232 @@
+"""Instrumentación del camino caliente: tramos con nombre, contadores y exportación.
+
+span('nombre') mide un tramo (se anidan) y count('nombre', n) suma a un
+contador. Van a dos lugares, cada uno opcional:
+
+- el registro del proceso (RESIDENCIAL_METRICS=1): histogramas de tiempos y
+  contadores acumulados, exportables como texto de Prometheus y, por rerun,
+  como una línea JSON en el logger 'residencial.metrics';
+- la traza del rerun en curso en este hilo (begin_trace), que es lo que muestra
+  el panel de depuración de una sesión.
+
+Sin ninguno de los dos, span devuelve un contexto vacío compartido y count
+regresa enseguida: el costo es una lectura de variable por llamada.
+"""
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+ENABLED = os.environ.get('RESIDENCIAL_METRICS', '') not in ('', '0')
+
+# Límites (s) de los histogramas de tramos
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Prefijo de las métricas exportadas
+PREFIX = 'residencial'
+
+logger = logging.getLogger('residencial.metrics')
+
+_local = threading.local()
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Trace:
+    """Tramos (nombre, profundidad, ms) y contadores de un rerun, en orden de inicio"""
+
+    def __init__(self):
+        self.spans = []
+        self.counters = Counter()
+        self.depth = 0
+        self.start = time.perf_counter()
+        self.total_ms = None
+
+    def summary(self):
+        """{nombre: ms} sumando los tramos repetidos"""
+        totals = Counter()
+        for name, depth, ms in self.spans:
+            totals[name] += ms or 0.0
+        return dict(totals)
+
+
+class Registry:
+    """Histogramas de tramos y contadores acumulados del proceso"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.spans = {}         # nombre -> [cuenta por límite..., +Inf, suma]
+        self.counters = Counter()
+
+    def observe(self, name, seconds):
+        with self._lock:
+            histogram = self.spans.get(name)
+            if histogram is None:
+                histogram = self.spans[name] = [0] * (len(BUCKETS) + 1) + [0.0]
+            for i, limit in enumerate(BUCKETS):
+                if seconds <= limit:
+                    histogram[i] += 1
+            histogram[len(BUCKETS)] += 1
+            histogram[-1] += seconds
+
+    def add(self, name, value):
+        with self._lock:
+            self.counters[name] += value
+
+    def prometheus(self, gauges=None):
+        """Formato de texto de Prometheus; gauges = {nombre: valor} se agrega tal cual"""
+        lines = [f"# TYPE {PREFIX}_span_seconds histogram"]
+        with self._lock:
+            spans = {name: list(histogram) for name, histogram in self.spans.items()}
+            counters = dict(self.counters)
+        for name, histogram in sorted(spans.items()):
+            label = f'span="{name}"'
+            for limit, total in zip(BUCKETS, histogram):
+                lines.append(f'{PREFIX}_span_seconds_bucket{{{label},le="{limit}"}} {total}')
+            lines.append(f'{PREFIX}_span_seconds_bucket{{{label},le="+Inf"}} {histogram[len(BUCKETS)]}')
+            lines.append(f'{PREFIX}_span_seconds_sum{{{label}}} {histogram[-1]:.6f}')
+            lines.append(f'{PREFIX}_span_seconds_count{{{label}}} {histogram[len(BUCKETS)]}')
+        for name, value in sorted(counters.items()):
+            metric = f"{PREFIX}_{_metric_name(name)}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        for name, value in sorted((gauges or {}).items()):
+            metric = f"{PREFIX}_{_metric_name(name)}"
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+def _metric_name(name):
+    return ''.join(c if c.isalnum() else '_' for c in name).lower()
+
+
+REGISTRY = Registry()
+
+
+class _Span:
+    __slots__ = ('name', 'trace', 'index', 'start')
+
+    def __init__(self, name, trace):
+        self.name = name
+        self.trace = trace
+
+    def __enter__(self):
+        trace = self.trace
+        if trace is not None:
+            self.index = len(trace.spans)
+            trace.spans.append((self.name, trace.depth, None))
+            trace.depth += 1
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        trace = self.trace
+        if trace is not None:
+            trace.depth -= 1
+            trace.spans[self.index] = (self.name, trace.depth, elapsed * 1000)
+        if ENABLED:
+            REGISTRY.observe(self.name, elapsed)
+        return False
+
+
+def span(name):
+    """Contexto que mide el tramo name (vacío si no hay registro ni traza activos)"""
+    trace = getattr(_local, 'trace', None)
+    if trace is None and not ENABLED:
+        return _NULL_SPAN
+    return _Span(name, trace)
+
+
+def traced(name):
+    """Decorador: cada llamada a la función es un tramo name"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def count(name, value=1):
+    trace = getattr(_local, 'trace', None)
+    if trace is None and not ENABLED:
+        return
+    if trace is not None:
+        trace.counters[name] += value
+    if ENABLED:
+        REGISTRY.add(name, value)
+
+
+def begin_trace():
+    """Empezar la traza de un rerun en este hilo"""
+    _local.trace = Trace()
+    return _local.trace
+
+
+def end_trace():
+    """Cerrar la traza del hilo; con el registro activo, escribirla como una línea JSON en el log"""
+    trace = getattr(_local, 'trace', None)
+    _local.trace = None
+    if trace is None:
+        return None
+    trace.total_ms = (time.perf_counter() - trace.start) * 1000
+    if ENABLED:
+        REGISTRY.observe('rerun', trace.total_ms / 1000)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({'rerun_ms': round(trace.total_ms, 2),
+                                    'tramos': {name: round(ms, 2) for name, ms in trace.summary().items()},
+                                    'contadores': dict(trace.counters)}, ensure_ascii=False))
+    return trace
+
+
+if ENABLED and not logger.handlers:
+    # Una línea por rerun en stderr, junto a los mensajes de Streamlit
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter('%(asctime)s %(name)s %(message)s'))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+class Exporter:
+    """Escribe el texto de Prometheus en un archivo, como mucho una vez cada interval segundos.
+
+    gauges() da valores instantáneos para agregar (tamaño de cachés, pedidos en curso).
+    """
+
+    def __init__(self, path, gauges=None, interval=5.0):
+        self.path = path
+        self.gauges = gauges
+        self.interval = interval
+        self._last = 0.0
+        self._lock = threading.Lock()
+
+    def maybe_export(self):
+        if not ENABLED:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last < self.interval:
+                return
+            self._last = now
+        content = REGISTRY.prometheus(self.gauges() if self.gauges else None)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,142 @@
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping
+
+_LEADING_NUMBER = re.compile(r'\s*(\d+(?:[.,]\d+)?)')
+_TRAILING_NUMBER = re.compile(r'(\d+)$')
+
+
+def metros(tamano):
+    """Metros cuadrados de un tamaño como '120m²'; 0 si no se indica"""
+    match = _LEADING_NUMBER.match(tamano or '')
+    return float(match.group(1).replace(',', '.')) if match else 0.0
+
+
+def house_number(key):
+    """Número de la casa dentro de su condominio, tomado del final de su clave ('E7-01' -> 1)"""
+    match = _TRAILING_NUMBER.search(key)
+    return int(match.group(1)) if match else None
+
+
+@dataclass(frozen=True)
+class Occupancy:
+    """Resumen de un condominio o del residencial completo"""
+    casas: int
+    por_estado: Mapping[str, int]
+    metros: float
+    metros_por_estado: Mapping[str, float]
+
+
+class OccupancyCounters:
+    """Conteos de casas y metros por estado, por condominio y del residencial.
+
+    Se construyen con un recorrido de las casas y después cada cambio de estado
+    mueve una casa de un contador a otro en O(1); leer un resumen no recorre
+    casas. revision aumenta con cada cambio (sirve de clave de caché para lo
+    que se dibuja según el estado).
+    """
+
+    def __init__(self):
+        self.houses = {}            # clave -> (condominio, estado, metros)
+        self.counts = {}            # condominio -> Counter(estado -> casas)
+        self.areas = {}             # condominio -> Counter(estado -> metros)
+        self.total_counts = Counter()
+        self.total_areas = Counter()
+        self.revision = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.houses)
+
+    def _apply(self, key, entry, sign):
+        condo, estado, area = entry
+        self.counts.setdefault(condo, Counter())[estado] += sign
+        self.areas.setdefault(condo, Counter())[estado] += sign * area
+        self.total_counts[estado] += sign
+        self.total_areas[estado] += sign * area
+        if sign > 0:
+            self.houses[key] = entry
+        else:
+            del self.houses[key]
+
+    def update(self, key, house):
+        """Agregar, reemplazar o (house=None) quitar una casa"""
+        with self._lock:
+            old = self.houses.get(key)
+            if old is not None:
+                self._apply(key, old, -1)
+            if house is not None:
+                self._apply(key, (house.condominio, house.estado, metros(house.tamano)), 1)
+            self.revision += 1
+
+    def set_estado(self, key, estado):
+        """Cambiar el estado de una casa conocida; devuelve el anterior o None si no existe"""
+        with self._lock:
+            old = self.houses.get(key)
+            if old is None:
+                return None
+            if old[1] != estado:
+                self._apply(key, old, -1)
+                self._apply(key, (old[0], estado, old[2]), 1)
+                self.revision += 1
+            return old[1]
+
+    def entries(self):
+        """Copia de (clave, (condominio, estado, metros)) de todas las casas"""
+        with self._lock:
+            return list(self.houses.items())
+
+    def estado(self, key):
+        entry = self.houses.get(key)
+        return entry[1] if entry is not None else None
+
+    def summary(self, condominio=None):
+        """Occupancy de un condominio, o del residencial si condominio es None"""
+        with self._lock:
+            if condominio is None:
+                counts, areas = self.total_counts, self.total_areas
+            else:
+                counts, areas = self.counts.get(condominio, Counter()), self.areas.get(condominio, Counter())
+            por_estado = {estado: n for estado, n in sorted(counts.items()) if n}
+            metros_por_estado = {estado: areas[estado] for estado in por_estado}
+            return Occupancy(
+                casas=sum(por_estado.values()),
+                por_estado=MappingProxyType(por_estado),
+                metros=sum(metros_por_estado.values()),
+                metros_por_estado=MappingProxyType(metros_por_estado),
+            )
+
+
+def build_counters(houses):
+    """Contadores a partir de un Mapping clave -> House (del JSON, del .rmap o del repositorio)"""
+    counters = OccupancyCounters()
+    for key, house in houses.items():
+        counters._apply(key, (house.condominio, house.estado, metros(house.tamano)), 1)
+    return counters
+
+
+def house_estados(table, counters):
+    """Estado de cada casa de la tabla (lista en el orden de table.ids; None si no tiene registro)"""
+    estados = [None] * len(table)
+    for key, (condo, estado, area) in counters.entries():
+        index = table.locate(condo, house_number(key))
+        if index is not None:
+            estados[index] = estado
+    return estados
+
+
+def house_keys(table, houses):
+    """Clave del registro de cada casa de la tabla: {house_id de la tabla: clave} (solo las que tienen registro).
+
+    Las claves de los registros no tienen por qué ser las de la tabla ('E7-01' frente a
+    'eucalipto_7-01'): se emparejan por condominio y número de casa.
+    """
+    keys = {}
+    for key, house in houses.items():
+        index = table.locate(house.condominio, house_number(key))
+        if index is not None:
+            keys[table.ids[index]] = key
+    return keys
@@ -0,0 +1,87 @@
+"""Registro de residenciales: cada uno con su archivo de datos, su lienzo y su base SQLite.
+
+Además de houses_data.json (el residencial 'principal'), cada .json o .rmap
+de la carpeta RESIDENCIALES_DIR (residenciales/ junto a los módulos, si
+existe) es un residencial cuyo id es el nombre del archivo. Nada se lee al
+registrar: los datos se cargan la primera vez que se piden y viven en la
+caché acotada del proceso (map_cache), y la base se abre al primer uso.
+"""
+import os
+import threading
+from dataclasses import dataclass
+
+from map_data import DATA_FILE, STORE_EXTENSION, load_residencial
+from map_repository import DB_FILE, HouseRepository
+
+RESIDENCIALES_DIR = os.environ.get(
+    'RESIDENCIALES_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'residenciales'))
+
+# Id del residencial de houses_data.json (o de RESIDENCIAL_DATA)
+DEFAULT_ID = 'principal'
+
+
+@dataclass(frozen=True)
+class ResidencialEntry:
+    id: str
+    nombre: str
+    path: str
+    db_path: str
+
+
+class ResidencialRegistry:
+    """Residenciales disponibles, en orden de registro"""
+
+    def __init__(self):
+        self.entries = {}
+        self._repositories = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __contains__(self, residencial_id):
+        return residencial_id in self.entries
+
+    def __getitem__(self, residencial_id):
+        return self.entries[residencial_id]
+
+    def register(self, residencial_id, path, nombre=None, db_path=None):
+        if db_path is None:
+            db_path = os.path.join(os.path.dirname(DB_FILE), f"houses_{residencial_id}.db")
+        entry = ResidencialEntry(residencial_id, nombre or residencial_id.replace('_', ' ').title(),
+                                 os.path.abspath(path), db_path)
+        self.entries[residencial_id] = entry
+        return entry
+
+    def load(self, residencial_id):
+        """Residencial con sus datos; un os.stat si ya está en la caché, lectura completa si no"""
+        return load_residencial(self.entries[residencial_id].path)
+
+    def repository(self, residencial_id):
+        """Repositorio SQLite del residencial, abierto la primera vez que se pide"""
+        with self._lock:
+            repository = self._repositories.get(residencial_id)
+            if repository is None:
+                repository = self._repositories[residencial_id] = HouseRepository(
+                    self.entries[residencial_id].db_path)
+            return repository
+
+
+def discover_registry(directory=RESIDENCIALES_DIR, default=DATA_FILE):
+    """Registro con el residencial principal y los archivos de datos de directory"""
+    registry = ResidencialRegistry()
+    registry.register(DEFAULT_ID, default, nombre="Residencial principal", db_path=DB_FILE)
+    if os.path.isdir(directory):
+        files = {}
+        for filename in sorted(os.listdir(directory)):
+            stem, extension = os.path.splitext(filename)
+            # Si hay .json y .rmap del mismo residencial se usa el .rmap
+            if (extension == '.json' and stem not in files) or extension == STORE_EXTENSION:
+                files[stem] = os.path.join(directory, filename)
+        for stem, path in files.items():
+            if stem != DEFAULT_ID and os.path.abspath(path) != os.path.abspath(default):
+                registry.register(stem, path)
+    return registry
@@ -0,0 +1,314 @@
+import numpy as np
+from PIL import Image, ImageColor, ImageDraw
+
+from map_data import DEFAULT_BOUNDS
+from map_labels import place_street_labels
+from map_metrics import count, span
+from map_sprites import glyph_mask, label_sprite
+
+# Dimensiones del lienzo de las coordenadas del JSON cuando el residencial no indica las suyas
+SOURCE_WIDTH, SOURCE_HEIGHT = DEFAULT_BOUNDS
+
+HOUSE_COLOR = '#F5F5F5'
+SELECTED_COLOR = 'yellow'
+
+# Relleno de cada casa según su estado; las casas sin registro conservan HOUSE_COLOR
+ESTADO_COLORS = {
+    'Disponible': '#C1F0C1',
+    'Ocupada': '#ADD8E6',
+    'Reservada': '#FFDAB9',
+}
+
+# A partir de este área (px) un rectángulo se pinta con slicing en vez de índices por pixel
+SLICE_MIN_AREA = 256
+
+
+def draw_house(draw, rect, label, font, fill_color=HOUSE_COLOR, center=None):
+    draw.rectangle([(rect[0], rect[1]), (rect[2], rect[3])], fill=fill_color, outline='black')
+    if center is None:
+        center = ((rect[0] + rect[2]) / 2, (rect[1] + rect[3]) / 2)
+    draw.text(center, label, fill='black', font=font, anchor="mm")
+
+
+def _pixel_word(color):
+    """Color como entero de 32 bits RGBA para escribir un pixel con una sola asignación"""
+    red, green, blue = ImageColor.getrgb(color)[:3]
+    return np.array([red, green, blue, 255], dtype=np.uint8).view(np.uint32)[0]
+
+
+def new_canvas(width, height, color='white'):
+    """Buffer RGBA (un uint32 por pixel) sobre el que se dibujan los rectángulos en lote"""
+    return np.full((height, width), _pixel_word(color), dtype=np.uint32)
+
+
+def canvas_to_image(canvas):
+    height, width = canvas.shape
+    return Image.frombytes('RGB', (width, height), canvas, 'raw', 'RGBX')
+
+
+def _ragged_arange(lengths):
+    """Concatenación de arange(n) para cada n de lengths, sin bucle de Python"""
+    return np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+
+def _fill_spans(flat, width, x0, y0, x1, y1, word):
+    """Pintar rectángulos semiabiertos [x0, x1) x [y0, y1) sobre el buffer plano.
+
+    Genera los índices de todos los pixeles con aranges concatenados, sin bucle por rectángulo.
+    """
+    flat[_span_pixels(width, x0, y0, x1, y1)[0]] = word
+
+
+def _span_pixels(width, x0, y0, x1, y1):
+    """Índices planos de los pixeles de cada rectángulo semiabierto y el rectángulo de cada uno"""
+    widths = x1 - x0
+    heights = y1 - y0
+    valid = np.flatnonzero((widths > 0) & (heights > 0))
+    x0, y0, widths, heights = x0[valid], y0[valid], widths[valid], heights[valid]
+    # Una entrada por fila de cada rectángulo
+    rect_of_row = np.repeat(np.arange(len(x0)), heights)
+    row_start = (y0[rect_of_row] + _ragged_arange(heights)) * width + x0[rect_of_row]
+    row_width = widths[rect_of_row]
+    # Una entrada por pixel de cada fila
+    pixels = np.repeat(row_start, row_width) + _ragged_arange(row_width)
+    return pixels, valid[np.repeat(rect_of_row, row_width)]
+
+
+def fill_rects(canvas, rects, fill_color, outline='black'):
+    """Dibujar en lote rectángulos x0, y0, x1, y1 (bordes inclusivos, como draw.rectangle)"""
+    height, width = canvas.shape
+    flat = canvas.reshape(-1)
+    boxes = np.asarray(rects, dtype=np.int64).reshape(-1, 4)
+    x0 = np.clip(boxes[:, 0], 0, width)
+    y0 = np.clip(boxes[:, 1], 0, height)
+    x1 = np.clip(boxes[:, 2] + 1, 0, width)
+    y1 = np.clip(boxes[:, 3] + 1, 0, height)
+    # Los que quedan fuera del lienzo (al dibujar una ventana de la capa) no se pintan
+    inside = (x0 < x1) & (y0 < y1)
+    if not inside.all():
+        x0, y0, x1, y1 = x0[inside], y0[inside], x1[inside], y1[inside]
+
+    # Los rectángulos grandes son pocos: contorno y relleno con dos asignaciones por slicing
+    big = (x1 - x0) * (y1 - y0) >= SLICE_MIN_AREA
+    fill_word = _pixel_word(fill_color)
+    outline_word = _pixel_word(outline)
+    for left, top, right, bottom in zip(x0[big].tolist(), y0[big].tolist(), x1[big].tolist(), y1[big].tolist()):
+        canvas[top:bottom, left:right] = outline_word
+        canvas[top + 1:bottom - 1, left + 1:right - 1] = fill_word
+    small = ~big
+    x0, y0, x1, y1 = x0[small], y0[small], x1[small], y1[small]
+
+    # Los pequeños (casas a escala de mapa completo): interior y contorno como cuatro franjas
+    _fill_spans(flat, width, x0 + 1, y0 + 1, x1 - 1, y1 - 1, fill_word)
+    _fill_spans(
+        flat, width,
+        np.concatenate([x0, x0, x0, x1 - 1]),
+        np.concatenate([y0, y1 - 1, y0, y0]),
+        np.concatenate([x1, x1, x0 + 1, x1]),
+        np.concatenate([y0 + 1, y1, y1, y1]),
+        outline_word
+    )
+
+
+def draw_labels_batch(canvas, rects, labels, font, centers=None):
+    """Escribir en negro el texto de cada rectángulo copiando glifos prerasterizados.
+
+    centers (x, y planos) es donde PIL habría anclado el texto; por omisión el
+    centro de cada rectángulo.
+    """
+    height, width = canvas.shape
+    boxes = np.asarray(rects, dtype=np.int64).reshape(-1, 4)
+    if not len(boxes):
+        return
+    if centers is None:
+        centers = np.column_stack([(boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2])
+    centers = np.asarray(centers, dtype=np.float64).reshape(-1, 2)
+    centers_x = np.floor(centers[:, 0]).astype(np.int64)
+    centers_y = np.floor(centers[:, 1]).astype(np.int64)
+    # FreeType posiciona el texto en 1/64 de pixel: la fracción truncada a 1/64 da el mismo glifo
+    fractions_x = np.floor((centers[:, 0] - centers_x) * 64).astype(np.int64)
+    fractions_y = np.floor((centers[:, 1] - centers_y) * 64).astype(np.int64)
+
+    # Un glifo por (texto, fracción del centro); cada casa guarda el índice de su glifo
+    glyph_ids = {}
+    glyphs = []
+    house_glyphs = np.empty(len(boxes), dtype=np.int64)
+    for i, key in enumerate(zip(labels, fractions_x.tolist(), fractions_y.tolist())):
+        glyph_id = glyph_ids.get(key)
+        if glyph_id is None:
+            glyph_id = glyph_ids[key] = len(glyphs)
+            glyphs.append(glyph_mask(key[0], font, key[1] / 64, key[2] / 64))
+        house_glyphs[i] = glyph_id
+
+    # Tablas concatenadas de desplazamientos y alfa de todos los glifos
+    empty = (np.zeros(0, dtype=np.int64),) * 2 + (np.zeros(0, dtype=np.uint8), (0, 0, -1, -1))
+    glyphs = [glyph if glyph is not None else empty for glyph in glyphs]
+    lengths = np.array([len(glyph[2]) for glyph in glyphs], dtype=np.int64)
+    starts = np.cumsum(lengths) - lengths
+    offsets = np.concatenate([glyph[0] * width + glyph[1] for glyph in glyphs])
+    alpha = np.concatenate([glyph[2] for glyph in glyphs])
+    bounds = np.array([glyph[3] for glyph in glyphs], dtype=np.int64)[house_glyphs]
+
+    # Descartar los textos que se saldrían del lienzo
+    inside = ((centers_x + bounds[:, 0] >= 0) & (centers_y + bounds[:, 1] >= 0) &
+              (centers_x + bounds[:, 2] < width) & (centers_y + bounds[:, 3] < height))
+    counts = lengths[house_glyphs[inside]]
+    if not counts.sum():
+        return
+    source = np.repeat(starts[house_glyphs[inside]], counts) + _ragged_arange(counts)
+    targets = np.repeat(centers_y[inside] * width + centers_x[inside], counts) + offsets[source]
+    coverage = alpha[source]
+
+    # PIL dibuja casa por casa: lo que un número sobresale de su casa queda bajo las casas siguientes
+    spills = inside & ((centers_x + bounds[:, 0] < boxes[:, 0]) | (centers_y + bounds[:, 1] < boxes[:, 1]) |
+                       (centers_x + bounds[:, 2] > boxes[:, 2]) | (centers_y + bounds[:, 3] > boxes[:, 3]))
+    if spills.any():
+        pixels, owners = _span_pixels(width,
+                                      np.clip(boxes[:, 0], 0, width), np.clip(boxes[:, 1], 0, height),
+                                      np.clip(boxes[:, 2] + 1, 0, width), np.clip(boxes[:, 3] + 1, 0, height))
+        last = np.full(height * width, -1, dtype=np.int64)
+        np.maximum.at(last, pixels, owners)
+        visible = last[targets] <= np.repeat(np.flatnonzero(inside), counts)
+        targets, coverage = targets[visible], coverage[visible]
+
+    # Texto negro: los pixeles opacos se escriben directo y los del borde suavizado se mezclan
+    flat = canvas.reshape(-1)
+    opaque = coverage == 255
+    flat[targets[opaque]] = _pixel_word('black')
+    partial = targets[~opaque]
+    if len(partial):
+        keep = (255 - coverage[~opaque].astype(np.uint32))[:, None]
+        channels = flat[partial].view(np.uint8).reshape(-1, 4)
+        # Misma división entre 255 con redondeo que usa PIL al mezclar
+        blended = channels[:, :3] * keep + 128
+        channels[:, :3] = (blended + (blended >> 8)) >> 8
+        flat[partial] = channels.view(np.uint32).reshape(-1)
+
+
+def house_batches(house_colors):
+    """Colores de casa en el orden en que se pintan sus lotes.
+
+    El orden es fijo (no depende de qué casa aparece primero) para que cambiar
+    el color de una casa no cambie cómo se pintan los bordes compartidos de las demás.
+    """
+    return sorted(set(house_colors))
+
+
+def render_base_layer(areas, condominios, calles, table, width, height, font, street_labels=None,
+                      house_colors=None, clip=None):
+    """Dibujar la capa estática del mapa (áreas, condominios, casas y calles) sin selección.
+
+    street_labels es la colocación de place_street_labels para este tamaño; si
+    no se pasa se calcula aquí. house_colors es el relleno de cada casa en el
+    orden de la tabla (por omisión, todas HOUSE_COLOR). clip = (x0, y0, x1, y1)
+    dibuja solo esa ventana de la capa (semiabierta), con los mismos pixeles que
+    la capa completa salvo cerca de su borde: ahí los rectángulos recortados se
+    cierran con contorno y se omiten los números que no caben completos. Con
+    clip solo se recorre lo que toca la ventana, así que el costo sigue a la
+    ventana y no al tamaño del residencial.
+    """
+    # Factor de escala para ajustar todas las coordenadas (del lienzo del residencial a la imagen)
+    scale_x, scale_y = table.scale(width, height)
+    left, top, right, bottom = clip if clip is not None else (0, 0, width, height)
+
+    def scaled(coords):
+        return (int(coords[0] * scale_x) - left, int(coords[1] * scale_y) - top,
+                int(coords[2] * scale_x) - left, int(coords[3] * scale_y) - top)
+
+    def touches(x0, y0, x1, y1, pad=1):
+        # ¿La caja (coordenadas del lienzo) puede tocar la ventana? Incluir de más no cambia el dibujo
+        return clip is None or (x0 * scale_x - pad < right and x1 * scale_x + pad >= left and
+                                y0 * scale_y - pad < bottom and y1 * scale_y + pad >= top)
+
+    # Rectángulos en lote sobre un buffer en blanco: áreas (fondo), condominios y casas
+    with span('capa.rectangulos'):
+        canvas = new_canvas(right - left, bottom - top)
+        for color in ('#00CED1', '#90EE90'):
+            rects = [scaled(area.coords) for area in areas.values()
+                     if ('#00CED1' if area.tipo == 'alberca_pergola' else '#90EE90') == color
+                     and touches(*area.coords)]
+            fill_rects(canvas, rects, color)
+        fill_rects(canvas, [scaled(condo.coords) for condo in condominios.values() if touches(*condo.coords)],
+                   HOUSE_COLOR)
+
+        # Casas: geometría precompilada en la tabla y números con glifos prerasterizados
+        house_rects, house_centers = table.scaled_layout(scale_x, scale_y)
+        boxes = house_rects.reshape(-1, 4)
+        centers = house_centers.reshape(-1, 2)
+        labels = table.labels
+        if house_colors is None:
+            house_colors = [HOUSE_COLOR] * len(boxes)
+        if clip is not None:
+            # Solo las casas que tocan la ventana, en coordenadas de la ventana
+            visible = np.flatnonzero((boxes[:, 0] < right) & (boxes[:, 2] >= left) &
+                                     (boxes[:, 1] < bottom) & (boxes[:, 3] >= top)).tolist()
+            boxes = boxes[visible] - np.array([left, top, left, top], dtype=boxes.dtype)
+            centers = centers[visible] - (left, top)
+            labels = [labels[i] for i in visible]
+            house_colors = [house_colors[i] for i in visible]
+        fills = np.asarray(house_colors, dtype=object)
+        # Un lote de fill_rects por color
+        for color in house_batches(fills.tolist()):
+            fill_rects(canvas, boxes[fills == color], color)
+    count('capa.casas', len(boxes))
+    with span('capa.numeros'):
+        draw_labels_batch(canvas, boxes, labels, font, centers)
+        img = canvas_to_image(canvas)
+    draw = ImageDraw.Draw(img)
+
+    with span('capa.calles'):
+        # Etiquetas de las áreas
+        for area_id, area in areas.items():
+            sprite = label_sprite(area.descripcion, font)
+            if sprite is None:
+                continue
+            # El texto puede salir del área: se compara la caja de la etiqueta con la ventana
+            image, (dx, dy) = sprite
+            coords = area.coords
+            x = int((coords[0] + coords[2]) * scale_x / 2) + dx
+            y = int((coords[1] + coords[3]) * scale_y / 2) + dy
+            if x < right and x + image.width > left and y < bottom and y + image.height > top:
+                img.paste(image, (x - left, y - top), image)
+
+        # Dibujar las líneas de las calles
+        for calle_id, calle in calles.items():
+            if not touches(min(calle.start[0], calle.end[0]), min(calle.start[1], calle.end[1]),
+                           max(calle.start[0], calle.end[0]), max(calle.start[1], calle.end[1]),
+                           pad=calle.width * scale_x):
+                continue
+            draw.line(
+                [
+                    (int(calle.start[0] * scale_x) - left, int(calle.start[1] * scale_y) - top),
+                    (int(calle.end[0] * scale_x) - left, int(calle.end[1] * scale_y) - top)
+                ],
+                fill='gray',
+                width=int(calle.width * scale_x)
+            )
+
+    # Dibujar las etiquetas de las calles al final (por encima de todo)
+    if street_labels is None:
+        street_labels = place_street_labels(calles, font, scale_x, scale_y)
+    pasted = 0
+    with span('capa.etiquetas_calle'):
+        for calle_id, (x, y, angle) in street_labels.items():
+            sprite = label_sprite(calles[calle_id].id, font, 'white', angle)[0]
+            if x < right and x + sprite.width > left and y < bottom and y + sprite.height > top:
+                img.paste(sprite, (x - left, y - top), sprite)
+                pasted += 1
+    count('capa.etiquetas_calle', pasted)
+
+    return img
+
+
+def draw_selection(base, table, house_id, font):
+    """Componer la casa seleccionada sobre una copia de la capa base"""
+    img = base.copy()
+    index = table.positions.get(house_id)
+    if index is None:
+        return img
+
+    rects, centers = table.scaled_layout(*table.scale(img.width, img.height))
+    rect = rects[4 * index:4 * index + 4].tolist()
+    center = centers[2 * index:2 * index + 2].tolist()
+    draw_house(ImageDraw.Draw(img), rect, table.labels[index], font, fill_color=SELECTED_COLOR, center=center)
+    return img
@@ -0,0 +1,250 @@
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from map_data import house_from_dict, load_residencial
+
+# Base de datos junto a los módulos; RESIDENCIAL_DB permite apuntar a otra
+DB_FILE = os.environ.get('RESIDENCIAL_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'houses.db'))
+
+# Filas por sentencia executemany en las escrituras por lotes (y parámetros de un IN, bajo el límite de 999)
+BATCH_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS houses (
+    key TEXT PRIMARY KEY,
+    id TEXT NOT NULL,
+    condominio TEXT NOT NULL,
+    direccion TEXT NOT NULL,
+    estado TEXT NOT NULL,
+    propietario TEXT COLLATE NOCASE,
+    tamano TEXT,
+    historial_pagos TEXT NOT NULL DEFAULT '[]',
+    deuda_actual REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS houses_condominio ON houses (condominio);
+CREATE INDEX IF NOT EXISTS houses_estado ON houses (estado);
+CREATE INDEX IF NOT EXISTS houses_propietario ON houses (propietario);
+CREATE INDEX IF NOT EXISTS houses_tamano ON houses (tamano);
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS imported (key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, estado TEXT NOT NULL);
+"""
+
+COLUMNS = ('key', 'id', 'condominio', 'direccion', 'estado', 'propietario', 'tamano', 'historial_pagos',
+           'deuda_actual')
+
+
+class ConnectionPool:
+    """Conexiones SQLite reutilizables entre hilos (las sesiones de Streamlit corren en hilos)"""
+
+    def __init__(self, path, size=4):
+        self.path = path
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _connect(self):
+        # isolation_level=None: sin transacciones implícitas, las escrituras abren BEGIN IMMEDIATE
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @contextmanager
+    def connection(self):
+        with self._slots:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            try:
+                yield conn
+            finally:
+                self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def _row_to_house(row):
+    house = dict(row)
+    house['historial_pagos'] = json.loads(house['historial_pagos'])
+    return house_from_dict(house)
+
+
+def _house_row(key, house):
+    return (key, house.id, house.condominio, house.direccion, house.estado, house.propietario, house.tamano,
+            json.dumps([dict(p) for p in house.historial_pagos], ensure_ascii=False), house.deuda_actual)
+
+
+def _fingerprint(row):
+    """Huella de la fila tal como viene del JSON, para saber si cambió desde la última importación"""
+    return hashlib.sha1(json.dumps(row, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def _batches(rows, size=BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class HouseRepository:
+    """Registros de casas en SQLite (WAL): consultas por índice y escrituras concurrentes por lotes.
+
+    La geometría sigue en houses_data.json; aquí viven los datos de cada casa
+    (estado, propietario, tamaño...) que cambian durante la operación.
+    """
+
+    def __init__(self, path=DB_FILE, pool_size=4):
+        self.pool = ConnectionPool(path, pool_size)
+        with self.pool.connection() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _transaction(self):
+        with self.pool.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+
+    def import_residencial(self, residencial):
+        """Llevar a la base las casas nuevas o cambiadas del JSON, borrar las que ya no están y recordar su versión.
+
+        La tabla imported guarda, por casa, la huella de su fila en el JSON y el
+        estado que traía. Las casas sin cambios no se tocan. En una casa que
+        cambió, el estado del JSON solo se aplica si también cambió en el JSON;
+        si no, se conserva el de la base (puede venir del panel).
+        Devuelve (casas escritas, casas borradas).
+        """
+        placeholders = ', '.join('?' * len(COLUMNS))
+        with self._transaction() as conn:
+            imported = {row['key']: (row['fingerprint'], row['estado'])
+                        for row in conn.execute('SELECT key, fingerprint, estado FROM imported')}
+            current = dict(conn.execute('SELECT key, estado FROM houses').fetchall())
+            rows = []
+            marks = []
+            for key, house in residencial.houses.items():
+                row = _house_row(key, house)
+                fingerprint = _fingerprint(row)
+                previous = imported.get(key)
+                if key in current and previous is not None and previous[0] == fingerprint:
+                    continue
+                if key in current and (previous is None or previous[1] == house.estado):
+                    row = row[:4] + (current[key],) + row[5:]
+                rows.append(row)
+                marks.append((key, fingerprint, house.estado))
+            for batch in _batches(rows):
+                conn.executemany(f"INSERT OR REPLACE INTO houses ({', '.join(COLUMNS)}) VALUES ({placeholders})",
+                                 batch)
+            for batch in _batches(marks):
+                conn.executemany('INSERT OR REPLACE INTO imported (key, fingerprint, estado) VALUES (?, ?, ?)', batch)
+            removed = [(key,) for key in current.keys() | imported.keys() if key not in residencial.houses]
+            for batch in _batches(removed):
+                conn.executemany('DELETE FROM houses WHERE key = ?', batch)
+                conn.executemany('DELETE FROM imported WHERE key = ?', batch)
+            conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('json_version', ?)",
+                         (residencial.version,))
+        return len(rows), len(removed)
+
+    def sync_with(self, residencial):
+        """Importar el JSON solo si cambió desde la última importación; los estados cambiados aquí se conservan"""
+        with self.pool.connection() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE name = 'json_version'").fetchone()
+        if row is None or row['value'] != residencial.version:
+            self.import_residencial(residencial)
+
+    def get(self, key):
+        """Casa por clave o None"""
+        with self.pool.connection() as conn:
+            row = conn.execute('SELECT * FROM houses WHERE key = ?', (key,)).fetchone()
+        return _row_to_house(row) if row is not None else None
+
+    def find(self, condominio=None, estado=None, propietario=None, tamano=None, limit=200):
+        """Casas que cumplen los filtros: [(clave, House)], ordenadas por clave.
+
+        propietario se compara como prefijo sin distinguir mayúsculas (usa su índice NOCASE).
+        """
+        conditions = []
+        params = []
+        for column, value in (('condominio', condominio), ('estado', estado), ('tamano', tamano)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if propietario:
+            escaped = propietario.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            conditions.append("propietario LIKE ? ESCAPE '\\'")
+            params.append(escaped + '%')
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        params.append(-1 if limit is None else limit)
+        with self.pool.connection() as conn:
+            rows = conn.execute(f'SELECT * FROM houses {where} ORDER BY key LIMIT ?', params).fetchall()
+        return [(row['key'], _row_to_house(row)) for row in rows]
+
+    def distinct(self, column):
+        """Valores distintos de estado, tamano o condominio (para los filtros del panel)"""
+        if column not in ('estado', 'tamano', 'condominio'):
+            raise ValueError(f"columna no filtrable: {column}")
+        with self.pool.connection() as conn:
+            rows = conn.execute(f'SELECT DISTINCT {column} FROM houses WHERE {column} IS NOT NULL '
+                                f'ORDER BY {column}').fetchall()
+        return [row[0] for row in rows]
+
+    def count_by_estado(self, condominio=None):
+        """{estado: número de casas}, de todo el residencial o de un condominio"""
+        query = 'SELECT estado, COUNT(*) FROM houses'
+        params = ()
+        if condominio is not None:
+            query += ' WHERE condominio = ?'
+            params = (condominio,)
+        with self.pool.connection() as conn:
+            return dict(conn.execute(query + ' GROUP BY estado', params).fetchall())
+
+    def set_estados(self, changes):
+        """Cambiar el estado de varias casas en una sola transacción: changes = [(clave, estado)].
+
+        Devuelve lo que cambió de verdad, [(clave, condominio, estado_anterior, estado)],
+        en el formato que publica ChangeFeed.
+        """
+        applied = []
+        with self._transaction() as conn:
+            for batch in _batches(changes):
+                keys = list(dict.fromkeys(key for key, estado in batch))
+                rows = conn.execute(f"SELECT key, condominio, estado FROM houses WHERE key IN "
+                                    f"({', '.join('?' * len(keys))})", keys)
+                current = {row['key']: [row['condominio'], row['estado']] for row in rows}
+                updates = []
+                for key, estado in batch:
+                    house = current.get(key)
+                    if house is not None and house[1] != estado:
+                        applied.append((key, house[0], house[1], estado))
+                        updates.append((estado, key))
+                        house[1] = estado
+                conn.executemany('UPDATE houses SET estado = ? WHERE key = ?', updates)
+        return applied
+
+    def close(self):
+        self.pool.close()
+
+
+def open_repository(path=DB_FILE, residencial=None):
+    """Repositorio sincronizado con houses_data.json (se importa la primera vez y cuando cambia)"""
+    repository = HouseRepository(path)
+    repository.sync_with(residencial if residencial is not None else load_residencial())
+    return repository
@@ -0,0 +1,334 @@
+"""Validación del esquema de un residencial, una vez por versión de datos, antes de cargarlo.
+
+load_residencial pasa el JSON decodificado por validate_residencial. Revisa la
+forma de cada sección (tipos, coordenadas [x0, y0, x1, y1] con x0 < x1 e
+y0 < y1, calles de dos puntos, estados conocidos, la escala y el traslado de
+'transform'), que la numeración de las casas y de los ajustes de 'layout'
+corresponda a las casas de su condominio, que las filas o columnas de cada condominio no dejen líneas vacías y que no se
+superpongan los rectángulos de las casas ni los de condominios y áreas (con un
+barrido en x). Si algo falla lanza SchemaError con todos los problemas, y los
+datos no llegan a las interfaces; si no, devuelve el Residencial inmutable de
+parse_residencial, que las funciones de dibujo usan sin volver a revisarlo.
+
+Uso: python map_schema.py [archivo.json ...]   # por omisión, los del registro
+     python map_schema.py houses_data.json --fix  # quitar las secciones vacías desconocidas
+"""
+import argparse
+import bisect
+import heapq
+import math
+import sys
+
+from map_data import ESTADOS, STORE_EXTENSION, parse_residencial
+
+# Secciones del JSON; cualquier otra se rechaza, salvo las vacías, que se descartan
+SECTIONS = ('areas', 'condominios', 'calles', 'houses', 'layout', 'bounds', 'transform')
+
+ORIENTACIONES = ('Horizontal', 'Vertical')
+INICIOS = tuple(f"{vertical}_{horizontal}" for vertical in ('superior', 'inferior')
+                for horizontal in ('izquierda', 'derecha'))
+
+# Holgura al comparar rectángulos: las casas vecinas comparten un borde calculado en coma flotante
+OVERLAP_TOLERANCE = 1e-6
+
+# Problemas que se muestran en el mensaje de SchemaError (la lista completa queda en problems)
+MESSAGE_PROBLEMS = 10
+
+
+class SchemaError(ValueError):
+    """Datos de un residencial que no cumplen el esquema; problems es la lista de 'ruta: problema'"""
+
+    def __init__(self, problems):
+        self.problems = list(problems)
+        shown = '; '.join(self.problems[:MESSAGE_PROBLEMS])
+        more = len(self.problems) - MESSAGE_PROBLEMS
+        super().__init__(f"{len(self.problems)} problemas en los datos: {shown}"
+                         + (f" y {more} más" if more > 0 else ""))
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _is_count(value):
+    return isinstance(value, int) and not isinstance(value, bool) and value >= 1
+
+
+def _check_rect(problems, path, value):
+    if not (isinstance(value, list) and len(value) == 4 and all(map(_is_number, value))):
+        problems.append(f"{path}: se esperaban 4 números [x0, y0, x1, y1]")
+    elif not (value[0] < value[2] and value[1] < value[3]):
+        problems.append(f"{path}: se esperaba x0 < x1 e y0 < y1")
+
+
+def _check_point(problems, path, value):
+    if not (isinstance(value, list) and len(value) == 2 and all(map(_is_number, value))):
+        problems.append(f"{path}: se esperaban 2 números [x, y]")
+
+
+def _check_transform(problems, transform):
+    # Metadato de map_transform: se aplica al cargar, antes de construir los modelos
+    if not isinstance(transform, dict):
+        problems.append("transform: se esperaba un objeto")
+        return
+    scale = transform.get('scale', [1, 1])
+    if not (isinstance(scale, list) and len(scale) == 2 and all(_is_number(v) and v != 0 for v in scale)):
+        problems.append("transform.scale: se esperaban 2 números distintos de cero [sx, sy]")
+    _check_point(problems, "transform.offset", transform.get('offset', [0, 0]))
+
+
+def _check_fields(problems, path, entry, fields):
+    # fields: campo -> (requerido, validación, descripción del valor esperado)
+    if not isinstance(entry, dict):
+        problems.append(f"{path}: se esperaba un objeto")
+        return False
+    for field, (required, check, expected) in fields.items():
+        if field not in entry:
+            if required:
+                problems.append(f"{path}.{field}: falta")
+        elif not check(entry[field]):
+            problems.append(f"{path}.{field}: se esperaba {expected}")
+    return True
+
+
+def _text(value):
+    return isinstance(value, str) and bool(value.strip())
+
+
+def _optional_text(value):
+    return value is None or isinstance(value, str)
+
+
+_CONDOMINIO = {
+    'id': (True, _text, "un texto"),
+    'descripcion': (True, _text, "un texto"),
+    'casas': (True, _is_count, "un entero positivo"),
+    'orientacion': (True, ORIENTACIONES.__contains__, " o ".join(ORIENTACIONES)),
+    'filas': (False, _is_count, "un entero positivo"),
+    'columnas': (False, _is_count, "un entero positivo"),
+    'inicio_numeracion': (False, lambda value: value is None or value in INICIOS, ", ".join(INICIOS)),
+}
+_AREA = {
+    'id': (True, _text, "un texto"),
+    'tipo': (True, _text, "un texto"),
+    'descripcion': (True, _optional_text, "un texto"),
+}
+_CALLE = {
+    'id': (True, _text, "un texto"),
+    'width': (False, lambda value: _is_number(value) and value > 0, "un número positivo"),
+}
+_HOUSE = {
+    'id': (True, _text, "un texto"),
+    'condominio': (True, _text, "un texto"),
+    'direccion': (True, _optional_text, "un texto"),
+    'estado': (True, ESTADOS.__contains__, " o ".join(ESTADOS)),
+    'propietario': (False, _optional_text, "un texto"),
+    'tamano': (False, _optional_text, "un texto"),
+    'historial_pagos': (False, lambda value: isinstance(value, list) and all(isinstance(p, dict) for p in value),
+                        "una lista de objetos"),
+    'deuda_actual': (False, _is_number, "un número"),
+}
+
+
+def _plain_house(house):
+    # Camino rápido del registro común; si no pasa, _check_fields dice qué falla
+    if type(house) is not dict or house.get('estado') not in ESTADOS:
+        return False
+    texts = (house.get('id'), house.get('condominio'), house.get('direccion'),
+             house.get('propietario', ''), house.get('tamano', ''))
+    pagos = house.get('historial_pagos', [])
+    return (all(type(text) is str for text in texts) and bool(texts[0].strip()) and bool(texts[1].strip())
+            and type(pagos) is list and all(type(pago) is dict for pago in pagos)
+            and _is_number(house.get('deuda_actual', 0)))
+
+
+def normalize_residencial(data):
+    """Revisar la forma del JSON decodificado; devuelve una copia sin las secciones vacías desconocidas.
+
+    Lanza SchemaError con todos los problemas encontrados.
+    """
+    from map_occupancy import house_number
+
+    problems = []
+    if not isinstance(data, dict):
+        raise SchemaError(["el documento no es un objeto JSON"])
+    unknown = [key for key in data if key not in SECTIONS]
+    problems.extend(f"{key}: sección desconocida" for key in unknown if data[key])
+    data = {key: value for key, value in data.items() if key in SECTIONS}
+
+    for section in ('areas', 'condominios', 'calles', 'houses', 'layout'):
+        if not isinstance(data.get(section, {}), dict):
+            problems.append(f"{section}: se esperaba un objeto")
+            data[section] = {}
+    if 'bounds' in data and not (isinstance(data['bounds'], list) and len(data['bounds']) == 2
+                                 and all(_is_number(v) and v > 0 for v in data['bounds'])):
+        problems.append("bounds: se esperaban 2 números positivos [ancho, alto]")
+    if 'transform' in data:
+        _check_transform(problems, data['transform'])
+
+    condominios = data.get('condominios', {})
+    for condo_id, condo in condominios.items():
+        path = f"condominios.{condo_id}"
+        if not _check_fields(problems, path, condo, _CONDOMINIO):
+            continue
+        _check_rect(problems, f"{path}.coords", condo.get('coords'))
+        # Las casas se reparten en líneas de ceil(casas / líneas): más líneas de las necesarias quedan vacías
+        lines = condo.get('filas' if condo.get('orientacion') == 'Horizontal' else 'columnas', 1)
+        casas = condo.get('casas')
+        if _is_count(lines) and _is_count(casas) and (lines - 1) * math.ceil(casas / lines) >= casas:
+            problems.append(f"{path}: {lines} líneas para {casas} casas dejan líneas vacías")
+    for area_id, area in data.get('areas', {}).items():
+        if _check_fields(problems, f"areas.{area_id}", area, _AREA):
+            _check_rect(problems, f"areas.{area_id}.coords", area.get('coords'))
+    for calle_id, calle in data.get('calles', {}).items():
+        if _check_fields(problems, f"calles.{calle_id}", calle, _CALLE):
+            _check_point(problems, f"calles.{calle_id}.start", calle.get('start'))
+            _check_point(problems, f"calles.{calle_id}.end", calle.get('end'))
+
+    # Numeración: cada registro y cada ajuste es una casa que existe en su condominio, una sola vez
+    numbered = {}
+    for house_id, house in data.get('houses', {}).items():
+        path = f"houses.{house_id}"
+        # Son la sección más grande: los campos de un registro común se revisan de una vez
+        if not _plain_house(house) and not _check_fields(problems, path, house, _HOUSE):
+            continue
+        if house.get('id') != house_id:
+            problems.append(f"{path}.id: no coincide con la clave")
+        if not isinstance(house.get('condominio'), str):
+            continue
+        condo = condominios.get(house['condominio'])
+        number = house_number(house_id)
+        if condo is None:
+            problems.append(f"{path}.condominio: no existe {house['condominio']!r}")
+        elif number is None or not (isinstance(condo, dict) and _is_count(condo.get('casas'))
+                                    and 1 <= number <= condo['casas']):
+            problems.append(f"{path}: el condominio no tiene una casa número {number}")
+        else:
+            other = numbered.setdefault((house['condominio'], number), house_id)
+            if other != house_id:
+                problems.append(f"{path}: es la misma casa que houses.{other}")
+    for house_id, rect in data.get('layout', {}).items():
+        path = f"layout.{house_id}"
+        condo_id, _, suffix = house_id.rpartition('-')
+        condo = condominios.get(condo_id)
+        if not (isinstance(condo, dict) and suffix.isdigit() and _is_count(condo.get('casas'))
+                and 1 <= int(suffix) <= condo['casas']):
+            problems.append(f"{path}: no es una casa de un condominio (<condominio>-<número>)")
+        _check_rect(problems, path, rect)
+
+    if problems:
+        raise SchemaError(problems)
+    return data
+
+
+def find_overlaps(rects, tolerance=OVERLAP_TOLERANCE):
+    """Pares (i, j) de rectángulos [x0, y0, x1, y1] que se superponen, con un barrido en x.
+
+    Los rectángulos activos (los que cruzan la x del barrido) se guardan ordenados
+    por y0 y sin superponerse entre sí, así que uno nuevo choca con alguno solo si
+    choca con su vecino de arriba o de abajo: O(n log n). Un rectángulo que choca
+    se reporta con uno de sus vecinos y no entra al barrido. Compartir un borde no cuenta.
+    """
+    boxes = [(x0 + tolerance, y0 + tolerance, x1 - tolerance, y1 - tolerance) for x0, y0, x1, y1 in rects]
+    active = []  # (y0, i) ordenados
+    ending = []  # heap de (x1, y0, i)
+    overlaps = []
+    for i in sorted(range(len(boxes)), key=lambda i: boxes[i][0]):
+        x0, y0, x1, y1 = boxes[i]
+        while ending and ending[0][0] <= x0:
+            _, top, j = heapq.heappop(ending)
+            del active[bisect.bisect_left(active, (top, j))]
+        position = bisect.bisect_left(active, (y0, i))
+        if position > 0 and boxes[active[position - 1][1]][3] > y0:
+            overlaps.append((active[position - 1][1], i))
+        elif position < len(active) and active[position][0] < y1:
+            overlaps.append((active[position][1], i))
+        else:
+            active.insert(position, (y0, i))
+            heapq.heappush(ending, (x1, y0, i))
+    return overlaps
+
+
+def check_geometry(residencial, table=None):
+    """Problemas de superposición del Residencial ya transformado: casas entre sí, condominios y áreas"""
+    from map_layout import compile_layout
+
+    problems = []
+    # Sin ajustes de 'layout', cada casa queda dentro de su condominio y no toca a las de otro:
+    # basta el barrido de condominios y áreas
+    if residencial.layout:
+        if table is None:
+            table = compile_layout(residencial.condominios, residencial.layout, residencial.bounds)
+        rects = [table.rect(i) for i in range(len(table))]
+        for i, j in find_overlaps(rects):
+            problems.append(f"houses: la casa {table.ids[j]} se superpone con {table.ids[i]}")
+    parcels = [(f"condominios.{condo_id}", condo.coords) for condo_id, condo in residencial.condominios.items()]
+    parcels += [(f"areas.{area_id}", area.coords) for area_id, area in residencial.areas.items()]
+    for i, j in find_overlaps([coords for name, coords in parcels]):
+        problems.append(f"{parcels[j][0]}: se superpone con {parcels[i][0]}")
+    return problems
+
+
+def validate_residencial(data, version=''):
+    """Residencial inmutable de data (el JSON decodificado), o SchemaError si no es válido"""
+    residencial = parse_residencial(normalize_residencial(data), version)
+    problems = check_geometry(residencial)
+    if problems:
+        raise SchemaError(problems)
+    return residencial
+
+
+def fix_file(path):
+    """Quitar del JSON de path las secciones vacías desconocidas; devuelve sus nombres"""
+    from map_transform import read_sections, rewrite_sections
+
+    text, members = read_sections(path)
+    stray = [key for key, value, start, end in members if key not in SECTIONS and not value]
+    if stray:
+        rewrite_sections(text, members, dict.fromkeys(stray), path)
+    return stray
+
+
+def main(argv=None):
+    import json
+
+    from map_registry import discover_registry
+
+    parser = argparse.ArgumentParser(description="Validar los datos de los residenciales antes de desplegarlos")
+    parser.add_argument('paths', nargs='*', help="archivos JSON (por omisión, los del registro)")
+    parser.add_argument('--fix', action='store_true', help="quitar las secciones vacías desconocidas")
+    args = parser.parse_args(argv)
+
+    registry = discover_registry()
+    paths = args.paths or [registry[residencial_id].path for residencial_id in registry]
+    failed = False
+    for path in paths:
+        if path.endswith(STORE_EXTENSION):
+            print(f"{path}: formato binario, se valida al convertirlo desde el JSON")
+            continue
+        if args.fix:
+            for key in fix_file(path):
+                print(f"{path}: se quitó la sección vacía {key!r}")
+        try:
+            with open(path, encoding='utf-8') as file:
+                data = json.load(file)
+            residencial = validate_residencial(data)
+        except SchemaError as error:
+            failed = True
+            print(f"{path}: {len(error.problems)} problemas")
+            for problem in error.problems:
+                print(f"  {problem}")
+            continue
+        except (OSError, ValueError) as error:
+            failed = True
+            print(f"{path}: {error}")
+            continue
+        print(f"{path}: válido ({len(residencial.condominios)} condominios, {len(residencial.houses)} registros)")
+        stray = [key for key in data if key not in SECTIONS]
+        if stray:
+            print(f"  secciones vacías ignoradas: {', '.join(stray)} (--fix las quita)")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
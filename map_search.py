@@ -0,0 +1,228 @@
+"""Búsqueda por prefijos sobre las casas: clave, dirección, propietario y condominio.
+
+Dos índices en memoria, ambos listas ordenadas donde un prefijo es un rango
+contiguo que se ubica con bisect:
+
+- Frases: cada campo normalizado completo ('calle caoba cond sintetico 4 casa 16').
+  Escribir un campo desde el inicio, el caso normal del cuadro de búsqueda,
+  son dos bisect y los primeros resultados del rango.
+- Palabras (índice invertido palabra -> casas) para consultas en otro orden
+  ('ceiba 16'): cada palabra de la consulta es un prefijo y las casas deben
+  tenerlos todos. Los prefijos de pocas casas se resuelven con intersecciones
+  de conjuntos (en C); los muy comunes solo se comprueban sobre las candidatas.
+"""
+import re
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from itertools import islice
+
+_WORD = re.compile(r'[0-9a-z]+')
+
+# Candidatas que se juntan por resultado pedido antes de ordenarlas por coincidencias exactas
+CANDIDATES_PER_RESULT = 4
+# Un prefijo de varias palabras se materializa como conjunto solo si abarca hasta tantas casas
+UNION_LIMIT = 4096
+
+
+def normalize(text):
+    """Minúsculas y sin acentos: 'Sintético' -> 'sintetico'"""
+    if text.isascii():
+        return text.lower()
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def tokenize(text):
+    """Palabras normalizadas; los números pierden los ceros a la izquierda ('01' -> '1')"""
+    words = []
+    for word in _WORD.findall(normalize(text)):
+        if word.isdigit():
+            word = word.lstrip('0') or '0'
+        words.append(word)
+    return words
+
+
+class SearchIndex:
+    """Índice de casas para el cuadro de búsqueda, actualizable casa por casa.
+
+    Cada casa tiene un número interno estable; los conjuntos de enteros pequeños
+    se recorren casi en orden, así que los resultados son deterministas.
+    """
+
+    def __init__(self, condominios=None):
+        # Descripción del condominio de cada casa, para encontrar "eucalipto 7"
+        self.condo_names = {condo_id: condo.descripcion for condo_id, condo in (condominios or {}).items()}
+        self.phrases = []       # (campo normalizado, número de casa), ordenadas
+        self.postings = {}      # palabra -> {número de casa}
+        self.vocabulary = []    # palabras ordenadas
+        self.keys = []          # número -> clave
+        self.numbers = {}       # clave -> número
+        self.words = {}         # número -> tupla de palabras de la casa
+        self.fields = {}        # número -> tupla de campos normalizados
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.words)
+
+    def _house_fields(self, key, house):
+        """Campos buscables como frases normalizadas y el conjunto de sus palabras"""
+        fields = tuple(dict.fromkeys(
+            ' '.join(tokenize(field))
+            for field in (key, house.direccion, house.propietario or '', self.condo_names.get(house.condominio, ''))
+            if field))
+        words = tuple(dict.fromkeys(word for field in fields for word in field.split()))
+        return fields, words
+
+    def _number(self, key):
+        number = self.numbers.get(key)
+        if number is None:
+            number = self.numbers[key] = len(self.keys)
+            self.keys.append(key)
+        return number
+
+    def _remove(self, number):
+        for field in self.fields.pop(number, ()):
+            del self.phrases[bisect_left(self.phrases, (field, number))]
+        for word in self.words.pop(number, ()):
+            posting = self.postings[word]
+            posting.discard(number)
+            if not posting:
+                del self.postings[word]
+                del self.vocabulary[bisect_left(self.vocabulary, word)]
+
+    def update(self, key, house):
+        """Agregar o reindexar una casa (tras editarla); house=None la quita"""
+        with self._lock:
+            if house is None and key not in self.numbers:
+                # Quitar una casa que nunca se indexó: no se le reserva un número
+                return
+            number = self._number(key)
+            fields, words = self._house_fields(key, house) if house is not None else ((), ())
+            if number in self.fields and self.fields[number] == fields:
+                # Cambió algo que no se busca (el estado, por ejemplo)
+                return
+            self._remove(number)
+            if house is None:
+                return
+            self.fields[number] = fields
+            self.words[number] = words
+            for field in fields:
+                insort(self.phrases, (field, number))
+            for word in words:
+                posting = self.postings.get(word)
+                if posting is None:
+                    posting = self.postings[word] = set()
+                    insort(self.vocabulary, word)
+                posting.add(number)
+
+    def _prefix_range(self, prefix):
+        start = bisect_left(self.vocabulary, prefix)
+        # '\uffff' ordena después de cualquier continuación del prefijo
+        return start, bisect_left(self.vocabulary, prefix + '\uffff', start)
+
+    def _prefix_set(self, prefix):
+        """Casas con alguna palabra que empieza con prefix, o None si son demasiadas para unirlas"""
+        start, end = self._prefix_range(prefix)
+        if end - start == 1:
+            return self.postings[self.vocabulary[start]]
+        total = 0
+        for i in range(start, end):
+            total += len(self.postings[self.vocabulary[i]])
+            if total > UNION_LIMIT:
+                return None
+        return set().union(*(self.postings[self.vocabulary[i]] for i in range(start, end)))
+
+    def _phrase_matches(self, phrase, limit):
+        """Casas con algún campo que empieza con la frase, en orden del campo"""
+        found = {}
+        for i in range(bisect_left(self.phrases, (phrase,)), len(self.phrases)):
+            field, number = self.phrases[i]
+            if not field.startswith(phrase):
+                break
+            found[number] = None
+            if len(found) == limit:
+                break
+        return list(found)
+
+    def search(self, query, limit=10):
+        """Claves de las casas que coinciden con la consulta.
+
+        Las casas con un campo que empieza con la consulta completa; si no hay,
+        las que tienen todas sus palabras como prefijos, ordenadas por cuántas
+        aparecen completas ('3' encuentra 'Sintético 3' antes que 'Propietario 37').
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        with self._lock:
+            numbers = self._phrase_matches(' '.join(tokens), limit)
+            if not numbers:
+                numbers = self._word_matches(list(dict.fromkeys(tokens)), limit)
+            return [self.keys[n] for n in numbers]
+
+    def _word_matches(self, prefixes, limit):
+        resolved = []
+        pending = []
+        for prefix in prefixes:
+            houses = self._prefix_set(prefix)
+            if houses is None:
+                pending.append(prefix)
+            elif not houses:
+                return []
+            else:
+                resolved.append(houses)
+
+        filters = []
+        if resolved:
+            # Se intersectan los conjuntos selectivos; los que cubren casi todo se comprueban por casa
+            resolved.sort(key=len)
+            candidates = resolved[0]
+            for houses in resolved[1:]:
+                if len(houses) * 2 > len(self.words):
+                    filters.append(houses)
+                else:
+                    candidates = candidates & houses
+            if pending:
+                # Primero las casas donde los prefijos comunes aparecen como palabra completa: si
+                # alcanzan, no hace falta recorrer el resto comprobando prefijos
+                exact = candidates
+                for prefix in pending:
+                    exact = exact & self.postings.get(prefix, set())
+                wanted = limit * CANDIDATES_PER_RESULT
+                if len(exact) >= wanted:
+                    hits = list(islice((n for n in exact if all(n in houses for houses in filters)), wanted))
+                    if len(hits) == wanted:
+                        return sorted(hits)[:limit]
+        else:
+            # Solo prefijos muy comunes: se recorren las casas del primero, palabra por palabra
+            start, end = self._prefix_range(pending[0])
+            candidates = (n for i in range(start, end) for n in self.postings[self.vocabulary[i]])
+
+        found = {}
+        wanted = limit * CANDIDATES_PER_RESULT
+        for number in candidates:
+            if number in found or not all(number in houses for houses in filters):
+                continue
+            words = self.words[number]
+            if all(any(w.startswith(p) for w in words) for p in pending):
+                found[number] = sum(p in words for p in prefixes)
+                if len(found) == wanted:
+                    break
+        return sorted(found, key=lambda n: (-found[n], n))[:limit]
+
+
+def build_search_index(houses, condominios=None):
+    """Índice de un Mapping clave -> House (del JSON, del .rmap o del repositorio)"""
+    index = SearchIndex(condominios)
+    for key in sorted(houses):
+        number = index._number(key)
+        fields, words = index._house_fields(key, houses[key])
+        index.fields[number] = fields
+        index.words[number] = words
+        index.phrases.extend((field, number) for field in fields)
+        for word in words:
+            index.postings.setdefault(word, set()).add(number)
+    index.phrases.sort()
+    index.vocabulary = sorted(index.postings)
+    return index
@@ -0,0 +1,152 @@
+import functools
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image, ImageColor, ImageDraw, ImageFont
+
+
+# Fuente de los textos del mapa; si no existe se usa la de mapa de bits de Pillow
+FONT_FILE = os.environ.get('RESIDENCIAL_FONT', "/System/Library/Fonts/Arial.ttf")
+
+
+@functools.lru_cache(maxsize=None)
+def map_font(size=14):
+    """Fuente del mapa de ese tamaño, buscada una sola vez por proceso"""
+    try:
+        return ImageFont.truetype(FONT_FILE, size)
+    except OSError:
+        font = ImageFont.load_default()
+        # Sin archivo que la identifique: una clave fija permite guardar sus sprites (map_bundle)
+        font.key = ('load_default',)
+        return font
+
+
+def font_key(font):
+    """Identificar la fuente por archivo y tamaño; las de mapa de bits por su clave o el objeto mismo"""
+    if isinstance(font, ImageFont.FreeTypeFont):
+        return (font.path, font.size, font.index)
+    return getattr(font, 'key', font)
+
+
+class SpriteCache:
+    """Caché LRU de etiquetas prerenderizadas y prerrotadas, compartida por todo el proceso.
+
+    Las claves son (tipo, texto, fuente, tamaño, ángulo, color, fracción) y los
+    contadores hits/misses permiten ver cuánto trabajo de texto se está ahorrando.
+    """
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, render):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        entry = render()
+        with self._lock:
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def items(self):
+        """Copia de las entradas (clave, sprite) en orden de uso"""
+        with self._lock:
+            return list(self._entries.items())
+
+    def update(self, entries):
+        """Agregar entradas ya dibujadas (de map_bundle) sin tocar las que existen ni los contadores"""
+        with self._lock:
+            for key, entry in entries:
+                self._entries.setdefault(key, entry)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'hit_rate': self.hits / total if total else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+SPRITES = SpriteCache()
+
+
+def _render_label(text, font, color, angle, fraction_x, fraction_y):
+    left, top, right, bottom = font.getbbox(text) if hasattr(font, 'getbbox') else (0, 0) + font.getsize(text)
+    # Caja de lados pares: el centro queda en un pixel exacto también tras rotar 90 grados
+    half = max(right - left, bottom - top) + 2
+    size = (2 * half, 2 * half)
+    rgb = ImageColor.getrgb(color)[:3]
+    # Fondo del mismo color con alfa 0 para que los bordes suavizados se mezclen igual que draw.text
+    sprite = Image.new('RGBA', size, rgb + (0,))
+    ImageDraw.Draw(sprite).text((half + fraction_x, half + fraction_y), text, fill=rgb + (255,),
+                                font=font, anchor="mm")
+    if angle:
+        sprite = sprite.rotate(angle, expand=True, fillcolor=rgb + (0,))
+    center_x, center_y = sprite.width // 2, sprite.height // 2
+    bbox = sprite.getchannel('A').getbbox()
+    if bbox is None:
+        return None
+    return sprite.crop(bbox), (bbox[0] - center_x, bbox[1] - center_y)
+
+
+def label_sprite(text, font, color='black', angle=0, fraction_x=0.0, fraction_y=0.0):
+    """Etiqueta centrada en (0, 0): (imagen RGBA recortada, desplazamiento de su esquina) o None"""
+    key = ('label', text, font_key(font), angle, color, fraction_x, fraction_y)
+    return SPRITES.get(key, lambda: _render_label(text, font, color, angle, fraction_x, fraction_y))
+
+
+def paste_label(img, center, text, font, color='black', angle=0):
+    """Pegar la etiqueta cacheada con su centro en center (coordenadas enteras)"""
+    sprite = label_sprite(text, font, color, angle)
+    if sprite is None:
+        return
+    image, (dx, dy) = sprite
+    img.paste(image, (int(center[0]) + dx, int(center[1]) + dy), image)
+
+
+def _render_glyph(text, font, fraction_x, fraction_y):
+    sprite = label_sprite(text, font, 'black', 0, fraction_x, fraction_y)
+    if sprite is None:
+        return None
+    image, (dx, dy) = sprite
+    # Solo los pixeles cubiertos: filas, columnas y alfa relativos al centro
+    alpha_channel = np.asarray(image.getchannel('A'), dtype=np.uint8)
+    rows, cols = np.nonzero(alpha_channel)
+    alpha = alpha_channel[rows, cols]
+    rows = rows + dy
+    cols = cols + dx
+    bounds = (int(cols.min()), int(rows.min()), int(cols.max()), int(rows.max()))
+    return rows, cols, alpha, bounds
+
+
+def glyph_mask(text, font, fraction_x=0.0, fraction_y=0.0):
+    """Forma dispersa de la etiqueta para el dibujo en lote: (filas, columnas, alfa, límites).
+
+    PIL suaviza el texto según la parte fraccionaria de la posición, por eso el
+    glifo se guarda por fracción (en múltiplos de 1/64, la resolución de FreeType).
+    """
+    key = ('glyph', text, font_key(font), 0, 'black', fraction_x, fraction_y)
+    return SPRITES.get(key, lambda: _render_glyph(text, font, fraction_x, fraction_y))
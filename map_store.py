@@ -0,0 +1,268 @@
+"""Formato binario columnar (.rmap) para residenciales grandes.
+
+Un solo archivo con un directorio JSON al inicio y después, alineadas a 8
+bytes, las columnas como arrays de NumPy: geometría en float64 y atributos de
+texto como índices int32 a una tabla de cadenas internadas (-1 es None). Se
+abre con np.memmap, así que varios procesos de Streamlit comparten las mismas
+páginas del sistema operativo y cargar no copia ni decodifica las casas.
+
+Uso: python map_store.py houses_data.json houses_data.rmap   (o al revés)
+"""
+import hashlib
+import json
+import os
+import struct
+import sys
+from collections.abc import Mapping
+from types import MappingProxyType
+
+import numpy as np
+
+from map_data import (Area, Calle, Condominio, DEFAULT_BOUNDS, Residencial, STORE_EXTENSION, house_from_dict,
+                      residencial_to_dict)
+from map_schema import validate_residencial
+
+MAGIC = b'RMAP0001'
+# Tras la firma: longitud del directorio (uint64) y el directorio en JSON
+HEADER = struct.Struct('<8sQ')
+ALIGNMENT = 8
+
+# Atributos de texto de cada casa, en el orden de sus columnas
+HOUSE_TEXT_FIELDS = ('id', 'condominio', 'direccion', 'estado', 'propietario', 'tamano')
+
+
+class StringTable:
+    """Tabla de cadenas internadas: offsets (uint64, n + 1) sobre un blob UTF-8"""
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if index < 0:
+            return None
+        return bytes(self.blob[self.offsets[index]:self.offsets[index + 1]]).decode('utf-8')
+
+
+class _StringInterner:
+    def __init__(self):
+        self.ids = {}
+        self.strings = []
+
+    def __call__(self, value):
+        if value is None:
+            return -1
+        index = self.ids.get(value)
+        if index is None:
+            index = self.ids[value] = len(self.strings)
+            self.strings.append(value)
+        return index
+
+    def columns(self):
+        encoded = [s.encode('utf-8') for s in self.strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return offsets, np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+
+class HouseColumns(Mapping):
+    """Casas como Mapping de solo lectura sobre las columnas mapeadas.
+
+    Las casas están ordenadas por clave: una búsqueda es binaria sobre la tabla
+    de cadenas y cada House se construye solo al pedirla.
+    """
+
+    # Para map_cache: las columnas son páginas mapeadas y compartidas, no memoria del proceso
+    nbytes = 0
+
+    def __init__(self, strings, columns):
+        self.strings = strings
+        self.columns = columns
+        self.keys_column = columns['houses.key']
+
+    def __len__(self):
+        return len(self.keys_column)
+
+    def __iter__(self):
+        for index in self.keys_column.tolist():
+            yield self.strings[index]
+
+    def _key(self, row):
+        return self.strings[int(self.keys_column[row])]
+
+    def _find(self, key):
+        low, high = 0, len(self.keys_column)
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self.keys_column) and self._key(low) == key:
+            return low
+        return -1
+
+    def __contains__(self, key):
+        return isinstance(key, str) and self._find(key) >= 0
+
+    def __getitem__(self, key):
+        row = self._find(key) if isinstance(key, str) else -1
+        if row < 0:
+            raise KeyError(key)
+        house = {field: self.strings[int(self.columns[f'houses.{field}'][row])] for field in HOUSE_TEXT_FIELDS}
+        house['historial_pagos'] = json.loads(self.strings[int(self.columns['houses.historial_pagos'][row])])
+        deuda = float(self.columns['houses.deuda_actual'][row])
+        house['deuda_actual'] = int(deuda) if deuda.is_integer() else deuda
+        return house_from_dict(house)
+
+
+def _columns_of(residencial):
+    """Columnas (nombre -> array) de todo el residencial, con las cadenas internadas"""
+    intern = _StringInterner()
+    columns = {}
+
+    house_keys = sorted(residencial.houses)
+    houses = [residencial.houses[key] for key in house_keys]
+    columns['houses.key'] = np.array([intern(key) for key in house_keys], dtype=np.int32)
+    for field in HOUSE_TEXT_FIELDS:
+        columns[f'houses.{field}'] = np.array([intern(getattr(h, field)) for h in houses], dtype=np.int32)
+    columns['houses.historial_pagos'] = np.array(
+        [intern(json.dumps([dict(p) for p in h.historial_pagos], ensure_ascii=False)) for h in houses],
+        dtype=np.int32)
+    columns['houses.deuda_actual'] = np.array([h.deuda_actual for h in houses], dtype=np.float64)
+
+    condos = list(residencial.condominios.items())
+    columns['condominios.key'] = np.array([intern(k) for k, c in condos], dtype=np.int32)
+    for field in ('id', 'descripcion', 'orientacion', 'inicio_numeracion'):
+        columns[f'condominios.{field}'] = np.array([intern(getattr(c, field)) for k, c in condos], dtype=np.int32)
+    for field in ('casas', 'filas', 'columnas'):
+        columns[f'condominios.{field}'] = np.array([getattr(c, field) for k, c in condos], dtype=np.int32)
+    columns['condominios.coords'] = np.array([c.coords for k, c in condos], dtype=np.float64).reshape(-1)
+
+    areas = list(residencial.areas.items())
+    columns['areas.key'] = np.array([intern(k) for k, a in areas], dtype=np.int32)
+    for field in ('id', 'tipo', 'descripcion'):
+        columns[f'areas.{field}'] = np.array([intern(getattr(a, field)) for k, a in areas], dtype=np.int32)
+    columns['areas.coords'] = np.array([a.coords for k, a in areas], dtype=np.float64).reshape(-1)
+
+    calles = list(residencial.calles.items())
+    columns['calles.key'] = np.array([intern(k) for k, c in calles], dtype=np.int32)
+    columns['calles.id'] = np.array([intern(c.id) for k, c in calles], dtype=np.int32)
+    columns['calles.segment'] = np.array([c.start + c.end for k, c in calles], dtype=np.float64).reshape(-1)
+    columns['calles.width'] = np.array([c.width for k, c in calles], dtype=np.float64)
+
+    layout = list(residencial.layout.items())
+    columns['layout.key'] = np.array([intern(k) for k, r in layout], dtype=np.int32)
+    columns['layout.rects'] = np.array([r for k, r in layout], dtype=np.float64).reshape(-1)
+
+    columns['strings.offsets'], columns['strings.blob'] = intern.columns()
+    return columns
+
+
+def _padding(size):
+    return -size % ALIGNMENT
+
+
+def write_store(residencial, path):
+    """Escribir el residencial en formato .rmap (escritura atómica con rename)"""
+    columns = _columns_of(residencial)
+    directory = {'version': residencial.version, 'bounds': list(residencial.bounds), 'columns': {}}
+    offset = 0
+    for name, column in columns.items():
+        directory['columns'][name] = [column.dtype.str, offset, len(column)]
+        offset += column.nbytes + _padding(column.nbytes)
+    directory = json.dumps(directory, separators=(',', ':')).encode('utf-8')
+    directory += b' ' * _padding(HEADER.size + len(directory))
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, len(directory)))
+        file.write(directory)
+        for column in columns.values():
+            file.write(column.tobytes())
+            file.write(b'\0' * _padding(column.nbytes))
+    os.replace(tmp_path, path)
+
+
+def load_store(path):
+    """Abrir un .rmap como Residencial: columnas mapeadas en memoria, casas construidas al pedirlas"""
+    buffer = np.memmap(path, dtype=np.uint8, mode='r')
+    magic, directory_size = HEADER.unpack(bytes(buffer[:HEADER.size]))
+    if magic != MAGIC:
+        raise ValueError(f"{path} no es un archivo {STORE_EXTENSION}")
+    directory = json.loads(bytes(buffer[HEADER.size:HEADER.size + directory_size]).decode('utf-8'))
+    data_start = HEADER.size + directory_size
+    columns = {
+        name: np.frombuffer(buffer, dtype=np.dtype(dtype), count=count, offset=data_start + offset)
+        for name, (dtype, offset, count) in directory['columns'].items()
+    }
+    strings = StringTable(columns['strings.offsets'], columns['strings.blob'])
+
+    def texts(section, field):
+        return [strings[i] for i in columns[f'{section}.{field}'].tolist()]
+
+    def rects(name):
+        return [tuple(r) for r in columns[name].reshape(-1, 4).tolist()]
+
+    # Condominios, áreas y calles son pocos: se materializan como modelos desde el inicio
+    condominios = {}
+    for key, id_, descripcion, orientacion, inicio, casas, filas, cols, coords in zip(
+            texts('condominios', 'key'), texts('condominios', 'id'), texts('condominios', 'descripcion'),
+            texts('condominios', 'orientacion'), texts('condominios', 'inicio_numeracion'),
+            columns['condominios.casas'].tolist(), columns['condominios.filas'].tolist(),
+            columns['condominios.columnas'].tolist(), rects('condominios.coords')):
+        condominios[key] = Condominio(id=id_, descripcion=descripcion, casas=casas, coords=coords,
+                                      orientacion=orientacion, filas=filas, columnas=cols,
+                                      inicio_numeracion=inicio)
+    areas = {
+        key: Area(id=id_, tipo=tipo, descripcion=descripcion, coords=coords)
+        for key, id_, tipo, descripcion, coords in zip(
+            texts('areas', 'key'), texts('areas', 'id'), texts('areas', 'tipo'), texts('areas', 'descripcion'),
+            rects('areas.coords'))
+    }
+    calles = {
+        key: Calle(id=id_, start=segment[:2], end=segment[2:], width=width)
+        for key, id_, segment, width in zip(
+            texts('calles', 'key'), texts('calles', 'id'), rects('calles.segment'), columns['calles.width'].tolist())
+    }
+    layout = dict(zip(texts('layout', 'key'), rects('layout.rects')))
+
+    return Residencial(
+        version=directory['version'],
+        houses=HouseColumns(strings, columns),
+        condominios=MappingProxyType(condominios),
+        areas=MappingProxyType(areas),
+        calles=MappingProxyType(calles),
+        layout=MappingProxyType(layout),
+        bounds=tuple(directory.get('bounds', DEFAULT_BOUNDS)),
+    )
+
+
+def json_to_store(json_path, store_path):
+    """Convertir houses_data.json (validado con map_schema) a .rmap; la versión sigue siendo el SHA-1 del JSON"""
+    with open(json_path, 'rb') as file:
+        raw = file.read()
+    write_store(validate_residencial(json.loads(raw.decode('utf-8')), hashlib.sha1(raw).hexdigest()), store_path)
+
+
+def store_to_json(store_path, json_path):
+    """Convertir un .rmap de vuelta al esquema de houses_data.json"""
+    content = json.dumps(residencial_to_dict(load_store(store_path)), indent=2, ensure_ascii=False)
+    tmp_path = f"{json_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        file.write(content)
+    os.replace(tmp_path, json_path)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        sys.exit(__doc__.strip().splitlines()[-1])
+    source, target = sys.argv[1:]
+    if target.endswith(STORE_EXTENSION):
+        json_to_store(source, target)
+    else:
+        store_to_json(source, target)
+    print(f"{source} -> {target}")
@@ -0,0 +1,113 @@
+from xml.sax.saxutils import escape, quoteattr
+
+from PIL import ImageFont
+
+from map_labels import place_street_labels
+from map_render import HOUSE_COLOR, SELECTED_COLOR, ESTADO_COLORS
+from map_sprites import label_sprite
+
+# Tamaño de letra cuando la fuente de PIL es de mapa de bits y no tiene tamaño en puntos
+DEFAULT_FONT_SIZE = 10
+
+
+def house_element_id(house_id):
+    return f"casa-{house_id}"
+
+
+def condo_element_id(condo_id):
+    return f"condo-{condo_id}"
+
+
+def estado_class(estado):
+    return f"estado-{estado.lower()}"
+
+
+def _attributes(attributes):
+    # class_ -> class, stroke_width -> stroke-width
+    return ''.join(f' {name.rstrip("_").replace("_", "-")}={quoteattr(str(value))}'
+                   for name, value in attributes.items())
+
+
+def _rect(rect, **attributes):
+    # Los bordes de PIL son inclusivos y caen sobre el pixel: el trazo de 1px va centrado en x + 0.5
+    x0, y0, x1, y1 = rect
+    return f'<rect x="{x0 + 0.5}" y="{y0 + 0.5}" width="{x1 - x0}" height="{y1 - y0}"{_attributes(attributes)}/>'
+
+
+def _text(x, y, text, **attributes):
+    return f'<text x="{x:g}" y="{y:g}"{_attributes(attributes)}>{escape(text)}</text>'
+
+
+def render_svg(areas, condominios, calles, table, width, height, font, street_labels=None, house_estados=None):
+    """Mapa estático como SVG, sin selección, con un id estable por casa y condominio.
+
+    Usa la misma geometría escalada que render_base_layer, así que el índice
+    espacial del hover sirve igual; el navegador resalta la casa seleccionada
+    agregando la clase 'sel' a su grupo (id casa-<house_id>). house_estados es
+    el estado de cada casa en el orden de la tabla (o None) y da su color.
+    """
+    scale_x, scale_y = table.scale(width, height)
+    font_size = font.size if isinstance(font, ImageFont.FreeTypeFont) else DEFAULT_FONT_SIZE
+
+    def scaled(coords):
+        return (int(coords[0] * scale_x), int(coords[1] * scale_y),
+                int(coords[2] * scale_x), int(coords[3] * scale_y))
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}" font-family="Arial, sans-serif" font-size="{font_size}">',
+        '<style>'
+        f'rect{{stroke:black}}.fondo{{stroke:none}}.casa rect{{fill:{HOUSE_COLOR}}}'
+        + ''.join(f'.{estado_class(estado)} rect{{fill:{color}}}' for estado, color in ESTADO_COLORS.items())
+        + f'.casa.sel rect{{fill:{SELECTED_COLOR}}}'
+        'text{text-anchor:middle;dominant-baseline:central;pointer-events:none}'
+        '.calle{fill:white;font-weight:bold}'
+        '</style>',
+        f'<rect width="{width}" height="{height}" fill="white" class="fondo"/>',
+    ]
+
+    # Áreas (fondo) y condominios
+    for area_id, area in areas.items():
+        color = '#00CED1' if area.tipo == 'alberca_pergola' else '#90EE90'
+        parts.append(_rect(scaled(area.coords), id=f"area-{area_id}", fill=color))
+    for condo_id, condo in condominios.items():
+        parts.append(_rect(scaled(condo.coords), id=condo_element_id(condo_id), fill=HOUSE_COLOR))
+
+    # Casas: un grupo por casa con su rectángulo y su número
+    rects, centers = table.scaled_layout(scale_x, scale_y)
+    rects = rects.tolist()
+    centers = centers.tolist()
+    for i, house_id in enumerate(table.ids):
+        estado = house_estados[i] if house_estados is not None else None
+        classes = f"casa {estado_class(estado)}" if estado in ESTADO_COLORS else "casa"
+        parts.append(f'<g id={quoteattr(house_element_id(house_id))} class="{classes}">')
+        parts.append(_rect(rects[4 * i:4 * i + 4]))
+        parts.append(_text(centers[2 * i], centers[2 * i + 1], table.labels[i]))
+        parts.append('</g>')
+
+    # Etiquetas de las áreas
+    for area_id, area in areas.items():
+        coords = area.coords
+        parts.append(_text(int((coords[0] + coords[2]) * scale_x / 2), int((coords[1] + coords[3]) * scale_y / 2),
+                           area.descripcion))
+
+    # Calles y sus etiquetas, colocadas igual que en el mapa raster
+    for calle_id, calle in calles.items():
+        parts.append(
+            f'<line id={quoteattr("calle-" + calle_id)} '
+            f'x1="{int(calle.start[0] * scale_x)}" y1="{int(calle.start[1] * scale_y)}" '
+            f'x2="{int(calle.end[0] * scale_x)}" y2="{int(calle.end[1] * scale_y)}" '
+            f'stroke="gray" stroke-width="{int(calle.width * scale_x)}"/>'
+        )
+    if street_labels is None:
+        street_labels = place_street_labels(calles, font, scale_x, scale_y)
+    for calle_id, (x, y, angle) in street_labels.items():
+        sprite = label_sprite(calles[calle_id].id, font, 'white', angle)[0]
+        center_x = x + sprite.width / 2
+        center_y = y + sprite.height / 2
+        # PIL gira en sentido antihorario y SVG (con y hacia abajo) en sentido horario
+        parts.append(_text(0, 0, calles[calle_id].id, class_='calle',
+                           transform=f"translate({center_x:g} {center_y:g}) rotate({-angle})"))
+
+    parts.append('</svg>')
+    return ''.join(parts)
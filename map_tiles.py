@@ -0,0 +1,212 @@
+"""Pirámide de teselas z/x/y del mapa, dibujadas a pedido y guardadas en disco.
+
+En el nivel z el lado mayor del residencial mide TILE_SIZE * 2**z píxeles y
+se corta en teselas de TILE_SIZE x TILE_SIZE. Cada tesela se dibuja desde la
+geometría (una ventana de render_base_layer con margen, así que sus pixeles
+son los de la capa completa de ese nivel) solo cuando alguien la pide. El
+archivo se nombra con un hash de lo que la define (versión de datos, posición
+y colores de las casas que la tocan): lo que ya está en disco se reutiliza
+aunque el proceso se reinicie, y al cambiar una casa solo se invalidan las
+teselas que la tocan. Las teselas de cada versión de datos van en su propia
+carpeta, y al crear la pirámide se borran las de otras versiones.
+"""
+import hashlib
+import math
+import os
+import shutil
+import threading
+
+import numpy as np
+
+from map_encode import to_palette
+from map_live import PATCH_MARGIN
+
+TILE_SIZE = 256
+
+TILES_DIR = os.environ.get('RESIDENCIAL_TILES', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tiles'))
+
+# Píxeles por unidad del lienzo en el nivel más detallado: ahí los números de casa ya se leen holgados
+MAX_DETAIL = 4.0
+
+
+def level_size(bounds, zoom, tile_size=TILE_SIZE):
+    """Tamaño en píxeles (ancho, alto) del residencial completo en el nivel zoom"""
+    scale = tile_size * 2 ** zoom / max(bounds)
+    return max(1, round(bounds[0] * scale)), max(1, round(bounds[1] * scale))
+
+
+def max_zoom(bounds, tile_size=TILE_SIZE):
+    """Primer nivel con al menos MAX_DETAIL píxeles por unidad del lienzo"""
+    return max(0, math.ceil(math.log2(MAX_DETAIL * max(bounds) / tile_size)))
+
+
+def fit_zoom(bounds, width, height, tile_size=TILE_SIZE):
+    """Nivel más detallado en el que el residencial completo cabe en width x height"""
+    zoom = 0
+    while zoom < max_zoom(bounds, tile_size):
+        next_width, next_height = level_size(bounds, zoom + 1, tile_size)
+        if next_width > width or next_height > height:
+            break
+        zoom += 1
+    return zoom
+
+
+class TilePyramid:
+    """Teselas de un residencial y una versión de datos.
+
+    render(ancho, alto, colores, clip) dibuja la ventana clip de la capa base
+    de ese tamaño; colors es la lista (que otros actualizan en su lugar) con
+    el relleno de cada casa en el orden de la tabla. tile() devuelve la ruta
+    de la tesela relativa a directory.
+    """
+
+    def __init__(self, residencial, version, table, render, colors, directory=TILES_DIR, tile_size=TILE_SIZE):
+        self.residencial = residencial
+        self.version = version
+        self.table = table
+        self.render = render
+        self.colors = colors
+        self.directory = directory
+        self.tile_size = tile_size
+        self.max_zoom = max_zoom(table.bounds, tile_size)
+        self.generation = 0
+        # Carpeta de la versión: un nombre corto y válido en disco aunque la versión no lo sea
+        self.version_dir = hashlib.sha1(version.encode('utf-8')).hexdigest()[:12]
+        self._tiles = {}        # (z, x, y) -> ruta relativa de la tesela vigente
+        self._members = {}      # (z, x, y) -> índices de las casas que tocan su ventana
+        self._touched = {}      # (z, x, y) -> generación de su última invalidación
+        self._lock = threading.Lock()
+        self.prune_versions()
+
+    @property
+    def nbytes(self):
+        with self._lock:
+            return sum(members.nbytes for members in self._members.values())
+
+    def prune_versions(self):
+        """Borrar del disco las teselas del residencial que no son de esta versión de datos"""
+        try:
+            entries = list(os.scandir(os.path.join(self.directory, self.residencial)))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            if entry.name == self.version_dir:
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+    def level_size(self, zoom):
+        return level_size(self.table.bounds, zoom, self.tile_size)
+
+    def tile_count(self, zoom):
+        """Columnas y filas de teselas del nivel"""
+        width, height = self.level_size(zoom)
+        return math.ceil(width / self.tile_size), math.ceil(height / self.tile_size)
+
+    def visible_tiles(self, zoom, left, top, right, bottom):
+        """(x, y) de las teselas que tocan la región [left, right) x [top, bottom) del nivel"""
+        cols, rows = self.tile_count(zoom)
+        x0, y0 = max(int(left // self.tile_size), 0), max(int(top // self.tile_size), 0)
+        x1 = min(int(math.ceil(right / self.tile_size)), cols)
+        y1 = min(int(math.ceil(bottom / self.tile_size)), rows)
+        return [(x, y) for y in range(y0, y1) for x in range(x0, x1)]
+
+    def tile_box(self, zoom, x, y):
+        """Rectángulo semiabierto de la tesela en píxeles del nivel (las del borde son más chicas)"""
+        width, height = self.level_size(zoom)
+        size = self.tile_size
+        return x * size, y * size, min((x + 1) * size, width), min((y + 1) * size, height)
+
+    def _window(self, zoom, x, y):
+        # Ventana que se dibuja: la tesela con margen, para que los textos y contornos que
+        # cruzan su borde salgan completos dentro de ella
+        width, height = self.level_size(zoom)
+        left, top, right, bottom = self.tile_box(zoom, x, y)
+        return (max(left - PATCH_MARGIN, 0), max(top - PATCH_MARGIN, 0),
+                min(right + PATCH_MARGIN, width), min(bottom + PATCH_MARGIN, height))
+
+    def _house_rects(self, zoom):
+        width, height = self.level_size(zoom)
+        return self.table.scaled_layout(*self.table.scale(width, height))[0].reshape(-1, 4)
+
+    def members(self, zoom, x, y):
+        """Índices de las casas cuyo rectángulo toca la ventana de la tesela"""
+        key = (zoom, x, y)
+        with self._lock:
+            members = self._members.get(key)
+        if members is None:
+            # Se calcula fuera del candado; si otra sesión se adelantó, queda la suya
+            left, top, right, bottom = self._window(zoom, x, y)
+            boxes = self._house_rects(zoom)
+            members = np.flatnonzero(
+                (boxes[:, 0] < right) & (boxes[:, 2] >= left) & (boxes[:, 1] < bottom) & (boxes[:, 3] >= top))
+            with self._lock:
+                members = self._members.setdefault(key, members)
+        return members
+
+    def _digest(self, zoom, x, y, colors):
+        content = hashlib.sha1(f"{self.version}|{self.tile_size}|{zoom}/{x}/{y}".encode('utf-8'))
+        for index in self.members(zoom, x, y).tolist():
+            content.update(colors[index].encode('utf-8'))
+            content.update(b'|')
+        return content.hexdigest()[:20]
+
+    def tile(self, zoom, x, y):
+        """Ruta relativa de la tesela, dibujándola y guardándola si no está en disco"""
+        key = (zoom, x, y)
+        with self._lock:
+            path = self._tiles.get(key)
+            generation = self.generation
+        if path is not None:
+            return path
+
+        # Una copia de los colores: el hash y el dibujo ven el mismo estado aunque llegue un cambio
+        colors = list(self.colors)
+        digest = self._digest(zoom, x, y, colors)
+        path = os.path.join(self.residencial, self.version_dir, str(zoom), str(x), f"{y}_{digest}.png")
+        full_path = os.path.join(self.directory, path)
+        if not os.path.exists(full_path):
+            width, height = self.level_size(zoom)
+            left, top, right, bottom = self.tile_box(zoom, x, y)
+            clip = self._window(zoom, x, y)
+            window = self.render(width, height, colors, clip)
+            image = window.crop((left - clip[0], top - clip[1], right - clip[0], bottom - clip[1]))
+            # Escritura atómica: otra sesión o proceso nunca ve una tesela a medias
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            tmp_path = f"{full_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            to_palette(image).save(tmp_path, format='PNG')
+            os.replace(tmp_path, full_path)
+
+        with self._lock:
+            # Si la invalidaron mientras se dibujaba, la siguiente petición vuelve a calcularla
+            if self._touched.get(key, -1) < generation:
+                self._tiles[key] = path
+        return path
+
+    def invalidate(self, index):
+        """Olvidar (y borrar del disco) las teselas de todos los niveles que toca la casa index"""
+        with self._lock:
+            self.generation += 1
+            levels = {zoom for zoom, x, y in self._members}
+            stale = []
+            for zoom in levels:
+                x0, y0, x1, y1 = self._house_rects(zoom)[index].tolist()
+                cols, rows = self.tile_count(zoom)
+                size = self.tile_size
+                for y in range(max((y0 - PATCH_MARGIN) // size, 0), min((y1 + PATCH_MARGIN) // size + 1, rows)):
+                    for x in range(max((x0 - PATCH_MARGIN) // size, 0), min((x1 + PATCH_MARGIN) // size + 1, cols)):
+                        self._touched[(zoom, x, y)] = self.generation
+                        path = self._tiles.pop((zoom, x, y), None)
+                        if path is not None:
+                            stale.append(path)
+        for path in stale:
+            try:
+                os.remove(os.path.join(self.directory, path))
+            except OSError:
+                pass
+        return len(stale)
@@ -0,0 +1,337 @@
+"""Transformaciones de coordenadas del residencial: escalar, trasladar y recortar a un rectángulo.
+
+La transformación se guarda en el JSON como metadato, "transform": {"scale": [sx, sy],
+"offset": [dx, dy]}, y se aplica al cargarlo (parse_residencial), en lote con NumPy, sobre
+las coordenadas originales. Así las coordenadas del archivo nunca se redondean y varias
+ejecuciones se componen en una sola transformación, sin acumular error. Recortar mueve el
+origen a la esquina del rectángulo y cambia 'bounds' por su tamaño; sin --bake es solo la
+ventana visible, y lo que queda fuera sigue en el archivo.
+
+Uso: python map_transform.py houses_data.json [--scale S | SX,SY] [--translate DX,DY]
+                             [--crop X0,Y0,X1,Y1] [--bake] [-o salida.json]
+
+Las operaciones se aplican en el orden en que aparecen, en coordenadas del lienzo (ya
+transformadas). Con --bake las coordenadas se escriben transformadas y se quita el metadato;
+si hubo un recorte, además se quita lo que quedó fuera del lienzo (crop_sections).
+"""
+import argparse
+import json
+import math
+import os
+import re
+import sys
+from dataclasses import dataclass
+from typing import Tuple
+
+import numpy as np
+
+# Ancho de una calle sin 'width' en el JSON (el mismo de map_data.Calle)
+DEFAULT_STREET_WIDTH = 30
+
+# Decimales al escribir coordenadas horneadas y al cargarlas (quita el ruido de coma flotante)
+BAKE_DECIMALS = 2
+LOAD_DECIMALS = 6
+
+# Secciones con rectángulos (x0, y0, x1, y1); las calles son segmentos y van aparte
+RECT_SECTIONS = (('areas', 'coords'), ('condominios', 'coords'), ('layout', None))
+
+
+@dataclass(frozen=True)
+class Transform:
+    """x' = x * scale[0] + offset[0], y' = y * scale[1] + offset[1]"""
+    scale: Tuple[float, float] = (1.0, 1.0)
+    offset: Tuple[float, float] = (0.0, 0.0)
+
+    @classmethod
+    def from_dict(cls, data):
+        if not data:
+            return cls()
+        return cls(tuple(float(v) for v in data.get('scale', (1.0, 1.0))),
+                   tuple(float(v) for v in data.get('offset', (0.0, 0.0))))
+
+    def to_dict(self):
+        return {'scale': [_number(v) for v in self.scale], 'offset': [_number(v) for v in self.offset]}
+
+    @property
+    def identity(self):
+        return self == Transform()
+
+    @property
+    def width_factor(self):
+        """Factor para anchos de calle, que no tienen dirección"""
+        return math.sqrt(abs(self.scale[0] * self.scale[1]))
+
+    def then(self, other):
+        """Esta transformación seguida de other, como una sola"""
+        return Transform((self.scale[0] * other.scale[0], self.scale[1] * other.scale[1]),
+                         (self.offset[0] * other.scale[0] + other.offset[0],
+                          self.offset[1] * other.scale[1] + other.offset[1]))
+
+    def points(self, points):
+        """Aplicar a un array (n, 2) de puntos"""
+        return points * self.scale + self.offset
+
+
+def _number(value):
+    return int(value) if float(value).is_integer() else value
+
+
+def _transformed(values, transform, decimals, rects):
+    """Lista plana de coordenadas (4 por entidad) transformada en lote"""
+    array = transform.points(np.array(values, dtype=np.float64).reshape(-1, 2)).reshape(-1, 4)
+    if rects:
+        # Con escala negativa las esquinas se invierten: se vuelven a ordenar
+        array = np.concatenate([np.minimum(array[:, :2], array[:, 2:]), np.maximum(array[:, :2], array[:, 2:])],
+                               axis=1)
+    return [[_number(v) for v in row] for row in np.round(array, decimals).tolist()]
+
+
+def transform_sections(data, transform, decimals=BAKE_DECIMALS):
+    """Secciones de geometría del documento (areas, condominios, calles, layout) con la transformación aplicada.
+
+    Devuelve copias; las entidades que no cambian de geometría se comparten con data.
+    """
+    result = {}
+    for section, field in RECT_SECTIONS:
+        items = data.get(section, {})
+        keys = [key for key, item in items.items() if field is None or field in item]
+        values = [v for key in keys for v in (items[key] if field is None else items[key][field])]
+        rects = _transformed(values, transform, decimals, rects=True) if keys else []
+        result[section] = dict(items)
+        for key, rect in zip(keys, rects):
+            result[section][key] = rect if field is None else {**items[key], field: rect}
+
+    calles = data.get('calles', {})
+    keys = list(calles)
+    segments = _transformed([v for key in keys for v in (*calles[key]['start'], *calles[key]['end'])],
+                            transform, decimals, rects=False) if keys else []
+    factor = transform.width_factor
+    result['calles'] = {}
+    for key, segment in zip(keys, segments):
+        calle = {**calles[key], 'start': segment[:2], 'end': segment[2:]}
+        if factor != 1:
+            calle['width'] = _number(round(calle.get('width', DEFAULT_STREET_WIDTH) * factor, decimals))
+        result['calles'][key] = calle
+    return result
+
+
+def _clip_segment(start, end, width, height):
+    """Tramo del segmento dentro de [0, width] x [0, height] (Liang-Barsky), o None si queda fuera"""
+    dx, dy = end[0] - start[0], end[1] - start[1]
+    t0, t1 = 0.0, 1.0
+    for p, q in ((-dx, start[0]), (dx, width - start[0]), (-dy, start[1]), (dy, height - start[1])):
+        if p == 0:
+            if q < 0:
+                return None
+            continue
+        t = q / p
+        if p < 0:
+            t0 = max(t0, t)
+        else:
+            t1 = min(t1, t)
+        if t0 > t1:
+            return None
+    if t0 == t1:
+        return None
+    return ((start[0] + t0 * dx, start[1] + t0 * dy), (start[0] + t1 * dx, start[1] + t1 * dy))
+
+
+def crop_sections(sections, houses, bounds, decimals=BAKE_DECIMALS):
+    """Quitar de las secciones horneadas lo que quedó fuera del lienzo (0, 0, ancho, alto).
+
+    Las áreas y las calles que lo cruzan se recortan a su borde. Un condominio se
+    conserva completo mientras toque el lienzo, porque sus casas se reparten sobre
+    todo su rectángulo; si queda fuera se quita junto con sus registros de casas y
+    sus ajustes de 'layout'. Devuelve las secciones cambiadas; 'houses' solo si se
+    quitó alguna casa.
+    """
+    width, height = bounds
+
+    def outside(rect):
+        return rect[2] <= 0 or rect[0] >= width or rect[3] <= 0 or rect[1] >= height
+
+    def clipped(rect):
+        return [_number(round(v, decimals)) for v in
+                (max(rect[0], 0), max(rect[1], 0), min(rect[2], width), min(rect[3], height))]
+
+    result = {'areas': {key: {**area, 'coords': clipped(area['coords'])}
+                        for key, area in sections['areas'].items() if not outside(area['coords'])}}
+    result['condominios'] = {key: condo for key, condo in sections['condominios'].items()
+                             if not outside(condo['coords'])}
+    result['layout'] = {key: rect for key, rect in sections['layout'].items()
+                        if key.rsplit('-', 1)[0] in result['condominios']}
+    result['calles'] = {}
+    for key, calle in sections['calles'].items():
+        segment = _clip_segment(calle['start'], calle['end'], width, height)
+        if segment is not None:
+            result['calles'][key] = {**calle, 'start': [_number(round(v, decimals)) for v in segment[0]],
+                                     'end': [_number(round(v, decimals)) for v in segment[1]]}
+    kept = {key: house for key, house in houses.items()
+            if not isinstance(house, dict) or house.get('condominio') not in sections['condominios']
+            or house['condominio'] in result['condominios']}
+    if len(kept) != len(houses):
+        result['houses'] = kept
+    return result
+
+
+def apply_transform(data, decimals=LOAD_DECIMALS):
+    """Documento con su metadato 'transform' aplicado a la geometría y quitado"""
+    transform = Transform.from_dict(data.get('transform'))
+    result = {key: value for key, value in data.items() if key != 'transform'}
+    if not transform.identity:
+        result.update(transform_sections(data, transform, decimals))
+    return result
+
+
+def compose(transform, bounds, steps):
+    """Añadir pasos ('scale' | 'translate' | 'crop', valores) a una transformación y su lienzo"""
+    for step, values in steps:
+        if step == 'scale':
+            transform = transform.then(Transform(scale=(values[0], values[-1])))
+        elif step == 'translate':
+            transform = transform.then(Transform(offset=tuple(values)))
+        else:
+            x0, y0, x1, y1 = values
+            transform = transform.then(Transform(offset=(-x0, -y0)))
+            bounds = (_number(x1 - x0), _number(y1 - y0))
+    return transform, bounds
+
+
+_SPACE = re.compile(r'\s*')
+
+
+def _members(text):
+    """(clave, valor, inicio, fin) de cada miembro del objeto raíz; inicio:fin es el texto del valor"""
+    decoder = json.JSONDecoder()
+    pos = _SPACE.match(text).end()
+    if text[pos:pos + 1] != '{':
+        raise ValueError("el documento no es un objeto JSON")
+    pos = _SPACE.match(text, pos + 1).end()
+    if text[pos:pos + 1] == '}':
+        return
+    while True:
+        key, pos = decoder.raw_decode(text, pos)
+        pos = _SPACE.match(text, pos).end()
+        if text[pos:pos + 1] != ':':
+            raise ValueError(f"se esperaba ':' en la posición {pos}")
+        start = _SPACE.match(text, pos + 1).end()
+        value, end = decoder.raw_decode(text, start)
+        yield key, value, start, end
+        pos = _SPACE.match(text, end).end()
+        if text[pos:pos + 1] == '}':
+            return
+        if text[pos:pos + 1] != ',':
+            raise ValueError(f"se esperaba ',' en la posición {pos}")
+        pos = _SPACE.match(text, pos + 1).end()
+
+
+def read_sections(path):
+    """Texto del JSON de path y la lista de sus secciones (clave, valor, inicio, fin)"""
+    with open(path, encoding='utf-8') as file:
+        text = file.read()
+    return text, list(_members(text))
+
+
+def rewrite_sections(text, members, changes, output):
+    """Escribir en output el objeto JSON text con las secciones de changes reemplazadas.
+
+    members son las secciones de text (read_sections); una sección con valor None en changes
+    se quita y las demás se copian tal cual, sin volver a serializarlas. Se escribe en un
+    temporal que reemplaza al destino con un rename, así que una interrupción deja el
+    archivo anterior intacto.
+    """
+    data = {key for key, value, start, end in members}
+    tmp_path = f"{output}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            parts = []
+            for key, value, start, end in members:
+                if key not in changes:
+                    parts.append((key, text[start:end]))
+                elif changes[key] is not None:
+                    parts.append((key, None))
+            parts.extend((key, None) for key, value in changes.items() if value is not None and key not in data)
+            file.write('{')
+            for i, (key, raw) in enumerate(parts):
+                if raw is None:
+                    raw = json.dumps(changes[key], indent=2, ensure_ascii=False).replace('\n', '\n  ')
+                file.write(f"{',' if i else ''}\n  {json.dumps(key, ensure_ascii=False)}: ")
+                file.write(raw)
+            file.write('\n}\n')
+            # Que el contenido esté en disco antes del rename
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, output)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def transform_file(path, steps, bake=False, output=None, decimals=BAKE_DECIMALS):
+    """Aplicar los pasos al JSON de path y escribirlo en output (por omisión, el mismo archivo).
+
+    Sin bake solo cambian 'transform' y 'bounds'. Con bake y un recorte se quita además lo que
+    quedó fuera del lienzo (crop_sections). La escritura es por secciones (rewrite_sections):
+    las que no cambian ('houses', la más grande, salvo que el recorte quite casas) se copian tal
+    cual del original.
+    Devuelve la transformación y el lienzo.
+    """
+    from map_data import DEFAULT_BOUNDS
+
+    text, members = read_sections(path)
+    data = {key: value for key, value, start, end in members}
+    transform, bounds = compose(Transform.from_dict(data.get('transform')),
+                                tuple(data.get('bounds', DEFAULT_BOUNDS)), steps)
+
+    changes = {'transform': None if bake or transform.identity else transform.to_dict()}
+    if 'bounds' in data or bounds != tuple(DEFAULT_BOUNDS):
+        changes['bounds'] = list(bounds)
+    if bake:
+        changes.update(transform_sections(data, transform, decimals))
+        if any(step == 'crop' for step, values in steps):
+            changes.update(crop_sections(changes, data.get('houses', {}), bounds, decimals))
+
+    rewrite_sections(text, members, changes, output or path)
+    return transform, bounds
+
+
+class _Step(argparse.Action):
+    """Guarda cada operación en args.steps en el orden de la línea de comandos"""
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        counts = {'scale': (1, 2), 'translate': (2,), 'crop': (4,)}[self.const]
+        if len(values) not in counts:
+            parser.error(f"{option_string} espera {' o '.join(map(str, counts))} números separados por comas")
+        if self.const == 'crop' and (values[2] <= values[0] or values[3] <= values[1]):
+            parser.error("--crop espera X0,Y0,X1,Y1 con X1 > X0 e Y1 > Y0")
+        namespace.steps = (namespace.steps or []) + [(self.const, values)]
+
+
+def _numbers(text):
+    try:
+        return [float(v) for v in text.split(',')]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"números separados por comas: {text!r}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Escalar, trasladar o recortar las coordenadas de un residencial")
+    parser.add_argument('path', help="JSON del residencial (houses_data.json)")
+    parser.add_argument('--scale', dest='steps', action=_Step, const='scale', type=_numbers, metavar='S|SX,SY')
+    parser.add_argument('--translate', dest='steps', action=_Step, const='translate', type=_numbers,
+                        metavar='DX,DY')
+    parser.add_argument('--crop', dest='steps', action=_Step, const='crop', type=_numbers, metavar='X0,Y0,X1,Y1')
+    parser.add_argument('--bake', action='store_true', help="escribir las coordenadas ya transformadas")
+    parser.add_argument('-o', '--output', help="archivo de salida (por omisión, el mismo)")
+    args = parser.parse_args(argv)
+    if not args.steps and not args.bake:
+        parser.error("indica al menos una operación (--scale, --translate, --crop) o --bake")
+
+    transform, bounds = transform_file(args.path, args.steps or [], bake=args.bake, output=args.output)
+    print(f"{args.output or args.path}: escala {transform.scale}, desplazamiento {transform.offset}, "
+          f"lienzo {bounds[0]}x{bounds[1]}{' (horneado)' if args.bake else ''}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,71 @@
+"""Qué items del canvas de Tk necesita una vista: solo lo que la toca y con el detalle que permite el zoom.
+
+Las teselas ya traen el dibujo del mapa; encima, el canvas lleva texto nítido
+que depende del nivel: de lejos, los nombres de los condominios que tienen
+espacio para ellos; de cerca, el detalle de cada casa. Las consultas revisan
+solo la vista (celdas del índice espacial o un recorte en NumPy), así que el
+costo por cuadro no crece con el número de casas.
+"""
+import numpy as np
+
+# Ancho mínimo en pantalla (px) de un condominio para escribir su nombre
+CONDO_LABEL_WIDTH = 90
+
+# Ancho típico de casa en pantalla (px) a partir del cual se muestra el detalle de cada casa
+HOUSE_DETAIL_WIDTH = 48
+
+# Ancho aproximado (px) de un carácter del texto de detalle, para recortarlo a la casa
+DETAIL_CHAR_WIDTH = 6
+
+
+class ViewportLayout:
+    """Geometría para decidir los items de una vista; se arma una vez por versión de datos.
+
+    Las vistas están en píxeles del nivel (coordenadas del canvas) y scale_x,
+    scale_y son los factores del lienzo del residencial a ese nivel.
+    """
+
+    def __init__(self, condominios, table, index):
+        self.condominios = condominios
+        self.table = table
+        self.index = index
+        self.condo_ids = list(condominios)
+        self.condo_boxes = np.array([condo.coords for condo in condominios.values()],
+                                    dtype=np.float64).reshape(-1, 4)
+        widths = np.frombuffer(table.rects, dtype=np.float64).reshape(-1, 4)
+        self.house_width = float(np.median(widths[:, 2] - widths[:, 0])) if len(table) else 0.0
+
+    def house_detail(self, scale_x):
+        """¿Las casas miden en pantalla lo suficiente para mostrar su detalle?"""
+        return self.house_width * scale_x >= HOUSE_DETAIL_WIDTH
+
+    def condo_labels(self, scale_x, scale_y, left, top, right, bottom):
+        """{condo_id: (x, y)} de los nombres de condominio visibles (centro en el canvas)"""
+        if self.house_detail(scale_x):
+            # Con detalle por casa el nombre taparía las casas del centro del condominio
+            return {}
+        boxes = self.condo_boxes * (scale_x, scale_y, scale_x, scale_y)
+        shown = np.flatnonzero((boxes[:, 2] - boxes[:, 0] >= CONDO_LABEL_WIDTH) &
+                               (boxes[:, 0] < right) & (boxes[:, 2] > left) &
+                               (boxes[:, 1] < bottom) & (boxes[:, 3] > top))
+        centers = (boxes[shown, :2] + boxes[shown, 2:]) / 2
+        return {self.condo_ids[i]: (x, y) for i, (x, y) in zip(shown.tolist(), centers.tolist())}
+
+    def houses(self, scale_x, scale_y, left, top, right, bottom):
+        """{house_id: rectángulo en el canvas} de las casas visibles, solo si el nivel muestra su detalle"""
+        if not self.house_detail(scale_x):
+            return {}
+        rects = self.table.scaled_layout(scale_x, scale_y)[0]
+        visible = {}
+        for kind, house_id, label, rect, segment in self.index.query(
+                left / scale_x, top / scale_y, right / scale_x, bottom / scale_y, kinds=('casa',)):
+            position = self.table.positions[house_id]
+            visible[house_id] = tuple(rects[4 * position:4 * position + 4].tolist())
+        return visible
+
+
+def detail_text(house, width):
+    """Texto de detalle de una casa recortado a width píxeles: propietario o, si no tiene, el estado"""
+    text = house.propietario or house.estado
+    limit = max(int(width // DETAIL_CHAR_WIDTH), 1)
+    return text if len(text) <= limit else text[:max(limit - 1, 1)] + '…'
@@ -0,0 +1,128 @@
+"""Servicio de render en un pool de procesos, compartido por las sesiones de Streamlit.
+
+Codificar la imagen del mapa ocupa el hilo de la sesión (y el GIL del
+proceso) durante decenas de milisegundos. Aquí ese trabajo va a procesos
+aparte, y los pedidos iguales se agrupan: mientras uno está en curso, todos
+los que llegan con la misma clave (versión de datos, selección, tamaño)
+reciben el mismo futuro en lugar de codificar otra vez. Los resultados
+terminados se guardan en un LRU pequeño.
+"""
+import importlib
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from map_metrics import count
+
+# Procesos del pool; por omisión uno por núcleo
+RENDER_WORKERS = int(os.environ.get('RESIDENCIAL_RENDER_WORKERS', 0)) or os.cpu_count() or 1
+
+# Resultados terminados que se conservan por clave
+RESULT_ENTRIES = 512
+
+
+def _preload(modules):
+    for name in modules:
+        importlib.import_module(name)
+
+
+class RenderService:
+    """Pool de procesos con pedidos agrupados por clave.
+
+    submit(key, func, *args, then=None) devuelve un futuro con func(*args)
+    calculado en un proceso del pool; then, si se indica, se aplica al
+    resultado en este proceso (por ejemplo, publicar los bytes) antes de
+    completar el futuro. Con la clave ya terminada o en curso no se envía
+    nada: se devuelve el mismo futuro. Los errores no se guardan, así que el
+    siguiente pedido lo vuelve a intentar.
+    """
+
+    def __init__(self, workers=RENDER_WORKERS, entries=RESULT_ENTRIES):
+        self.workers = workers
+        self.entries = entries
+        self._pool = None
+        self._inflight = {}
+        self._done = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _executor(self):
+        if self._pool is None:
+            # spawn: un fork del servidor de Streamlit copiaría hilos y locks a medio usar
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+        return self._pool
+
+    def warm(self, modules=()):
+        """Arrancar los procesos e importar modules en ellos sin esperar, para que el primer pedido
+        no pague el arranque (con spawn, cada proceso parte de un intérprete nuevo)"""
+        with self._lock:
+            pool = self._executor()
+        for _ in range(self.workers):
+            pool.submit(_preload, tuple(modules))
+
+    def get(self, key):
+        """Futuro de la clave si ya está terminado o en curso; None si hay que enviarla"""
+        with self._lock:
+            future = self._done.get(key)
+            if future is not None:
+                self._done.move_to_end(key)
+            else:
+                future = self._inflight.get(key)
+        count('pool.reutilizados' if future is not None else 'pool.ausentes')
+        return future
+
+    def discard(self, key):
+        """Olvidar el resultado terminado de la clave (por ejemplo, si el archivo publicado ya no existe)"""
+        with self._lock:
+            self._done.pop(key, None)
+
+    def submit(self, key, func, *args, then=None):
+        with self._lock:
+            future = self._done.get(key)
+            if future is not None:
+                self._done.move_to_end(key)
+            else:
+                future = self._inflight.get(key)
+            if future is not None:
+                count('pool.reutilizados')
+                return future
+            count('pool.enviados')
+            try:
+                work = self._executor().submit(func, *args)
+            except BrokenProcessPool:
+                # Un proceso murió: el pool no acepta más trabajo y se crea otro
+                self._pool = None
+                work = self._executor().submit(func, *args)
+            future = self._inflight[key] = Future()
+        work.add_done_callback(lambda work: self._finish(key, future, work, then))
+        return future
+
+    def _finish(self, key, future, work, then):
+        try:
+            result = work.result()
+            if then is not None:
+                result = then(result)
+        except BaseException as error:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(error)
+            return
+        with self._lock:
+            del self._inflight[key]
+            self._done[key] = future
+            while len(self._done) > self.entries:
+                self._done.popitem(last=False)
+        future.set_result(result)
+
+    @property
+    def pending(self):
+        with self._lock:
+            return len(self._inflight)
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
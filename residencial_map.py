@@ -2,7 +2,55 @@ import tkinter as tk
 from tkinter import messagebox
 from PIL import Image, ImageTk
 import os
-import json
+from map_registry import discover_registry
+from map_occupancy import build_counters, house_estados, house_keys
+from map_bundle import load_bundle
+from map_index import build_index
+from map_labels import place_street_labels
+from map_layout import compile_layout
+from map_render import ESTADO_COLORS, HOUSE_COLOR, render_base_layer
+from map_sprites import map_font
+from map_tiles import TilePyramid, fit_zoom
+from map_viewport import ViewportLayout, detail_text
+
+# Cada cuánto se revisa (un os.stat) si houses_data.json cambió
+DATA_POLL_MS = 2000
+
+
+class ItemPool:
+    """Items de texto del canvas que se reutilizan: al desplazar la vista los que salen se ocultan
+    y se vuelven a usar, moviéndolos y cambiando su texto, para los que entran"""
+    
+    def __init__(self, canvas, tag, **options):
+        self.canvas = canvas
+        self.tag = tag
+        self.options = options
+        self.used = {}      # clave -> (item, (x, y, texto))
+        self.free = []
+    
+    def show(self, visible):
+        """Mostrar exactamente {clave: (x, y, texto)}"""
+        for key in [key for key in self.used if key not in visible]:
+            item = self.used.pop(key)[0]
+            self.canvas.itemconfigure(item, state=tk.HIDDEN)
+            self.free.append(item)
+        for key, value in visible.items():
+            current = self.used.get(key)
+            if current is not None and current[1] == value:
+                continue
+            x, y, text = value
+            if current is not None:
+                item = current[0]
+            elif self.free:
+                item = self.free.pop()
+            else:
+                item = self.canvas.create_text(x, y, text=text, tags=(self.tag,), **self.options)
+            self.canvas.coords(item, x, y)
+            self.canvas.itemconfigure(item, text=text, state=tk.NORMAL)
+            self.used[key] = (item, value)
+    
+    def __len__(self):
+        return len(self.used) + len(self.free)
 
 class ResidencialMap:
     def __init__(self, root):
@@ -18,13 +66,37 @@ class ResidencialMap:
         # Variables
         self.selected_house = None
         self.houses = {}
+        self.records = {}
         self.layout = {}
         self.areas = {}
         self.condominios = {}
         self.calles = {}
+        self.data_version = None
+        self.bounds = None
+        self.registry = discover_registry()
+        self.residencial_id = next(iter(self.registry))
+        self.repository = None
+        self.counters = None
+        self.house_table = None
+        self.bundle = None
+        self.index = None
+        
+        # Teselas del nivel de zoom actual: solo existen items para las que se ven
+        self.pyramid = None
+        self.zoom_level = 0
+        self.tile_items = {}    # (x, y) -> (item del canvas, PhotoImage)
+        # Texto nítido encima de las teselas, solo para lo visible y según el nivel de detalle
+        self.viewport = None
+        self.pools = {}
+        self.house_records = {}
+        self.selection_item = None
+        self.street_labels = {}
+        self.font = map_font()
         
-        # Cargar datos desde el archivo JSON
-        self.load_house_data()
+        # Cargar datos desde el archivo JSON; sin datos válidos no hay mapa que mostrar
+        if not self.load_house_data():
+            self.root.destroy()
+            raise SystemExit(1)
         
         # Crear el área del mapa
         self.create_map_area()
@@ -32,22 +104,46 @@ class ResidencialMap:
         # Panel de información
         self.create_info_panel()
         
+        # Revisar periódicamente si cambió el JSON para redibujar sin reiniciar
+        self.root.after(DATA_POLL_MS, self.reload_if_changed)
+        
         print("Aplicación iniciada correctamente.")
         
+    def reload_if_changed(self):
+        try:
+            if self.registry.load(self.residencial_id).version != self.data_version and self.load_house_data():
+                self.draw_map()
+        except (OSError, ValueError) as e:
+            print(f"Error al recargar datos: {str(e)}")
+        self.root.after(DATA_POLL_MS, self.reload_if_changed)
+        
     def load_house_data(self):
+        """Cargar el residencial actual; False (y los datos anteriores intactos) si no se pudo"""
         try:
-            print("Cargando datos desde houses_data.json...")
-            with open('houses_data.json', 'r', encoding='utf-8') as file:
-                data = json.load(file)
-                self.houses = data['houses']
-                self.layout = data.get('layout', {})
-                self.areas = data.get('areas', {})
-                self.condominios = data.get('condominios', {})
-                self.calles = data.get('calles', {})
-                print("Datos cargados correctamente")
+            entry = self.registry[self.residencial_id]
+            print(f"Cargando datos desde {os.path.basename(entry.path)}...")
+            # Los datos se validan al leerlos (map_schema): si no cumplen el esquema no se asigna nada
+            data = self.registry.load(self.residencial_id)
+            # Los registros de casas se consultan en SQLite; se importan de nuevo solo si el JSON cambió
+            repository = self.registry.repository(self.residencial_id)
+            repository.sync_with(data)
+            records = dict(repository.find(limit=None))
+            self.data_version = data.version
+            self.bounds = data.bounds
+            self.repository = repository
+            self.records = records
+            self.counters = build_counters(records)
+            self.houses = data.houses
+            self.layout = data.layout
+            self.areas = data.areas
+            self.condominios = data.condominios
+            self.calles = data.calles
+            print("Datos cargados correctamente")
+            return True
         except Exception as e:
             print(f"Error al cargar datos: {str(e)}")
             messagebox.showerror("Error", f"No se pudo cargar los datos: {str(e)}")
+            return False
     
     def create_map_area(self):
         # Frame principal con scrollbars
@@ -67,136 +163,241 @@ class ResidencialMap:
                               yscrollcommand=v_scroll.set)
         self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         
-        # Configurar scrollbars
-        h_scroll.config(command=self.canvas.xview)
-        v_scroll.config(command=self.canvas.yview)
+        # Configurar scrollbars: al desplazarse se crean las teselas que entran a la vista
+        h_scroll.config(command=lambda *args: self.scroll(self.canvas.xview, *args))
+        v_scroll.config(command=lambda *args: self.scroll(self.canvas.yview, *args))
         
-        # Habilitar zoom con la rueda del mouse
-        self.canvas.bind('<MouseWheel>', self.zoom)
+        # Zoom con la rueda del mouse (Button-4/5 en X11) y arrastre con el botón derecho
+        self.canvas.bind('<MouseWheel>', lambda event: self.zoom(event, 1 if event.delta > 0 else -1))
+        self.canvas.bind('<Button-4>', lambda event: self.zoom(event, 1))
+        self.canvas.bind('<Button-5>', lambda event: self.zoom(event, -1))
+        self.canvas.bind('<ButtonPress-3>', lambda event: self.canvas.scan_mark(event.x, event.y))
+        self.canvas.bind('<B3-Motion>', self.drag)
+        self.canvas.bind('<Configure>', self.update_view)
         
         # Dibujar el mapa
         self.draw_map()
     
-    def zoom(self, event):
-        # Zoom in/out con la rueda del mouse
-        scale = 1.1 if event.delta > 0 else 0.9
-        self.canvas.scale("all", event.x, event.y, scale, scale)
+    def scroll(self, view, *args):
+        view(*args)
+        self.update_view()
+    
+    def drag(self, event):
+        self.canvas.scan_dragto(event.x, event.y, gain=1)
+        self.update_view()
+    
+    def zoom(self, event, step):
+        # Cambiar de nivel de la pirámide conservando bajo el puntero el mismo punto del mapa
+        level = min(max(self.zoom_level + step, 0), self.pyramid.max_zoom)
+        if level == self.zoom_level:
+            return
+        old_width, old_height = self.pyramid.level_size(self.zoom_level)
+        fraction_x = self.canvas.canvasx(event.x) / old_width
+        fraction_y = self.canvas.canvasy(event.y) / old_height
+        self.zoom_level = level
+        width, height = self.pyramid.level_size(level)
+        self.show_level()
+        self.canvas.xview_moveto((fraction_x * width - event.x) / width)
+        self.canvas.yview_moveto((fraction_y * height - event.y) / height)
+        self.update_view()
+    
+    def render_tile_window(self, width, height, colors, clip=None):
+        # Las teselas del nivel precompilado se recortan de la capa del paquete mientras sus casas no cambien
+        if self.bundle is not None:
+            layer = self.bundle.layer(width, height, colors, clip)
+            if layer is not None:
+                return layer
+        labels = self.street_labels.get((width, height))
+        if labels is None and self.bundle is not None:
+            labels = self.bundle.street_labels(width, height)
+        if labels is None:
+            labels = place_street_labels(self.calles, self.font, *self.house_table.scale(width, height))
+        self.street_labels[(width, height)] = labels
+        return render_base_layer(self.areas, self.condominios, self.calles, self.house_table, width, height,
+                                 self.font, street_labels=labels, house_colors=colors, clip=clip)
     
     def draw_map(self):
-        # Limpiar el canvas
+        # Geometría de casas compilada: del paquete de map_bundle si corresponde a estos datos
+        self.bundle = load_bundle(self.residencial_id, self.data_version, self.font)
+        if self.bundle is not None:
+            self.house_table = self.bundle.table(self.condominios, self.layout, self.bounds)
+        else:
+            self.house_table = compile_layout(self.condominios, self.layout, self.bounds)
+        # El índice espacial y el texto de la vista se arman después del primer cuadro
+        self.index = None
+        self.viewport = None
+        self.root.after_idle(self.build_overlay)
+        # Registro de cada casa de la tabla (las claves del repositorio pueden no ser las de la tabla)
+        self.house_records = {house_id: self.records[key]
+                              for house_id, key in house_keys(self.house_table, self.records).items()}
+        
+        # Un canvas nuevo: teselas, texto reutilizable y la casa seleccionada
         self.canvas.delete("all")
+        self.tile_items = {}
+        self.pools = {
+            'condo_label': ItemPool(self.canvas, 'condo_label', font=('Arial', 11)),
+            'condo_houses': ItemPool(self.canvas, 'condo_houses', font=('Arial', 10), fill='#666666'),
+            'house_detail': ItemPool(self.canvas, 'house_detail', font=('Arial', 8), fill='#333333', anchor=tk.S),
+        }
+        self.selection_item = None
+        self.selected_house = None
         
-        # Establecer la región scrollable
-        self.canvas.configure(scrollregion=(0, 0, 1500, 900))
-        
-        # Dibujar calles
-        for calle_id, calle_data in self.calles.items():
-            start = calle_data['start']
-            end = calle_data['end']
-            width = calle_data.get('width', 30)
-            
-            # Dibujar la calle
-            self.canvas.create_line(
-                start[0], start[1], end[0], end[1],
-                width=width, fill='#808080',
-                capstyle=tk.ROUND,
-                tags=('calle', calle_id)
-            )
-            
-            # Agregar nombre de la calle
-            text_x = (start[0] + end[0]) / 2
-            text_y = (start[1] + end[1]) / 2
-            self.canvas.create_text(
-                text_x, text_y,
-                text=calle_data['id'],
-                fill='white',
-                font=('Arial', 10, 'bold'),
-                tags=('calle_label', calle_id)
-            )
-        
-        # Dibujar áreas (alberca y parque)
-        for area_id, area_data in self.areas.items():
-            coords = area_data['coords']
-            color = '#00CED1' if area_data['tipo'] == 'alberca_pergola' else '#90EE90'
-            
-            self.canvas.create_rectangle(
-                coords[0], coords[1], coords[2], coords[3],
-                fill=color, outline='black',
-                width=2,
-                tags=(area_id, 'area')
-            )
-            
-            # Agregar etiqueta del área
-            center_x = (coords[0] + coords[2]) / 2
-            center_y = (coords[1] + coords[3]) / 2
-            self.canvas.create_text(
-                center_x, center_y,
-                text=area_data['descripcion'],
-                font=('Arial', 12, 'bold'),
-                tags=(f"{area_id}_label", 'area_label')
-            )
-        
-        # Dibujar condominios
-        for condo_id, condo_data in self.condominios.items():
-            coords = condo_data['coords']
-            
-            self.canvas.create_rectangle(
-                coords[0], coords[1], coords[2], coords[3],
-                fill='#F5F5F5',
-                outline='black',
-                width=2,
-                tags=(condo_id, 'condominio')
-            )
-            
-            # Agregar etiqueta del condominio
-            center_x = (coords[0] + coords[2]) / 2
-            center_y = (coords[1] + coords[3]) / 2
-            self.canvas.create_text(
-                center_x, center_y,
-                text=condo_data['descripcion'],
-                font=('Arial', 11),
-                tags=(f"{condo_id}_label", 'condo_label')
-            )
-            
-            # Dibujar número de casas
-            self.canvas.create_text(
-                center_x, center_y + 20,
-                text=f"{condo_data['casas']} casas",
-                font=('Arial', 10),
-                fill='#666666',
-                tags=(f"{condo_id}_houses", 'condo_houses')
-            )
+        # Teselas dibujadas a pedido desde la geometría y guardadas en disco (map_tiles), con las
+        # casas coloreadas por estado; el zoom cambia de nivel en lugar de escalar items
+        colors = [ESTADO_COLORS.get(estado, HOUSE_COLOR) for estado in house_estados(self.house_table, self.counters)]
+        self.street_labels = {}
+        self.pyramid = TilePyramid(self.residencial_id, self.data_version, self.house_table,
+                                   self.render_tile_window, colors)
+        self.zoom_level = fit_zoom(self.bounds, *self.viewport_size())
+        self.show_level()
+        self.canvas.xview_moveto(0)
+        self.canvas.yview_moveto(0)
+        self.update_view()
         
         # Configurar eventos
-        self.canvas.tag_bind('condominio', '<Button-1>', self.show_condo_info)
-        self.canvas.tag_bind('area', '<Button-1>', self.show_area_info)
-    
-    def show_condo_info(self, event):
-        # Obtener el condominio clickeado
-        clicked_items = self.canvas.find_withtag('current')
-        tags = self.canvas.gettags(clicked_items[0])
-        for tag in tags:
-            if tag in self.condominios:
-                condo_data = self.condominios[tag]
-                info = f"Condominio: {condo_data['descripcion']}\n"
-                info += f"Número de casas: {condo_data['casas']}\n"
-                info += f"Orientación: {condo_data['orientacion']}"
-                
-                self.update_info_panel_general("Información del Condominio", info)
-                break
-    
-    def show_area_info(self, event):
-        # Obtener el área clickeada
-        clicked_items = self.canvas.find_withtag('current')
-        tags = self.canvas.gettags(clicked_items[0])
-        for tag in tags:
-            if tag in self.areas:
-                area_data = self.areas[tag]
-                info = f"Área: {area_data['descripcion']}\n"
-                info += f"Tipo: {area_data['tipo']}"
-                
-                self.update_info_panel_general("Información del Área", info)
-                break
+        self.canvas.bind('<Button-1>', self.on_map_click)
+    
+    def build_overlay(self):
+        # Índice espacial para resolver los clics sin recorrer tags y geometría del texto de la vista
+        if self.index is not None:
+            return
+        self.index = build_index(self.areas, self.condominios, self.calles, self.house_table)
+        self.viewport = ViewportLayout(self.condominios, self.house_table, self.index)
+        self.update_view()
+    
+    def viewport_size(self):
+        # Antes de mostrarse la ventana el canvas mide 1x1: se usa el tamaño pedido
+        if self.canvas.winfo_width() > 1:
+            return self.canvas.winfo_width(), self.canvas.winfo_height()
+        return self.canvas.winfo_reqwidth(), self.canvas.winfo_reqheight()
+    
+    def level_scale(self):
+        # Factores del lienzo del residencial al nivel de zoom actual (coordenadas del canvas)
+        return self.house_table.scale(*self.pyramid.level_size(self.zoom_level))
+    
+    def visible_region(self):
+        left, top = self.canvas.canvasx(0), self.canvas.canvasy(0)
+        width, height = self.viewport_size()
+        return left, top, left + width, top + height
+    
+    def show_level(self):
+        # Región scrollable del nivel; las teselas y el texto del nivel anterior ya no sirven
+        self.canvas.delete('tesela')
+        self.tile_items = {}
+        for pool in self.pools.values():
+            pool.show({})
+        width, height = self.pyramid.level_size(self.zoom_level)
+        self.canvas.configure(scrollregion=(0, 0, width, height))
+        self.show_selection()
+    
+    def update_view(self, event=None):
+        # Cada desplazamiento o zoom: teselas y texto solo de lo que se ve
+        if self.pyramid is None:
+            return
+        region = self.visible_region()
+        self.update_tiles(region)
+        if self.viewport is not None:
+            self.update_overlay(region)
+    
+    def update_overlay(self, region):
+        # De lejos, nombres de condominio donde caben; de cerca, el detalle de cada casa
+        scale_x, scale_y = self.level_scale()
+        labels = self.viewport.condo_labels(scale_x, scale_y, *region)
+        self.pools['condo_label'].show({
+            condo_id: (x, y, self.condominios[condo_id].descripcion) for condo_id, (x, y) in labels.items()})
+        self.pools['condo_houses'].show({
+            condo_id: (x, y + 20, f"{self.condominios[condo_id].casas} casas") for condo_id, (x, y) in labels.items()})
+        details = {}
+        for house_id, (x0, y0, x1, y1) in self.viewport.houses(scale_x, scale_y, *region).items():
+            house = self.house_records.get(house_id)
+            if house is not None:
+                details[house_id] = ((x0 + x1) / 2, y1 - 2, detail_text(house, x1 - x0))
+        self.pools['house_detail'].show(details)
+    
+    def update_tiles(self, region):
+        # Crear las teselas que entraron a la vista y borrar las que salieron
+        visible = set(self.pyramid.visible_tiles(self.zoom_level, *region))
+        for key in [key for key in self.tile_items if key not in visible]:
+            self.canvas.delete(self.tile_items.pop(key)[0])
+        for x, y in sorted(visible - self.tile_items.keys()):
+            path = os.path.join(self.pyramid.directory, self.pyramid.tile(self.zoom_level, x, y))
+            photo = ImageTk.PhotoImage(Image.open(path))
+            x0, y0 = self.pyramid.tile_box(self.zoom_level, x, y)[:2]
+            item = self.canvas.create_image(x0, y0, image=photo, anchor=tk.NW, tags=('tesela',))
+            self.tile_items[(x, y)] = (item, photo)
+        # El texto y la selección quedan por encima de las teselas
+        self.canvas.tag_lower('tesela')
+    
+    def show_selection(self):
+        # Contorno de la casa seleccionada en el nivel actual
+        if self.selection_item is not None:
+            self.canvas.delete(self.selection_item)
+            self.selection_item = None
+        index = self.house_table.positions.get(self.selected_house)
+        if index is None:
+            return
+        rects = self.house_table.scaled_layout(*self.level_scale())[0]
+        self.selection_item = self.canvas.create_rectangle(
+            *rects[4 * index:4 * index + 4].tolist(), outline='#FFD700', width=3, tags=('seleccion',))
+    
+    def on_map_click(self, event):
+        # Deshacer scroll y zoom para obtener coordenadas del JSON y consultar el índice; las casas
+        # solo se pueden elegir en los niveles que muestran su detalle
+        self.build_overlay()
+        scale_x, scale_y = self.level_scale()
+        x = self.canvas.canvasx(event.x) / scale_x
+        y = self.canvas.canvasy(event.y) / scale_y
+        kinds = ('condominio', 'area')
+        if self.viewport.house_detail(scale_x):
+            kinds = ('casa',) + kinds
+        hit = self.index.hit(x, y, kinds=kinds)
+        if hit is None:
+            return
+        kind, entity_id = hit[0], hit[1]
+        if kind == 'casa':
+            self.show_house_info(entity_id)
+        elif kind == 'condominio':
+            self.show_condo_info(entity_id)
+        else:
+            self.show_area_info(entity_id)
+    
+    def show_house_info(self, house_id):
+        self.selected_house = house_id
+        self.show_selection()
+        index = self.house_table.positions[house_id]
+        condo_data = self.condominios[self.house_table.condo_ids[index]]
+        info = f"{condo_data.descripcion} - Casa {self.house_table.labels[index]}"
+        house = self.house_records.get(house_id)
+        if house is None:
+            info += "\nSin registro"
+        else:
+            info += f"\nDirección: {house.direccion}\nEstado: {house.estado}"
+            if house.propietario is not None:
+                info += f"\nPropietario: {house.propietario}"
+            if house.tamano is not None:
+                info += f"\nTamaño: {house.tamano}"
+        
+        self.update_info_panel_general("Información de la Casa", info)
+    
+    def show_condo_info(self, condo_id):
+        condo_data = self.condominios[condo_id]
+        info = f"Condominio: {condo_data.descripcion}\n"
+        info += f"Número de casas: {condo_data.casas}\n"
+        info += f"Orientación: {condo_data.orientacion}"
+        occupancy = self.counters.summary(condo_id)
+        for estado, count in occupancy.por_estado.items():
+            info += f"\n{estado}: {count} ({occupancy.metros_por_estado[estado]:,.0f} m²)"
+        if occupancy.casas:
+            info += f"\nSuperficie total: {occupancy.metros:,.0f} m²"
+        
+        self.update_info_panel_general("Información del Condominio", info)
+    
+    def show_area_info(self, area_id):
+        area_data = self.areas[area_id]
+        info = f"Área: {area_data.descripcion}\n"
+        info += f"Tipo: {area_data.tipo}"
+        
+        self.update_info_panel_general("Información del Área", info)
 
     def create_info_panel(self):
         """Crear el panel lateral para mostrar información detallada"""
@@ -211,6 +412,13 @@ class ResidencialMap:
             bg="#e0e0e0")
         self.info_title.pack(pady=20)
         
+        # Selector de residencial, solo si hay más de uno registrado
+        if len(self.registry) > 1:
+            names = {self.registry[r].nombre: r for r in self.registry}
+            self.residencial_var = tk.StringVar(value=self.registry[self.residencial_id].nombre)
+            tk.OptionMenu(self.info_frame, self.residencial_var, *names,
+                          command=lambda nombre: self.select_residencial(names[nombre])).pack(pady=(0, 10))
+        
         # Contenido
         self.info_content = tk.Label(self.info_frame,
             text="Haga clic en un elemento del mapa\npara ver su información",
@@ -220,6 +428,18 @@ class ResidencialMap:
             wraplength=250)
         self.info_content.pack(padx=20, pady=10)
     
+    def select_residencial(self, residencial_id):
+        if residencial_id == self.residencial_id:
+            return
+        previous, self.residencial_id = self.residencial_id, residencial_id
+        if not self.load_house_data():
+            # Datos rechazados: se sigue mostrando el residencial anterior
+            self.residencial_id = previous
+            self.residencial_var.set(self.registry[previous].nombre)
+            return
+        self.draw_map()
+        self.update_info_panel_general("Información", "Haga clic en un elemento del mapa\npara ver su información")
+    
     def update_info_panel_general(self, title, content):
         self.info_title.config(text=title)
         self.info_content.config(text=content)
@@ -1,9 +1,399 @@
 import streamlit as st
 import streamlit.components.v1 as components
 import json
-from PIL import Image, ImageDraw, ImageFont
-import io
-import base64
+import os
+import re
+import threading
+import time
+import hashlib
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from map_render import render_base_layer, draw_selection
+from map_labels import place_street_labels
+from map_data import ESTADOS
+from map_cache import memory_cached, shared_cache
+from map_registry import discover_registry
+from map_schema import SchemaError
+from map_occupancy import build_counters, house_estados, house_keys, house_number
+from map_feed import ChangeFeed
+from map_live import LiveMap
+from map_layout import compile_layout
+from map_sprites import map_font
+import map_metrics
+from map_metrics import begin_trace, count, end_trace, span, traced
+
+# Modos de dibujo del mapa: imagen compuesta en el servidor, SVG resaltado en el navegador o
+# teselas con acercamiento (solo se piden las que se ven)
+RENDER_MODES = {"Imagen (PNG)": 'png', "Vectorial (SVG)": 'svg', "Teselas (zoom)": 'tiles'}
+
+# Filas que muestra la búsqueda de casas del panel
+SEARCH_LIMIT = 100
+
+# Sugerencias del cuadro de búsqueda
+SEARCH_SUGGESTIONS = 8
+
+# Problemas de esquema que se listan en la página cuando los datos no son válidos
+SCHEMA_PROBLEMS = 20
+
+# Espera máxima (s) de la imagen del mapa en un rerun; si no llega, se muestra la anterior de la
+# sesión y la sesión se vuelve a ejecutar cuando esté lista
+RENDER_WAIT = 0.25
+
+
+# Las capas, tablas e índices de cada residencial viven en la caché acotada por memoria de
+# map_cache (compartida por las sesiones): con muchos residenciales se descartan los menos usados
+
+@memory_cached
+def get_bundle(residencial_id, data_version, _map):
+    """Recursos precompilados (map_bundle) de esta versión de datos, o None si no hay o no corresponden"""
+    from map_bundle import load_bundle
+    return load_bundle(residencial_id, data_version, _map.font)
+
+
+@memory_cached
+def get_house_table(data_version, _map):
+    """Geometría de casas compilada una vez por versión de datos (leída del paquete si lo hay)"""
+    bundle = get_bundle(_map.residencial_id, data_version, _map)
+    if bundle is not None:
+        return bundle.table(_map.condominios, _map.layout, _map.bounds)
+    return compile_layout(_map.condominios, _map.layout, _map.bounds)
+
+
+@memory_cached
+def get_street_labels(data_version, width, height, _map):
+    """Colocación de las etiquetas de calles, calculada una vez por versión de datos y tamaño"""
+    bundle = get_bundle(_map.residencial_id, data_version, _map)
+    labels = bundle.street_labels(width, height) if bundle is not None else None
+    if labels is not None:
+        return labels
+    return place_street_labels(_map.calles, _map.font, *get_house_table(data_version, _map).scale(width, height))
+
+
+@memory_cached
+def get_house_estados(residencial_id, data_version, revision, _map):
+    """Estado de cada casa en el orden de la tabla, una vez por cambio aplicado al residencial"""
+    return house_estados(get_house_table(data_version, _map), _map.live.counters)
+
+
+@memory_cached
+def get_house_keys(residencial_id, data_version, _map):
+    """Clave del repositorio de cada casa de la tabla; las claves del JSON pueden no ser las de la tabla"""
+    return house_keys(get_house_table(data_version, _map), dict(_map.repository.find(limit=None)))
+
+
+def get_base_layer(data_version, width, height, _map):
+    """Capa base compartida por todas las sesiones: se dibuja completa una vez por versión de datos y
+    tamaño, y después LiveMap repinta solo las casas que cambian de estado"""
+    def render(colors, clip=None):
+        # Donde las casas conservan los colores del build, la capa sale del paquete ya dibujada
+        bundle = get_bundle(_map.residencial_id, data_version, _map)
+        layer = bundle.layer(width, height, colors, clip) if bundle is not None else None
+        if layer is not None:
+            return layer
+        table = get_house_table(data_version, _map)
+        labels = get_street_labels(data_version, width, height, _map)
+        return render_base_layer(_map.areas, _map.condominios, _map.calles, table, width, height, _map.font,
+                                 street_labels=labels, house_colors=colors, clip=clip)
+    return _map.live.base_layer(width, height, render)
+
+
+@st.cache_resource(show_spinner=False)
+def get_registry():
+    """Residenciales disponibles; cada uno se carga y abre su repositorio SQLite al primer uso"""
+    return discover_registry()
+
+
+@st.cache_resource(max_entries=64, show_spinner=False)
+def sync_repository(residencial_id, data_version, _data):
+    """Importar las casas del JSON una vez por versión de datos; las ediciones posteriores se conservan"""
+    get_registry().repository(residencial_id).sync_with(_data)
+
+
+@memory_cached
+def get_search_index(residencial_id, data_version, _map):
+    """Índice de búsqueda de casas, construido una vez por versión de datos desde el repositorio"""
+    from map_search import build_search_index
+    return build_search_index(dict(_map.repository.find(limit=None)), _map.condominios)
+
+
+@st.cache_resource(show_spinner=False)
+def get_feed():
+    """Canal de cambios del proceso: cada sesión publica sus cambios de estado y recibe los de las demás"""
+    return ChangeFeed()
+
+
+@memory_cached
+def get_live_map(residencial_id, data_version, _map):
+    """Contadores de ocupación y capas base, construidos una vez por versión de datos y al día con el canal"""
+    feed = get_feed()
+    # La secuencia se lee antes de recorrer el repositorio: lo publicado durante el recorrido se reaplica
+    sequence = feed.sequence
+    counters = build_counters(dict(_map.repository.find(limit=None)))
+    return LiveMap(residencial_id, get_house_table(data_version, _map), counters, feed, sequence)
+
+
+def session_waker():
+    """Función que pide un rerun de la sesión actual desde otro hilo (False si la sesión ya no existe).
+
+    None si no corre bajo `streamlit run` (pruebas con AppTest): ahí no hay sesiones que despertar.
+    """
+    try:
+        from streamlit.runtime import Runtime
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        session_id = get_script_run_ctx().session_id
+        runtime = Runtime.instance()
+        eventloop = runtime._get_async_objs().eventloop
+    except Exception:
+        return None
+    
+    def rerun():
+        # En el event loop de Streamlit, como un rerun pedido por el navegador; None conserva los widgets
+        info = runtime._session_mgr.get_active_session_info(session_id)
+        if info is not None:
+            info.session.request_rerun(None)
+    
+    def wake():
+        if not runtime.is_active_session(session_id):
+            return False
+        eventloop.call_soon_threadsafe(rerun)
+        return True
+    
+    return wake
+
+
+def condo_house_ids(condo_id, condo):
+    """Opciones del selector de casas de un condominio, en orden numérico ascendente"""
+    return [f"{condo_id}-{i+1:02d}" for i in range(condo.casas)]
+
+
+def select_residencial():
+    # Callback: los selectores de condominio y casa del residencial anterior no aplican al nuevo
+    for key in ('condo_selector', 'house_selector'):
+        st.session_state.pop(key, None)
+    st.session_state.pop('tile_view', None)
+    st.session_state.selected_condo = None
+    st.session_state.selected_house = None
+    st.session_state.show_details = False
+
+
+def set_tile_view(view):
+    # Callback de los botones de acercar/desplazar: (nivel, centro x, centro y) o None para ver todo
+    st.session_state.tile_view = view
+
+
+def select_search_result(condo_id, house_id):
+    # Callback: corre antes del siguiente rerun, así que los selectores ya se crean con el resultado
+    st.session_state.condo_selector = condo_id
+    if house_id is not None:
+        st.session_state.house_selector = house_id
+        st.session_state.show_details = True
+
+
+# Carpeta servida por Streamlit en app/static/ (requiere server.enableStaticServing)
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+
+# Los archivos de static/ que nadie pidió en este tiempo (s) se borran; cada revisión de estados
+# publica imágenes nuevas, así que sin esto la carpeta solo crece
+STATIC_MAX_AGE = float(os.environ.get('RESIDENCIAL_STATIC_MAX_AGE', 24 * 3600))
+
+# Cada cuánto (s) se revisa static/ en busca de archivos viejos
+STATIC_PRUNE_INTERVAL = 600
+
+# Archivos de publish_static (y temporales que quedaron de una escritura interrumpida)
+_STATIC_NAME = re.compile(r'[a-z]+_[0-9a-f]{20}\.\w+(\.\d+\.\d+\.tmp)?')
+_last_prune = [0.0]
+_prune_lock = threading.Lock()
+
+
+def prune_static(max_age=STATIC_MAX_AGE, force=False):
+    """Borrar de static/ los archivos publicados que no se usaron en max_age segundos; devuelve cuántos"""
+    now = time.time()
+    with _prune_lock:
+        if not force and now - _last_prune[0] < STATIC_PRUNE_INTERVAL:
+            return 0
+        _last_prune[0] = now
+    removed = 0
+    try:
+        entries = list(os.scandir(STATIC_DIR))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        try:
+            if (_STATIC_NAME.fullmatch(entry.name) and entry.is_file()
+                    and entry.stat().st_mtime < now - max_age):
+                os.remove(entry.path)
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def publish_static(content, prefix, extension):
+    """Guardar bytes en static/ con nombre por hash de contenido y devolver su URL"""
+    digest = hashlib.sha1(content).hexdigest()[:20]
+    filename = f"{prefix}_{digest}.{extension}"
+    path = os.path.join(STATIC_DIR, filename)
+    
+    # Mismo contenido, mismo nombre: solo se escribe la primera vez (rename atómico, con un temporal
+    # por hilo porque varias sesiones pueden publicar lo mismo a la vez); después solo se renueva su fecha
+    if not keep_static(filename):
+        os.makedirs(STATIC_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as file:
+            file.write(content)
+        os.replace(tmp_path, path)
+    prune_static()
+    
+    # El parámetro v hace que Tornado envíe Cache-Control con max-age de 10 años
+    return f"app/static/{filename}?v={digest}"
+
+
+def keep_static(url):
+    """Renovar la fecha de un archivo publicado (por nombre o URL); False si no existe o ya se borró"""
+    try:
+        os.utime(os.path.join(STATIC_DIR, url.split('?', 1)[0].rsplit('/', 1)[-1]))
+        return True
+    except FileNotFoundError:
+        return False
+
+
+# Las teselas se guardan dentro de static/ para que el navegador las pida directamente
+TILES_DIR = os.path.join(STATIC_DIR, 'tiles')
+
+
+def get_tile_pyramid(data_version, _map):
+    """Teselas compartidas por las sesiones: cada una se dibuja la primera vez que alguien la ve, y
+    LiveMap invalida solo las que tocan una casa que cambia de estado"""
+    from map_tiles import TilePyramid
+    table = get_house_table(data_version, _map)
+    bundle = get_bundle(_map.residencial_id, data_version, _map)
+    
+    def render(width, height, colors, clip=None):
+        layer = bundle.layer(width, height, colors, clip) if bundle is not None else None
+        if layer is not None:
+            return layer
+        labels = get_street_labels(data_version, width, height, _map)
+        return render_base_layer(_map.areas, _map.condominios, _map.calles, table, width, height, _map.font,
+                                 street_labels=labels, house_colors=colors, clip=clip)
+    
+    return _map.live.tile_pyramid(
+        lambda colors: TilePyramid(_map.residencial_id, data_version, table, render, colors, TILES_DIR))
+
+
+def tile_url(path):
+    # El nombre ya lleva el hash de la tesela; v pide a Tornado el Cache-Control de larga duración
+    digest = os.path.splitext(os.path.basename(path))[0].rsplit('_', 1)[1]
+    return f"app/static/tiles/{path.replace(os.sep, '/')}?v={digest}"
+
+
+@st.cache_resource(max_entries=64, show_spinner=False)
+def publish_client_index(data_version, width, height, _map):
+    """Publicar el índice espacial serializado para el hover del navegador"""
+    bundle = get_bundle(_map.residencial_id, data_version, _map)
+    content = bundle.client_index(width, height) if bundle is not None else None
+    if content is None:
+        from map_index import build_index
+        table = get_house_table(data_version, _map)
+        index = build_index(_map.areas, _map.condominios, _map.calles, table, *table.scale(width, height))
+        content = json.dumps(index.to_client(), separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return publish_static(content, 'index', 'json')
+
+
+@st.cache_resource(show_spinner=False)
+def get_render_service():
+    """Pool de procesos que codifica las imágenes del mapa, compartido por las sesiones; sus procesos
+    arrancan en cuanto se crea, mientras el primer mapa sale del paquete o de la capa base"""
+    from map_workers import RenderService
+    service = RenderService()
+    service.warm(['map_encode'])
+    return service
+
+
+def publish_map_image(residencial_id, data_version, revision, width, height, selected_house, image_format, _map):
+    """Futuro con la URL de la imagen: la selección se compone aquí sobre la capa base y la imagen se
+    codifica y publica en el pool; las sesiones que piden la misma imagen comparten el futuro"""
+    from map_encode import FORMATS, encode_image
+    service = get_render_service()
+    key = ('map', residencial_id, data_version, revision, width, height, selected_house, image_format)
+    future = service.get(key)
+    if future is not None and future.done() and future.exception() is None and not keep_static(future.result()):
+        # La imagen se borró de static/ por vieja: se vuelve a publicar
+        service.discard(key)
+        future = None
+    if future is None and selected_house is None:
+        # Sin selección y sin cambios desde el build, la imagen ya codificada está en el paquete
+        bundle = get_bundle(residencial_id, data_version, _map)
+        content = None
+        if bundle is not None:
+            content = bundle.encoded(width, height, _map.live.house_colors(), image_format)
+        if content is not None:
+            future = Future()
+            future.set_result(publish_static(content, 'map', FORMATS[image_format][2]))
+            return future
+    if future is None:
+        with span('capa_base'):
+            base = get_base_layer(data_version, width, height, _map)
+        with span('seleccion'):
+            img = draw_selection(base, get_house_table(data_version, _map), selected_house, _map.font)
+        extension = FORMATS[image_format][2]
+        
+        def publish(content):
+            count('imagen.bytes', len(content))
+            return publish_static(content, 'map', extension)
+        
+        future = service.submit(key, encode_image, img, image_format, then=publish)
+    return future
+
+
+def client_image_format():
+    """Formato de imagen para el navegador de esta sesión (WebP si lo muestra), elegido una vez"""
+    if 'image_format' not in st.session_state:
+        from map_encode import choose_format
+        try:
+            from streamlit.web.server.websocket_headers import _get_websocket_headers
+            user_agent = (_get_websocket_headers() or {}).get('User-Agent')
+        except Exception:
+            user_agent = None
+        st.session_state.image_format = choose_format(user_agent)
+    return st.session_state.image_format
+
+
+@st.cache_resource(max_entries=64, show_spinner=False)
+def publish_map_svg(residencial_id, data_version, revision, width, height, _map):
+    """Publicar el mapa vectorial sin selección; no cambia al seleccionar otra casa"""
+    from map_svg import render_svg
+    svg = render_svg(_map.areas, _map.condominios, _map.calles, get_house_table(data_version, _map),
+                     width, height, _map.font, street_labels=get_street_labels(data_version, width, height, _map),
+                     house_estados=get_house_estados(residencial_id, data_version, revision, _map))
+    return publish_static(svg.encode('utf-8'), 'map', 'svg')
+
+
+# Texto de Prometheus con las métricas del proceso (RESIDENCIAL_METRICS=1); bajo static/ se lee en
+# app/static/metrics.txt
+METRICS_FILE = os.environ.get('RESIDENCIAL_METRICS_FILE', os.path.join(STATIC_DIR, 'metrics.txt'))
+
+
+@st.cache_resource(show_spinner=False)
+def get_exporter():
+    """Exportación de las métricas del proceso, con el estado de la caché y del pool como gauges"""
+    from map_metrics import Exporter
+    
+    def gauges():
+        stats = shared_cache().stats()
+        return {'cache_entradas': stats['entradas'], 'cache_bytes': stats['bytes'],
+                'pool_pendientes': get_render_service().pending}
+    return Exporter(METRICS_FILE, gauges)
+
+
+def show_debug_panel(trace):
+    """Tiempos y contadores del rerun que acaba de terminar, en la barra lateral"""
+    with st.sidebar.expander("Depuración", expanded=True):
+        st.caption(f"Rerun: {trace.total_ms:.1f} ms")
+        st.dataframe([{'Tramo': '\u2003' * depth + name, 'ms': round(ms or 0.0, 2)}
+                      for name, depth, ms in trace.spans], hide_index=True)
+        if trace.counters:
+            st.dataframe([{'Contador': name, 'Valor': value} for name, value in sorted(trace.counters.items())],
+                         hide_index=True)
+
 
 class ResidencialMap:
     def __init__(self):
@@ -11,17 +401,19 @@ class ResidencialMap:
         st.title("Mapa Residencial")
         
         # Variables
-        self.houses = {}
+        self.residencial_id = None
+        self.bounds = None
+        self.repository = None
+        self.live = None
+        self.counters = None
         self.layout = {}
         self.areas = {}
         self.condominios = {}
         self.calles = {}
+        self.data_version = None
         
-        # Configurar fuente para dibujar texto
-        try:
-            self.font = ImageFont.truetype("/System/Library/Fonts/Arial.ttf", 14)
-        except:
-            self.font = ImageFont.load_default()
+        # Fuente para dibujar texto, buscada una vez por proceso
+        self.font = map_font()
         
         # Inicializar estado de Streamlit si no existe
         if 'selected_condo' not in st.session_state:
@@ -31,27 +423,87 @@ class ResidencialMap:
         if 'show_details' not in st.session_state:
             st.session_state.show_details = False
         
-        # Dimensiones del mapa
+        # Residencial a mostrar: cada uno con sus datos, su lienzo y su base; cambiar de uno a
+        # otro es un acierto de la caché compartida si alguien lo abrió hace poco
+        self.registry = get_registry()
+        residenciales = list(self.registry)
+        if len(residenciales) > 1:
+            self.residencial_id = st.sidebar.selectbox(
+                "Residencial", residenciales, format_func=lambda x: self.registry[x].nombre,
+                key='residencial', on_change=select_residencial)
+        else:
+            self.residencial_id = residenciales[0]
+        
+        # Dimensiones del mapa; el alto sigue la proporción del lienzo del residencial
         self.map_width = 1050  # Reducido de 1500
         self.map_height = 630  # Reducido de 900
         
-        # Cargar datos
-        self.load_house_data()
+        # En modo SVG cada clic solo envía el id de la casa a resaltar, sin imagen nueva
+        self.render_mode = RENDER_MODES[st.sidebar.radio("Modo del mapa", list(RENDER_MODES))]
         
-        # Crear layout
-        self.create_layout()
+        # Cargar datos; si no se pudieron cargar (o no cumplen el esquema) no se dibuja nada
+        if self.load_house_data():
+            self.create_layout()
     
+    @traced('load_house_data')
     def load_house_data(self):
+        """Cargar el residencial de la sesión; False si no se pudo (con el error en la página)"""
         try:
-            with open('houses_data.json', 'r', encoding='utf-8') as file:
-                data = json.load(file)
-                self.houses = data.get('houses', {})
-                self.layout = data.get('layout', {})
-                self.areas = data.get('areas', {})
-                self.condominios = data.get('condominios', {})
-                self.calles = data.get('calles', {})
+            # Caché del proceso: en un rerun normal solo cuesta un os.stat del archivo
+            with span('carga_json'):
+                data = self.registry.load(self.residencial_id)
+            self.data_version = data.version
+            # Los registros de casas se leen y escriben en el repositorio SQLite del residencial
+            with span('sync_repository'):
+                sync_repository(self.residencial_id, data.version, data)
+            self.repository = self.registry.repository(self.residencial_id)
+            self.layout = data.layout
+            self.areas = data.areas
+            self.condominios = data.condominios
+            self.calles = data.calles
+            self.bounds = data.bounds
+            self.map_height = round(self.map_width * data.bounds[1] / data.bounds[0])
+            # Estado compartido al día con los cambios de otras sesiones; si el canal ya descartó
+            # deltas que faltan (muchos cambios sin ningún rerun), se reconstruye. Va después de
+            # asignar los datos: la primera vez compila la tabla de casas a partir de ellos
+            self.live = get_live_map(self.residencial_id, data.version, self)
+            if not self.live.sync():
+                get_live_map.invalidate(self.residencial_id, data.version)
+                self.live = get_live_map(self.residencial_id, data.version, self)
+            self.counters = self.live.counters
+            self.watch_changes()
+            return True
+        except SchemaError as e:
+            # Los datos se validan al leerlos (map_schema): se listan todos los problemas del archivo
+            path = os.path.basename(self.registry[self.residencial_id].path)
+            shown = "\n".join(f"- {problem}" for problem in e.problems[:SCHEMA_PROBLEMS])
+            more = len(e.problems) - SCHEMA_PROBLEMS
+            st.error(f"Los datos de {path} no son válidos ({len(e.problems)} problemas):\n\n{shown}"
+                     + (f"\n\ny {more} más (`python map_schema.py` los lista todos)" if more > 0 else ""))
         except Exception as e:
             st.error(f"Error al cargar los datos: {str(e)}")
+        return False
+    
+    def watch_changes(self):
+        # Una suscripción por sesión: cuando otra sesión cambia una casa del residencial que se
+        # está viendo, esta se vuelve a ejecutar enseguida (con el mapa ya repintado por LiveMap)
+        # en lugar de esperar una interacción
+        watching = st.session_state.setdefault('watching', {})
+        watching['residencial'] = self.residencial_id
+        if 'change_feed' in st.session_state:
+            return
+        wake = session_waker()
+        if wake is None:
+            st.session_state.change_feed = None
+            return
+        session_id = st.session_state.setdefault('session_id', os.urandom(8).hex())
+        
+        def on_change(deltas, origin):
+            if origin == session_id or all(d.residencial != watching['residencial'] for d in deltas):
+                return True
+            return wake()
+        
+        st.session_state.change_feed = get_feed().subscribe(on_change)
     
     def create_layout(self):
         # Crear dos columnas: mapa y panel de información
@@ -67,191 +519,196 @@ class ResidencialMap:
             st.subheader("Información")
             self.create_info_panel()
     
+    @traced('draw_map')
     def draw_map(self):
-        # Crear una imagen en blanco con el nuevo tamaño
-        img = Image.new('RGB', (self.map_width, self.map_height), 'white')
-        draw = ImageDraw.Draw(img)
+        # Índice espacial de condominios, casas, áreas y calles para el hover (cacheable)
+        with span('indice_cliente'):
+            index_src = publish_client_index(self.data_version, self.map_width, self.map_height, self)
+            if not keep_static(index_src):
+                # Borrado de static/ por viejo mientras su URL seguía en caché
+                publish_client_index.clear()
+                index_src = publish_client_index(self.data_version, self.map_width, self.map_height, self)
         
-        # Factor de escala para ajustar todas las coordenadas
-        scale_x = self.map_width / 1500
-        scale_y = self.map_height / 900
+        if self.render_mode == 'tiles':
+            html = self.build_map_html(index_src, **self.draw_tiles())
+        elif self.render_mode == 'svg':
+            # El SVG se descarga una vez por versión de datos; la selección se resalta en el navegador
+            with span('svg'):
+                svg_src = publish_map_svg(self.residencial_id, self.data_version, self.live.revision,
+                                          self.map_width, self.map_height, self)
+                if not keep_static(svg_src):
+                    publish_map_svg.clear()
+                    svg_src = publish_map_svg(self.residencial_id, self.data_version, self.live.revision,
+                                              self.map_width, self.map_height, self)
+            html = self.build_map_html(index_src, svg_src=svg_src, selected_house=st.session_state.selected_house)
+        else:
+            # La capa estática se dibuja una vez por versión de datos; aquí solo se compone la selección
+            # y el navegador recibe una URL cacheable en lugar de la imagen en base64
+            img_src = self.wait_for_image(publish_map_image(
+                self.residencial_id, self.data_version, self.live.revision, self.map_width, self.map_height,
+                st.session_state.selected_house, client_image_format(), self))
+            html = self.build_map_html(index_src, img_src=img_src)
         
-        # Dibujar áreas primero (fondo)
-        for area_id, area in self.areas.items():
-            coords = area['coords']
-            color = '#00CED1' if area['tipo'] == 'alberca_pergola' else '#90EE90'
-            
-            draw.rectangle(
-                [
-                    (int(coords[0] * scale_x), int(coords[1] * scale_y)),
-                    (int(coords[2] * scale_x), int(coords[3] * scale_y))
-                ],
-                fill=color,
-                outline='black'
-            )
-            
-            # Etiqueta del área
-            center_x = int((coords[0] + coords[2]) * scale_x / 2)
-            center_y = int((coords[1] + coords[3]) * scale_y / 2)
-            draw.text((center_x, center_y), area['descripcion'], fill='black', font=self.font, anchor="mm")
+        # Mostrar el mapa interactivo usando un componente HTML
+        count('html.bytes', len(html))
+        with span('components.html'):
+            components.html(html, height=self.map_height, scrolling=False)
+    
+    @traced('espera_imagen')
+    def wait_for_image(self, future):
+        # Con el pool ocupado, la imagen anterior de la sesión (mismo residencial y tamaño) se muestra
+        # mientras tanto: el rerun no espera más de RENDER_WAIT y se repite cuando la nueva está lista
+        view = (self.residencial_id, self.map_width, self.map_height)
+        shown = st.session_state.get('map_image')
+        if shown is not None and shown[0] == view and not future.done():
+            try:
+                src = future.result(timeout=RENDER_WAIT)
+            except FutureTimeout:
+                wake = session_waker()
+                if wake is None:
+                    src = future.result()
+                else:
+                    future.add_done_callback(lambda future: wake())
+                    return shown[1]
+        else:
+            src = future.result()
+        st.session_state.map_image = (view, src)
+        return src
+    
+    @traced('teselas')
+    def draw_tiles(self):
+        # Vista de teselas: nivel y centro (en fracción del residencial) guardados en la sesión
+        from map_tiles import fit_zoom
+        pyramid = get_tile_pyramid(self.data_version, self)
+        view = st.session_state.get('tile_view')
+        if view is None:
+            view = (fit_zoom(self.bounds, self.map_width, self.map_height), 0.5, 0.5)
+        zoom, center_x, center_y = view
+        zoom = min(max(zoom, 0), pyramid.max_zoom)
+        width, height = pyramid.level_size(zoom)
         
-        # Generar mapa de áreas para hover
-        hover_map = {}
+        # Esquina de la vista en píxeles del nivel: sin salirse del residencial, o centrado si cabe entero
+        def origin(center, size, viewport):
+            if size <= viewport:
+                return (size - viewport) // 2
+            return min(max(round(center * size - viewport / 2), 0), size - viewport)
+        left = origin(center_x, width, self.map_width)
+        top = origin(center_y, height, self.map_height)
+        center_x = (left + self.map_width / 2) / width
+        center_y = (top + self.map_height / 2) / height
         
-        # Dibujar condominios
-        for condo_id, condo in self.condominios.items():
-            coords = condo['coords']
-            # Agregar coordenadas al mapa de hover con escala
-            hover_map[condo_id] = {
-                'coords': [
-                    int(coords[0] * scale_x),
-                    int(coords[1] * scale_y),
-                    int(coords[2] * scale_x),
-                    int(coords[3] * scale_y)
-                ],
-                'descripcion': f"Condominio {condo_id.split('_')[1].upper()}"
-            }
-            
-            draw.rectangle(
-                [
-                    (int(coords[0] * scale_x), int(coords[1] * scale_y)),
-                    (int(coords[2] * scale_x), int(coords[3] * scale_y))
-                ],
-                fill='#F5F5F5',
-                outline='black'
-            )
-            
-            # Pasar los factores de escala al método de dibujo de casas
-            self.draw_houses_in_condominio(draw, condo, condo_id, scale_x, scale_y)
-
-        # Dibujar las líneas de las calles
-        for calle_id, calle in self.calles.items():
-            draw.line(
-                [
-                    (int(calle['start'][0] * scale_x), int(calle['start'][1] * scale_y)),
-                    (int(calle['end'][0] * scale_x), int(calle['end'][1] * scale_y))
-                ],
-                fill='gray',
-                width=int(calle.get('width', 30) * scale_x)
-            )
-
-        # Dibujar las etiquetas de las calles al final (por encima de todo)
-        for calle_id, calle in self.calles.items():
-            # Calcular posición del texto
-            text_x = int((calle['start'][0] + calle['end'][0]) * scale_x / 2)
-            text_y = int((calle['start'][1] + calle['end'][1]) * scale_y / 2)
-
-            # Crear una imagen temporal para el texto que podamos rotar
-            if calle_id in ['calle_chaca', 'calle_cacao', 'calle_chacte', 'calle_eucalipto_vertical']:
-                # Para calles verticales
-                text_width = 250
-                text_height = 50
-                text_img = Image.new('RGBA', (text_width, text_height), (0, 0, 0, 0))
-                text_draw = ImageDraw.Draw(text_img)
-                
-                # Dibujar el texto centrado en la imagen temporal
-                text_draw.text(
-                    (text_width//2, text_height//2),
-                    calle['id'],
-                    fill='white',
-                    font=self.font,
-                    anchor="mm"
-                )
-                
-                # Rotar -90 grados (sentido horario)
-                text_img = text_img.rotate(-90, expand=True, fillcolor=(0,0,0,0))
-                
-                # Calcular punto medio vertical del segmento de calle
-                start_y = int(calle['start'][1] * scale_y)
-                end_y = int(calle['end'][1] * scale_y)
-                mid_y = (start_y + end_y) // 2
-                
-                # Ajustar posiciones específicas para cada calle vertical
-                if calle_id == 'calle_chaca':
-                    x_offset = -text_height//2
-                    y_offset = -text_width//2
-                elif calle_id == 'calle_cacao':
-                    x_offset = -text_height//2
-                    y_offset = -text_width//2
-                elif calle_id == 'calle_eucalipto_vertical':
-                    x_offset = -text_height//2
-                    y_offset = -text_width//2 - 30  # Ajustado para mejor visibilidad en la parte inferior del mapa
-                else:  # calle_chacte
-                    x_offset = -text_height//2
-                    y_offset = -text_width//2
-                
-                # Calcular posición final
-                text_pos = (
-                    int(text_x + x_offset), 
-                    int(mid_y + y_offset)
-                )
-                
-                # Pegar la imagen rotada usando máscara alfa
-                img.paste(text_img, text_pos, text_img)
-            else:
-                # Para calles horizontales
-                # Calcular punto medio horizontal del segmento de calle
-                mid_x = (int(calle['start'][0] * scale_x) + int(calle['end'][0] * scale_x)) // 2
-                
-                # Ajustes específicos por calle
-                y_offsets = {
-                    'calle_zapote': -2,
-                    'calle_jabin': -2,
-                    'calle_caoba': -2,
-                    'av_paseo': -2,
-                }
-                y_offset = y_offsets.get(calle_id, 0)
-                
-                draw.text(
-                    (mid_x, text_y + y_offset),
-                    calle['id'],
-                    fill='white',
-                    font=self.font,
-                    anchor="mm"
-                )
+        # Cada botón fija la vista de destino; desplazar mueve media pantalla
+        step_x = self.map_width / 2 / width
+        step_y = self.map_height / 2 / height
+        buttons = [
+            ("➖", (zoom - 1, center_x, center_y), zoom > 0),
+            ("➕", (zoom + 1, center_x, center_y), zoom < pyramid.max_zoom),
+            ("⬅", (zoom, center_x - step_x, center_y), left > 0),
+            ("⬆", (zoom, center_x, center_y - step_y), top > 0),
+            ("⬇", (zoom, center_x, center_y + step_y), top + self.map_height < height),
+            ("➡", (zoom, center_x + step_x, center_y), left + self.map_width < width),
+            ("Ver todo", None, True),
+        ]
+        for column, (label, target, enabled) in zip(st.columns(len(buttons)), buttons):
+            column.button(label, key=f'vista_{label}', on_click=set_tile_view, args=(target,),
+                          disabled=not enabled, use_container_width=True)
         
-        # Convertir la imagen a base64
-        img_bytes = io.BytesIO()
-        img.save(img_bytes, format='PNG')
-        img_b64 = base64.b64encode(img_bytes.getvalue()).decode()
+        # Solo las teselas que se ven: las que faltan se dibujan ahora, las demás ya están en disco
+        right, bottom = left + self.map_width, top + self.map_height
+        images = []
+        for x, y in pyramid.visible_tiles(zoom, left, top, right, bottom):
+            x0, y0, x1, y1 = pyramid.tile_box(zoom, x, y)
+            images.append(f'<img src="{tile_url(pyramid.tile(zoom, x, y))}" style="position: absolute; '
+                          f'left: {x0 - left}px; top: {y0 - top}px; width: {x1 - x0}px; height: {y1 - y0}px;" />')
         
-        # Crear HTML con interactividad
-        html = f"""
-        <div style="position: relative; width: {self.map_width}px; height: {self.map_height}px;">
-            <img src="data:image/png;base64,{img_b64}" style="width: 100%; height: 100%;" />
+        # La casa seleccionada se resalta encima de las teselas, que no cambian al seleccionar
+        table = get_house_table(self.data_version, self)
+        index = table.positions.get(st.session_state.selected_house)
+        if index is not None:
+            rects, centers = table.scaled_layout(*table.scale(width, height))
+            x0, y0, x1, y1 = rects[4 * index:4 * index + 4].tolist()
+            images.append(f'<div style="position: absolute; left: {x0 - left}px; top: {y0 - top}px; '
+                          f'width: {x1 - x0}px; height: {y1 - y0}px; background: yellow; border: 1px solid black; '
+                          f'display: flex; align-items: center; justify-content: center; font: 11px sans-serif;">'
+                          f'{table.labels[index]}</div>')
+        return {'tiles_html': ''.join(images), 'view': (left, top, width, height)}
+    
+    @traced('build_map_html')
+    def build_map_html(self, index_src, img_src=None, svg_src=None, selected_house=None, tiles_html=None,
+                       view=None):
+        # Crear HTML con interactividad; view = (izquierda, arriba, ancho, alto) de la porción visible del
+        # nivel de teselas, para llevar el puntero a las coordenadas del índice
+        view_left, view_top, view_width, view_height = view or (0, 0, self.map_width, self.map_height)
+        if tiles_html is not None:
+            layer = tiles_html
+            load_layer = ''
+        elif svg_src is not None:
+            # El SVG se inserta en línea para poder resaltar la casa por su id (casa-<house_id>)
+            layer = '<div id="map-layer" style="width: 100%; height: 100%;"></div>'
+            selected = json.dumps(selected_house).replace('</', '<\\/')
+            load_layer = f"""
+            const selected = {selected};
+            fetch("{svg_src}").then((response) => response.text()).then((svg) => {{
+                document.getElementById('map-layer').innerHTML = svg;
+                const house = selected && document.getElementById('casa-' + selected);
+                if (house) house.classList.add('sel');
+            }});"""
+        else:
+            layer = f'<img src="{img_src}" style="width: 100%; height: 100%;" />'
+            load_layer = ''
+        return f"""
+        <div style="position: relative; width: {self.map_width}px; height: {self.map_height}px; overflow: hidden;">
+            {layer}
             <div id="hover-label" style="position: absolute; display: none; background: rgba(0,0,0,0.7); color: white; padding: 5px; border-radius: 3px; pointer-events: none;"></div>
         </div>
-        <script>
-            const hoverMap = {json.dumps(hover_map)};
+        <script>{load_layer}
+            let hoverIndex = null;
+            fetch("{index_src}").then((response) => response.json()).then((data) => {{ hoverIndex = data; }});
             const container = document.querySelector('div');
             const label = document.getElementById('hover-label');
             
+            // Buscar la entidad bajo el punto revisando solo los candidatos de su celda
+            function hitTest(x, y) {{
+                const idx = hoverIndex;
+                if (!idx || x < 0 || y < 0) return -1;
+                const col = Math.min(Math.floor(x / idx.cell), idx.cols - 1);
+                const row = Math.min(Math.floor(y / idx.cell), idx.rows - 1);
+                const cell = row * idx.cols + col;
+                for (let k = idx.offsets[cell]; k < idx.offsets[cell + 1]; k++) {{
+                    const i = idx.items[k];
+                    const r = 4 * i;
+                    if (x < idx.rects[r] || x > idx.rects[r + 2] ||
+                        y < idx.rects[r + 1] || y > idx.rects[r + 3]) continue;
+                    const seg = idx.segments[i];
+                    if (seg) {{
+                        const dx = seg[2] - seg[0], dy = seg[3] - seg[1];
+                        const len2 = dx * dx + dy * dy;
+                        const t = len2 ? Math.max(0, Math.min(1, ((x - seg[0]) * dx + (y - seg[1]) * dy) / len2)) : 0;
+                        if (Math.hypot(x - seg[0] - t * dx, y - seg[1] - t * dy) > seg[4]) continue;
+                    }}
+                    return i;
+                }}
+                return -1;
+            }}
+            
             container.addEventListener('mousemove', (e) => {{
                 const rect = container.getBoundingClientRect();
                 const x = e.clientX - rect.left;
                 const y = e.clientY - rect.top;
                 
-                // Escalar coordenadas según el tamaño actual de la imagen
+                // Escalar coordenadas según el tamaño actual de la imagen y la porción visible del mapa
                 const scaleX = {self.map_width} / container.offsetWidth;
                 const scaleY = {self.map_height} / container.offsetHeight;
-                const mapX = x * scaleX;
-                const mapY = y * scaleY;
-                
-                let found = false;
-                for (const [id, data] of Object.entries(hoverMap)) {{
-                    const coords = data.coords;
-                    if (mapX >= coords[0] && mapX <= coords[2] && 
-                        mapY >= coords[1] && mapY <= coords[3]) {{
-                        label.textContent = data.descripcion;
-                        label.style.display = 'block';
-                        label.style.left = `${{e.clientX - rect.left + 10}}px`;
-                        label.style.top = `${{e.clientY - rect.top + 10}}px`;
-                        found = true;
-                        break;
-                    }}
-                }}
+                const mapX = (x * scaleX + {view_left}) * {self.map_width} / {view_width};
+                const mapY = (y * scaleY + {view_top}) * {self.map_height} / {view_height};
                 
-                if (!found) {{
+                const hit = hitTest(mapX, mapY);
+                if (hit >= 0) {{
+                    label.textContent = hoverIndex.labels[hit];
+                    label.style.display = 'block';
+                    label.style.left = `${{e.clientX - rect.left + 10}}px`;
+                    label.style.top = `${{e.clientY - rect.top + 10}}px`;
+                }} else {{
                     label.style.display = 'none';
                 }}
             }});
@@ -261,160 +718,62 @@ class ResidencialMap:
             }});
         </script>
         """
-        
-        # Mostrar el mapa interactivo usando un componente HTML
-        components.html(html, height=self.map_height, scrolling=False)
     
-    def draw_houses_in_condominio(self, draw, condo, condo_id, scale_x, scale_y):
-        coords = condo['coords']
-        num_houses = condo['casas']
-        orientation = condo['orientacion']
-        
-        # Aplicar escala a las coordenadas del condominio
-        scaled_coords = [
-            int(coords[0] * scale_x),
-            int(coords[1] * scale_y),
-            int(coords[2] * scale_x),
-            int(coords[3] * scale_y)
-        ]
-        
-        if orientation == "Horizontal":
-            # Para condominios horizontales con dos filas
-            if condo_id in ['eucalipto_1', 'eucalipto_2', 'eucalipto_6']:
-                houses_per_row = num_houses // 2
-                house_width = (scaled_coords[2] - scaled_coords[0]) / (houses_per_row + 1)
-                total_height = scaled_coords[3] - scaled_coords[1]
-                house_height = total_height / 4
-
-                for row in range(2):
-                    y_offset = scaled_coords[1] + (total_height * (row + 1)) / 3
-
-                    for i in range(houses_per_row):
-                        x = scaled_coords[0] + ((i + 1) * house_width)
-                        y = y_offset
-
-                        if row == 0:
-                            # Primera fila: orden normal
-                            house_number = i + 1
-                        else:
-                            # Segunda fila: orden invertido
-                            house_number = num_houses - i
-                        house_id = f"{condo_id}-{house_number:02d}"
-                        is_selected = (st.session_state.selected_condo == condo_id and 
-                                    st.session_state.selected_house == house_id)
-
-                        fill_color = 'yellow' if is_selected else '#F5F5F5'
-
-                        draw.rectangle(
-                            [
-                                (int(x - house_width/2), int(y - house_height/2)),
-                                (int(x + house_width/2), int(y + house_height/2))
-                            ],
-                            fill=fill_color,
-                            outline='black'
-                        )
-
-                        draw.text((x, y), str(house_number), fill='black', font=self.font, anchor="mm")
-            else:
-                house_width = (scaled_coords[2] - scaled_coords[0]) / (num_houses + 1)
-                house_height = (scaled_coords[3] - scaled_coords[1]) / 3
-                
-                for i in range(num_houses):
-                    x = scaled_coords[0] + ((i + 1) * house_width)
-                    y = scaled_coords[1] + ((scaled_coords[3] - scaled_coords[1]) / 2)
-                    
-                    house_id = f"{condo_id}-{i+1:02d}"
-                    is_selected = (st.session_state.selected_condo == condo_id and 
-                                st.session_state.selected_house == house_id)
-                    
-                    fill_color = 'yellow' if is_selected else '#F5F5F5'
-                    
-                    draw.rectangle(
-                        [
-                            (int(x - house_width/2), int(y - house_height/2)),
-                            (int(x + house_width/2), int(y + house_height/2))
-                        ],
-                        fill=fill_color,
-                        outline='black'
-                    )
-                    
-                    draw.text((x, y), str(i+1), fill='black', font=self.font, anchor="mm")
-                
-        else:  # Vertical
-            if condo_id == 'eucalipto_4':
-                houses_per_col = num_houses // 2
-                total_width = scaled_coords[2] - scaled_coords[0]
-                house_width = total_width / 4
-                house_height = (scaled_coords[3] - scaled_coords[1]) / (houses_per_col + 1)
-                for col in range(2):
-                    x_offset = scaled_coords[0] + (total_width * (col + 1)) / 3
-                    for i in range(houses_per_col):
-                        x = x_offset
-                        y = scaled_coords[1] + ((i + 1) * house_height)
-                        if col == 0:
-                            # Primera columna: descendente del 22 al 12
-                            house_number = num_houses - i
-                        else:
-                            # Segunda columna: ascendente del 1 al 11
-                            house_number = i + 1
-                        house_id = f"{condo_id}-{house_number:02d}"
-                        is_selected = (st.session_state.selected_condo == condo_id and 
-                                    st.session_state.selected_house == house_id)
-                        fill_color = 'yellow' if is_selected else '#F5F5F5'
-                        draw.rectangle(
-                            [
-                                (int(x - house_width/2), int(y - house_height/2)),
-                                (int(x + house_width/2), int(y + house_height/2))
-                            ],
-                            fill=fill_color,
-                            outline='black'
-                        )
-                        draw.text((x, y), str(house_number), fill='black', font=self.font, anchor="mm")
-            else:
-                house_width = (scaled_coords[2] - scaled_coords[0]) / 3
-                house_height = (scaled_coords[3] - scaled_coords[1]) / (num_houses + 1)
-                
-                for i in range(num_houses):
-                    x = scaled_coords[0] + ((scaled_coords[2] - scaled_coords[0]) / 2)
-                    y = scaled_coords[1] + ((i + 1) * house_height)
-                    
-                    house_id = f"{condo_id}-{i+1:02d}"
-                    is_selected = (st.session_state.selected_condo == condo_id and 
-                                st.session_state.selected_house == house_id)
-                    
-                    fill_color = 'yellow' if is_selected else '#F5F5F5'
-                    
-                    draw.rectangle(
-                        [
-                            (int(x - house_width/2), int(y - house_height/2)),
-                            (int(x + house_width/2), int(y + house_height/2))
-                        ],
-                        fill=fill_color,
-                        outline='black'
-                    )
-                    
-                    draw.text((x, y), str(i+1), fill='black', font=self.font, anchor="mm")
+    def create_search_box(self):
+        # Búsqueda por prefijos en el índice en memoria; cada letra nueva es una consulta de microsegundos
+        query = st.text_input("Buscar casa", key='house_search', placeholder="Dirección, propietario o número")
+        if not query.strip():
+            return
+        keys = get_search_index(self.residencial_id, self.data_version, self).search(query, limit=SEARCH_SUGGESTIONS)
+        if not keys:
+            st.caption("Sin resultados")
+        table = get_house_table(self.data_version, self)
+        for key in keys:
+            house = self.repository.get(key)
+            condo = self.condominios.get(house.condominio)
+            if condo is None:
+                st.caption(f"{key} · {house.direccion}")
+                continue
+            # La casa del selector es la del mismo condominio y número ('E7-01' -> 'eucalipto_7-01');
+            # si el mapa no la tiene, solo se fija el condominio
+            index = table.locate(house.condominio, house_number(key))
+            house_id = table.ids[index] if index is not None else None
+            st.button(f"{key} · {house.direccion}", key=f'resultado_{key}', on_click=select_search_result,
+                      args=(house.condominio, house_id))
+    
+    def show_occupancy(self, title, occupancy):
+        # Resumen leído de los contadores incrementales, sin recorrer casas
+        st.write(f"**{title}:** {occupancy.casas} casas, {occupancy.metros:,.0f} m²")
+        if occupancy.por_estado:
+            st.caption(' · '.join(f"{estado}: {count} ({occupancy.metros_por_estado[estado]:,.0f} m²)"
+                                  for estado, count in occupancy.por_estado.items()))
     
+    @traced('panel_info')
     def create_info_panel(self):
+        self.create_search_box()
+        
+        st.write("### Ocupación")
+        self.show_occupancy(self.registry[self.residencial_id].nombre, self.counters.summary())
+        
         # Ordenar condominios por número ascendente extraído del nombre (eucalipto_1, eucalipto_2, ...)
         def extract_number(condo_key):
-            import re
             match = re.search(r'_(\d+)', condo_key)
             return int(match.group(1)) if match else 0
         condo_names = sorted(list(self.condominios.keys()), key=extract_number)
         selected_condo = st.selectbox(
             "Seleccionar Condominio",
             condo_names,
-            format_func=lambda x: self.condominios[x]['descripcion'],
+            format_func=lambda x: self.condominios[x].descripcion,
             key='condo_selector'
         )
         
         if selected_condo:
             st.session_state.selected_condo = selected_condo
             condo = self.condominios[selected_condo]
+            self.show_occupancy(condo.descripcion, self.counters.summary(selected_condo))
             
             # Generar lista de casas en orden numérico ascendente
-            house_ids = [f"{selected_condo}-{i+1:02d}" for i in range(condo['casas'])]
+            house_ids = condo_house_ids(selected_condo, condo)
             selected_house = st.selectbox(
                 "Seleccionar Casa",
                 house_ids,
@@ -432,15 +791,29 @@ class ResidencialMap:
                 # Mostrar información de la casa solo si se presionó el botón
                 if st.session_state.show_details and st.session_state.selected_house == selected_house:
                     st.write("### Detalles de la Casa")
-                    if selected_house in self.houses:
-                        house = self.houses[selected_house]
-                        st.write(f"**ID:** {selected_house}")
-                        st.write(f"**Dirección:** {house['direccion']}")
-                        st.write(f"**Estado:** {house['estado']}")
-                        if 'propietario' in house:
-                            st.write(f"**Propietario:** {house['propietario']}")
-                        if 'tamano' in house:
-                            st.write(f"**Tamaño:** {house['tamano']}")
+                    # El registro se busca por condominio y número, no por el id de la tabla
+                    key = get_house_keys(self.residencial_id, self.data_version, self).get(selected_house)
+                    house = self.repository.get(key) if key is not None else None
+                    if house is not None:
+                        st.write(f"**ID:** {key}")
+                        st.write(f"**Dirección:** {house.direccion}")
+                        st.write(f"**Estado:** {house.estado}")
+                        if house.propietario is not None:
+                            st.write(f"**Propietario:** {house.propietario}")
+                        if house.tamano is not None:
+                            st.write(f"**Tamaño:** {house.tamano}")
+                        
+                        # Cambio de estado: una transacción corta en SQLite, segura entre sesiones
+                        estados = list(dict.fromkeys((*ESTADOS, house.estado)))
+                        nuevo_estado = st.selectbox("Cambiar estado", estados, index=estados.index(house.estado),
+                                                    key=f'estado_{selected_house}')
+                        if nuevo_estado != house.estado and st.button("Guardar estado"):
+                            changes = self.repository.set_estados([(key, nuevo_estado)])
+                            self.live.apply(get_feed().publish(self.residencial_id, changes,
+                                                               origin=st.session_state.get('session_id')))
+                            get_search_index(self.residencial_id, self.data_version, self).update(
+                                key, self.repository.get(key))
+                            st.experimental_rerun()
                     else:
                         st.write("No hay información detallada disponible para esta casa")
                     
@@ -448,6 +821,47 @@ class ResidencialMap:
                     if st.button("Ocultar Detalles"):
                         st.session_state.show_details = False
                         st.experimental_rerun()
+        
+        self.create_search_panel()
+    
+    def create_search_panel(self):
+        # Búsqueda por estado, propietario y tamaño sobre los índices del repositorio
+        st.write("### Buscar Casas")
+        estado = st.selectbox("Estado", [None] + self.repository.distinct('estado'),
+                              format_func=lambda x: "Todos" if x is None else x, key='filtro_estado')
+        tamano = st.selectbox("Tamaño", [None] + self.repository.distinct('tamano'),
+                              format_func=lambda x: "Todos" if x is None else x, key='filtro_tamano')
+        propietario = st.text_input("Propietario (empieza con)", key='filtro_propietario').strip()
+        if estado is None and tamano is None and not propietario:
+            return
+        
+        results = self.repository.find(estado=estado, propietario=propietario or None, tamano=tamano,
+                                       limit=SEARCH_LIMIT + 1)
+        if not results:
+            st.write("Ninguna casa coincide con la búsqueda")
+            return
+        st.dataframe(
+            [{'Casa': key, 'Estado': house.estado, 'Propietario': house.propietario, 'Tamaño': house.tamano}
+             for key, house in results[:SEARCH_LIMIT]],
+            hide_index=True,
+        )
+        if len(results) > SEARCH_LIMIT:
+            st.caption(f"Se muestran las primeras {SEARCH_LIMIT} casas")
+
+def main():
+    # La traza del rerun solo se arma con el panel de depuración abierto o el registro activo
+    debug = st.session_state.get('debug_metrics', False)
+    if debug or map_metrics.ENABLED:
+        begin_trace()
+    try:
+        ResidencialMap()
+    finally:
+        trace = end_trace()
+        get_exporter().maybe_export()
+    st.sidebar.checkbox("Métricas de depuración", key='debug_metrics')
+    if debug and trace is not None:
+        show_debug_panel(trace)
+
 
 if __name__ == "__main__":
-    app = ResidencialMap()
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -0,0 +1,45 @@
+import copy
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from map_data import ESTADOS
+
+DATA_PATH = os.path.join(ROOT, 'houses_data.json')
+
+with open(DATA_PATH, encoding='utf-8') as _file:
+    _DATA = json.load(_file)
+
+
+@pytest.fixture
+def data():
+    """houses_data.json decodificado; cada prueba recibe su propia copia para modificarla"""
+    return copy.deepcopy(_DATA)
+
+
+@pytest.fixture
+def populated(data):
+    """El residencial de ejemplo con un registro por casa ('E1-01' ...), con estados y propietarios variados"""
+    calles = ('Chaca', 'Caoba', 'Ceiba', 'Zapote')
+    houses = {}
+    for i, (condo_id, condo) in enumerate(data['condominios'].items()):
+        number = condo['descripcion'].split()[-1]
+        for n in range(1, condo['casas'] + 1):
+            key = f"E{number}-{n:02d}"
+            houses[key] = {
+                'id': key,
+                'condominio': condo_id,
+                'direccion': f"Calle {calles[i % len(calles)]}, Cond. Eucalipto {number}, Casa {n:02d}",
+                'propietario': 'Por asignar' if n % 3 else f"Familia {('Pérez', 'Gómez', 'Canul')[n // 3 % 3]}",
+                'tamano': '120m²' if n % 2 else '90m²',
+                'estado': ESTADOS[n % len(ESTADOS)],
+                'historial_pagos': [],
+                'deuda_actual': 0,
+            }
+    data['houses'] = houses
+    return data
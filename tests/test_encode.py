@@ -0,0 +1,81 @@
+import io
+
+import pytest
+from PIL import Image, ImageFont
+
+from map_encode import EFFORTS, choose_format, encode_image, to_palette, webp_available
+from map_layout import compile_layout
+from map_render import render_base_layer
+from map_schema import validate_residencial
+
+
+@pytest.fixture
+def map_image(populated):
+    residencial = validate_residencial(populated)
+    table = compile_layout(residencial.condominios, residencial.layout, residencial.bounds)
+    return render_base_layer(residencial.areas, residencial.condominios, residencial.calles, table, 1050, 630,
+                             ImageFont.load_default()).convert('RGB')
+
+
+def distinct_colors(count):
+    image = Image.new('RGB', (count, 1))
+    image.putdata([(i % 256, i // 256, 7) for i in range(count)])
+    return image
+
+
+def decoded(data):
+    return Image.open(io.BytesIO(data)).convert('RGB')
+
+
+def test_palette_is_lossless_for_the_map(map_image):
+    indexed = to_palette(map_image)
+    assert indexed.mode == 'P'
+    assert indexed.convert('RGB').tobytes() == map_image.tobytes()
+
+
+def test_palette_with_256_colors():
+    image = distinct_colors(256)
+    indexed = to_palette(image)
+    assert indexed.mode == 'P'
+    assert indexed.convert('RGB').tobytes() == image.tobytes()
+
+
+def test_palette_keeps_nearly_equal_colors():
+    # Como los bordes suavizados de una fuente TrueType: colores que difieren en una unidad
+    image = Image.new('RGB', (4, 2))
+    image.putdata([(200, 200, 200), (201, 200, 200), (200, 201, 200), (200, 200, 201)] * 2)
+    assert to_palette(image).convert('RGB').tobytes() == image.tobytes()
+
+
+def test_more_than_256_colors_stay_rgb():
+    image = distinct_colors(257)
+    assert to_palette(image) is image
+    assert decoded(encode_image(image, 'png', 'rapido')).tobytes() == image.tobytes()
+
+
+def test_other_modes_are_not_changed():
+    image = Image.new('RGBA', (4, 4), (1, 2, 3, 4))
+    assert to_palette(image) is image
+
+
+@pytest.mark.parametrize('effort', sorted(EFFORTS))
+def test_png_round_trip(map_image, effort):
+    data = encode_image(map_image, 'png', effort)
+    assert Image.open(io.BytesIO(data)).mode == 'P'
+    assert decoded(data).tobytes() == map_image.tobytes()
+
+
+@pytest.mark.skipif(not webp_available(), reason="Pillow sin WebP")
+@pytest.mark.parametrize('effort', sorted(EFFORTS))
+def test_webp_is_lossless(map_image, effort):
+    assert decoded(encode_image(map_image, 'webp', effort)).tobytes() == map_image.tobytes()
+
+
+def test_choose_format():
+    assert choose_format('cualquiera', setting='png') == 'png'
+    assert choose_format('cualquiera', setting='webp') == 'webp'
+    expected = 'webp' if webp_available() else 'png'
+    assert choose_format('Mozilla/5.0 (Windows NT 10.0) Chrome/120.0 Safari/537.36', setting='auto') == expected
+    assert choose_format('Mozilla/5.0 (Windows NT 6.1; Trident/7.0; rv:11.0)', setting='auto') == 'png'
+    assert choose_format('Mozilla/5.0 (Macintosh) Version/13.1 Safari/605.1.15', setting='auto') == 'png'
+    assert choose_format('Mozilla/5.0 (Macintosh) Version/16.0 Safari/605.1.15', setting='auto') == expected
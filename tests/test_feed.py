@@ -0,0 +1,105 @@
+import asyncio
+import threading
+
+import pytest
+
+from map_feed import ChangeFeed
+
+
+@pytest.fixture
+def feed():
+    feed = ChangeFeed(history_size=4, queue_size=2)
+    yield feed
+    feed.close()
+
+
+def flush(feed):
+    # Lo que ya se publicó se reparte antes que esta corrutina
+    asyncio.run_coroutine_threadsafe(asyncio.sleep(0), feed._loop).result(timeout=5)
+
+
+def test_publish_numbers_deltas(feed):
+    first = feed.publish('a', [('E1-01', 'eucalipto_1', 'Disponible', 'Ocupada')])
+    second = feed.publish('b', [('E1-02', 'eucalipto_1', 'Ocupada', 'Reservada'),
+                                ('E1-03', 'eucalipto_1', None, 'Disponible')])
+    assert [delta.sequence for delta in first + second] == [1, 2, 3]
+    assert (second[0].residencial, second[0].key, second[0].estado_anterior, second[0].estado) == \
+        ('b', 'E1-02', 'Ocupada', 'Reservada')
+    assert feed.publish('a', []) == []
+    assert feed.sequence == 3
+
+
+def test_since(feed):
+    deltas = [feed.publish('a', [(f"E1-{n:02d}", 'eucalipto_1', 'Disponible', 'Ocupada')])[0]
+              for n in range(1, 4)]
+    assert feed.since(0) == deltas
+    assert feed.since(2) == deltas[2:]
+    assert feed.since(3) == []
+    # El historial guarda 4 deltas: desde el 1 ya no alcanza para ponerse al día
+    for n in range(4, 7):
+        feed.publish('a', [(f"E1-{n:02d}", 'eucalipto_1', 'Disponible', 'Ocupada')])
+    assert feed.since(1) is None
+    assert [delta.sequence for delta in feed.since(2)] == [3, 4, 5, 6]
+
+
+def test_subscribe_receives_batches_with_origin(feed):
+    received = []
+    done = threading.Event()
+
+    def callback(deltas, origin):
+        received.append(([delta.key for delta in deltas], origin))
+        if len(received) == 2:
+            done.set()
+            return False
+
+    subscription = feed.subscribe(callback)
+    feed.publish('a', [('E1-01', 'eucalipto_1', 'Disponible', 'Ocupada')], origin='s1')
+    feed.publish('a', [('E1-02', 'eucalipto_1', 'Disponible', 'Ocupada')])
+    assert done.wait(5)
+    subscription.future.result(timeout=5)
+    assert received == [(['E1-01'], 's1'), (['E1-02'], None)]
+    # Al devolver False la suscripción se da de baja
+    assert not feed._subscriptions
+
+
+def test_failing_callback_keeps_subscription(feed):
+    calls = []
+    done = threading.Event()
+
+    def callback(deltas, origin):
+        calls.append(deltas[0].sequence)
+        if len(calls) == 1:
+            raise RuntimeError('falla')
+        done.set()
+
+    subscription = feed.subscribe(callback)
+    feed.publish('a', [('E1-01', 'eucalipto_1', 'Disponible', 'Ocupada')])
+    feed.publish('a', [('E1-02', 'eucalipto_1', 'Disponible', 'Ocupada')])
+    assert done.wait(5)
+    assert calls == [1, 2]
+    subscription.cancel()
+
+
+def test_slow_subscriber_lags_without_blocking_others(feed):
+    slow = feed._register()
+    received = []
+    done = threading.Event()
+
+    def callback(deltas, origin):
+        received.append(deltas[0].sequence)
+        if len(received) == 5:
+            done.set()
+
+    fast = feed.subscribe(callback)
+    for n in range(1, 6):
+        feed.publish('a', [(f"E1-{n:02d}", 'eucalipto_1', 'Disponible', 'Ocupada')])
+        flush(feed)
+    assert done.wait(5)
+    assert received == [1, 2, 3, 4, 5]
+    # La cola del lento guarda 2 lotes; el resto se descarta y queda marcado como atrasado
+    assert slow.lagged and slow.queue.qsize() == 2
+    assert not fast.lagged
+    # Se pone al día con since() desde el último lote que sí recibió
+    last = slow.queue._queue[-1][0][-1].sequence
+    assert [delta.sequence for delta in feed.since(last)] == [3, 4, 5]
+    fast.cancel()
@@ -0,0 +1,19 @@
+from map_index import build_index
+from map_layout import compile_layout
+from map_schema import validate_residencial
+
+
+def test_condominio_label_is_its_descripcion(data):
+    # Los residenciales del registro pueden usar cualquier clave de condominio
+    data['condominios'] = {('norte' if key == 'eucalipto_7' else key): condo
+                           for key, condo in data['condominios'].items()}
+    data['houses'] = {}
+    residencial = validate_residencial(data)
+    table = compile_layout(residencial.condominios, residencial.layout, residencial.bounds)
+    index = build_index(residencial.areas, residencial.condominios, residencial.calles, table)
+
+    x0, y0, x1, y1 = residencial.condominios['norte'].coords
+    hits = index.lookup((x0 + x1) // 2, y0 + 1, kinds=('condominio',))
+    assert [(kind, entity_id, label) for kind, entity_id, label, rect, segment in hits] == [
+        ('condominio', 'norte', 'Condominio Eucalipto 7')]
+    assert index.to_client()['labels'].count('Condominio Eucalipto 7') == 1
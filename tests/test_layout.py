@@ -0,0 +1,79 @@
+import pytest
+
+from map_data import Condominio
+from map_layout import compile_condominio, compile_layout, house_numbers
+from map_schema import validate_residencial
+
+
+def condo(orientacion, casas=6, lines=2, inicio=None):
+    lines = {'filas': lines} if orientacion == 'Horizontal' else {'columnas': lines}
+    return Condominio(id='C', descripcion='Condominio C', casas=casas, coords=(0, 0, 120, 90),
+                      orientacion=orientacion, inicio_numeracion=inicio, **lines)
+
+
+def centers(condominio):
+    return {number: center for number, rect, center in compile_condominio(condominio)}
+
+
+def test_serpentine_lines():
+    assert house_numbers(2, 3, 6) == [[1, 2, 3], [6, 5, 4]]
+    assert house_numbers(3, 2, 5) == [[1, 2], [4, 3], [5]]
+    assert house_numbers(1, 4, 4) == [[1, 2, 3, 4]]
+
+
+@pytest.mark.parametrize('orientacion', ['Horizontal', 'Vertical'])
+def test_every_house_once(orientacion):
+    numbers = [number for number, rect, center in compile_condominio(condo(orientacion, casas=7, lines=3))]
+    assert sorted(numbers) == list(range(1, 8))
+
+
+@pytest.mark.parametrize('inicio, corner', [
+    (None, (min, min)),
+    ('superior_izquierda', (min, min)),
+    ('superior_derecha', (max, min)),
+    ('inferior_izquierda', (min, max)),
+    ('inferior_derecha', (max, max)),
+])
+@pytest.mark.parametrize('orientacion', ['Horizontal', 'Vertical'])
+def test_first_house_at_start_corner(orientacion, inicio, corner):
+    found = centers(condo(orientacion, inicio=inicio))
+    xs = [x for x, y in found.values()]
+    ys = [y for x, y in found.values()]
+    assert found[1] == (corner[0](xs), corner[1](ys))
+
+
+@pytest.mark.parametrize('inicio', ['superior_izquierda', 'superior_derecha', 'inferior_izquierda',
+                                    'inferior_derecha'])
+def test_serpentine_turns_at_line_end(inicio):
+    # La casa 3 cierra la primera fila y la 4 abre la segunda justo debajo (o encima)
+    found = centers(condo('Horizontal', inicio=inicio))
+    assert found[3][0] == found[4][0] and found[3][1] != found[4][1]
+    assert found[1][1] == found[2][1] == found[3][1]
+    found = centers(condo('Vertical', inicio=inicio))
+    assert found[3][1] == found[4][1] and found[3][0] != found[4][0]
+    assert found[1][0] == found[2][0] == found[3][0]
+
+
+def test_houses_inside_condominio():
+    for orientacion in ('Horizontal', 'Vertical'):
+        for number, (x0, y0, x1, y1), center in compile_condominio(condo(orientacion, casas=9, lines=3)):
+            assert 0 <= x0 < x1 <= 120 and 0 <= y0 < y1 <= 90
+
+
+def test_compile_layout_ids_and_overrides():
+    condominios = {'a': condo('Horizontal'), 'b': condo('Vertical', casas=4)}
+    table = compile_layout(condominios, {'b-02': (1, 2, 3, 4)})
+    assert len(table) == 10
+    assert [table.ids[i] for i in table.condo_range('b')] == ['b-01', 'b-02', 'b-04', 'b-03']
+    assert sorted(table.ids[i] for i in table.condo_range('a')) == [f"a-{n:02d}" for n in range(1, 7)]
+    position = table.locate('b', 2)
+    assert tuple(table.rect(position)) == (1, 2, 3, 4)
+    assert table.numbers[position] == 2 and table.labels[position] == '2'
+    assert table.locate('b', 5) is None and table.locate('b', None) is None
+
+
+def test_sample_data_numbering(data):
+    # eucalipto_4 empieza arriba a la derecha
+    residencial = validate_residencial(data)
+    found = centers(residencial.condominios['eucalipto_4'])
+    assert found[1] == (max(x for x, y in found.values()), min(y for x, y in found.values()))
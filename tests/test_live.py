@@ -0,0 +1,113 @@
+import pytest
+from PIL import ImageChops, ImageFont
+
+from map_feed import ChangeFeed
+from map_layout import compile_layout
+from map_live import LiveMap
+from map_occupancy import build_counters, house_estados
+from map_render import ESTADO_COLORS, HOUSE_COLOR, render_base_layer
+from map_repository import HouseRepository
+from map_schema import validate_residencial
+
+SIZES = [(1050, 630), (700, 420), (2100, 1260)]
+
+
+@pytest.fixture
+def residencial(populated):
+    return validate_residencial(populated, 'v1')
+
+
+@pytest.fixture
+def table(residencial):
+    return compile_layout(residencial.condominios, residencial.layout, residencial.bounds)
+
+
+@pytest.fixture
+def repository(residencial, tmp_path):
+    repository = HouseRepository(str(tmp_path / 'houses.db'))
+    repository.import_residencial(residencial)
+    yield repository
+    repository.close()
+
+
+@pytest.fixture
+def feed():
+    feed = ChangeFeed()
+    yield feed
+    feed.close()
+
+
+def renderer(residencial, table, width, height):
+    font = ImageFont.load_default()
+
+    def render(colors, clip=None):
+        return render_base_layer(residencial.areas, residencial.condominios, residencial.calles, table,
+                                 width, height, font, house_colors=colors, clip=clip)
+    return render
+
+
+def colors_of(table, houses):
+    return [ESTADO_COLORS.get(estado, HOUSE_COLOR) for estado in house_estados(table, build_counters(houses))]
+
+
+def same_pixels(a, b):
+    return ImageChops.difference(a.convert('RGB'), b.convert('RGB')).getbbox() is None
+
+
+def test_patched_layer_equals_fresh_render(residencial, table, repository, feed):
+    live = LiveMap('r', table, build_counters(residencial.houses), feed)
+    before = {size: live.base_layer(*size, renderer(residencial, table, *size)) for size in SIZES}
+    original = colors_of(table, residencial.houses)
+
+    # Casas vecinas, en los extremos de la serpentina y una que cambia dos veces
+    changes = [('E1-01', 'Reservada'), ('E1-02', 'Disponible'), ('E1-17', 'Reservada'), ('E1-18', 'Ocupada'),
+               ('E4-22', 'Disponible'), ('E6-16', 'Reservada'), ('E6-16', 'Ocupada')]
+    for key, estado in changes:
+        live.apply(feed.publish('r', repository.set_estados([(key, estado)])))
+
+    colors = colors_of(table, dict(repository.find(limit=None)))
+    assert colors != original
+    assert live.colors == colors
+    for size in SIZES:
+        assert same_pixels(live.layers[size], renderer(residencial, table, *size)(colors))
+        # Se repinta una copia: quien ya tenía la capa anterior no la ve cambiar
+        assert same_pixels(before[size], renderer(residencial, table, *size)(original))
+
+
+def test_counters_follow_deltas(residencial, table, repository, feed):
+    live = LiveMap('r', table, build_counters(residencial.houses), feed)
+    live.apply(feed.publish('r', repository.set_estados([('E2-03', 'Reservada'), ('E5-10', 'Disponible')])))
+    assert dict(live.counters.summary().por_estado) == repository.count_by_estado()
+    assert live.sequence == live.revision == feed.sequence
+
+
+def test_sync_and_other_residenciales(residencial, table, repository, feed):
+    live = LiveMap('r', table, build_counters(residencial.houses), feed)
+    live.base_layer(700, 420, renderer(residencial, table, 700, 420))
+    layer = live.layers[(700, 420)]
+    # Deltas de otro residencial solo avanzan la secuencia
+    feed.publish('otro', [('E1-01', 'eucalipto_1', 'Ocupada', 'Reservada')])
+    assert live.sync()
+    assert live.sequence == 1 and live.revision == 0
+    assert live.layers[(700, 420)] is layer and live.counters.estado('E1-01') == 'Ocupada'
+
+    deltas = feed.publish('r', repository.set_estados([('E1-01', 'Reservada')]))
+    assert live.sync()
+    assert live.revision == deltas[0].sequence and live.counters.estado('E1-01') == 'Reservada'
+    # Aplicar dos veces el mismo delta no cambia nada
+    live.apply(deltas)
+    assert live.layers[(700, 420)] is not layer
+    assert same_pixels(live.layers[(700, 420)],
+                       renderer(residencial, table, 700, 420)(colors_of(table, dict(repository.find(limit=None)))))
+
+
+def test_sync_reports_lost_history(residencial, table):
+    feed = ChangeFeed(history_size=2)
+    try:
+        live = LiveMap('r', table, build_counters(residencial.houses), feed)
+        for n in range(1, 4):
+            feed.publish('r', [(f"E1-{n:02d}", 'eucalipto_1', 'Disponible', 'Ocupada')])
+        assert live.sync() is False
+        assert live.sequence == 0
+    finally:
+        feed.close()
@@ -0,0 +1,103 @@
+import dataclasses
+
+import pytest
+
+from map_feed import ChangeFeed
+from map_layout import compile_layout
+from map_live import LiveMap
+from map_occupancy import build_counters, house_estados, house_keys, metros
+from map_repository import HouseRepository
+from map_schema import validate_residencial
+
+CHANGES = [('E1-01', 'Reservada'), ('E1-02', 'Disponible'), ('E1-02', 'Ocupada'), ('E3-19', 'Ocupada'),
+           ('E7-05', 'Reservada'), ('E7-06', 'Reservada'), ('E9-01', 'Ocupada')]
+
+
+@pytest.fixture
+def residencial(populated):
+    return validate_residencial(populated, 'v1')
+
+
+@pytest.fixture
+def repository(residencial, tmp_path):
+    repository = HouseRepository(str(tmp_path / 'houses.db'))
+    repository.import_residencial(residencial)
+    yield repository
+    repository.close()
+
+
+def expected_summary(repository, condominio=None):
+    houses = [house for key, house in repository.find(condominio=condominio, limit=None)]
+    estados = sorted({house.estado for house in houses})
+    return ({estado: sum(house.estado == estado for house in houses) for estado in estados},
+            {estado: sum(metros(house.tamano) for house in houses if house.estado == estado) for estado in estados})
+
+
+def test_metros():
+    assert metros('120m²') == 120.0
+    assert metros(' 90,5 m2') == 90.5
+    assert metros(None) == metros('') == metros('grande') == 0.0
+
+
+def test_counters_match_repository_after_set_estados(residencial, repository):
+    counters = build_counters(residencial.houses)
+    assert dict(counters.summary().por_estado) == repository.count_by_estado()
+
+    revision = counters.revision
+    changes = repository.set_estados(CHANGES)
+    for key, condominio, anterior, estado in changes:
+        assert counters.set_estado(key, estado) == anterior
+    assert counters.revision == revision + len(changes)
+
+    assert dict(counters.summary().por_estado) == repository.count_by_estado()
+    for condominio in residencial.condominios:
+        summary = counters.summary(condominio)
+        assert dict(summary.por_estado) == repository.count_by_estado(condominio)
+        assert (dict(summary.por_estado), dict(summary.metros_por_estado)) == \
+            expected_summary(repository, condominio)
+        assert summary.casas == residencial.condominios[condominio].casas
+    total = counters.summary()
+    assert total.casas == len(residencial.houses)
+    assert total.metros == sum(metros(house.tamano) for house in residencial.houses.values())
+
+
+def test_counters_follow_live_map_deltas(residencial, repository):
+    # El mismo camino que las sesiones: deltas del canal aplicados por LiveMap
+    feed = ChangeFeed()
+    try:
+        table = compile_layout(residencial.condominios, residencial.layout, residencial.bounds)
+        live = LiveMap('r', table, build_counters(residencial.houses), feed)
+        live.apply(feed.publish('r', repository.set_estados(CHANGES)))
+        assert dict(live.counters.summary().por_estado) == repository.count_by_estado()
+        estados = house_estados(table, live.counters)
+        keys = house_keys(table, residencial.houses)
+        assert {keys[table.ids[i]]: estado for i, estado in enumerate(estados)} == \
+            {key: house.estado for key, house in repository.find(limit=None)}
+    finally:
+        feed.close()
+
+
+def test_unknown_and_unchanged(residencial):
+    counters = build_counters(residencial.houses)
+    revision = counters.revision
+    assert counters.set_estado('E9-01', 'Ocupada') is None
+    estado = counters.estado('E1-01')
+    assert counters.set_estado('E1-01', estado) == estado
+    assert counters.revision == revision
+
+
+def test_update_adds_replaces_and_removes(residencial):
+    counters = build_counters(residencial.houses)
+    house = residencial.houses['E1-01']
+    before = counters.summary('eucalipto_1')
+
+    counters.update('E1-01', dataclasses.replace(house, tamano='200m²', estado='Reservada'))
+    after = counters.summary('eucalipto_1')
+    assert after.casas == before.casas
+    assert after.metros == before.metros - metros(house.tamano) + 200
+
+    counters.update('E1-01', None)
+    assert counters.summary('eucalipto_1').casas == before.casas - 1
+    assert counters.estado('E1-01') is None and len(counters) == len(residencial.houses) - 1
+    counters.update('E1-01', house)
+    assert counters.summary('eucalipto_1') == before
@@ -0,0 +1,100 @@
+import pytest
+
+from map_repository import HouseRepository
+from map_schema import validate_residencial
+
+
+@pytest.fixture
+def repository(tmp_path):
+    repository = HouseRepository(str(tmp_path / 'houses.db'))
+    yield repository
+    repository.close()
+
+
+def edit(data, version, changes):
+    """Residencial con los cambios {clave: {campo: valor}} aplicados al JSON; None quita la casa"""
+    for key, fields in changes.items():
+        if fields is None:
+            del data['houses'][key]
+        else:
+            data['houses'][key].update(fields)
+    return validate_residencial(data, version)
+
+
+def test_first_import(populated, repository):
+    residencial = validate_residencial(populated, 'v1')
+    assert repository.import_residencial(residencial) == (len(residencial.houses), 0)
+    for key, house in residencial.houses.items():
+        assert repository.get(key) == house
+    assert repository.get('E9-01') is None
+    estados = {}
+    for house in residencial.houses.values():
+        estados[house.estado] = estados.get(house.estado, 0) + 1
+    assert repository.count_by_estado() == estados
+
+
+def test_unchanged_rows_are_not_written(populated, repository):
+    repository.import_residencial(validate_residencial(populated, 'v1'))
+    assert repository.import_residencial(validate_residencial(populated, 'v2')) == (0, 0)
+
+
+def test_sync_imports_only_new_versions(populated, repository):
+    repository.sync_with(validate_residencial(populated, 'v1'))
+    repository.sync_with(edit(populated, 'v1', {'E1-02': {'propietario': 'Nuevo'}}))
+    assert repository.get('E1-02').propietario == 'Por asignar'
+    repository.sync_with(validate_residencial(populated, 'v2'))
+    assert repository.get('E1-02').propietario == 'Nuevo'
+
+
+def test_panel_estado_survives_reimport(populated, repository):
+    repository.import_residencial(validate_residencial(populated, 'v1'))
+    repository.set_estados([('E1-01', 'Reservada'), ('E1-03', 'Reservada')])
+    # E1-01 no cambia en el JSON; en E1-03 cambia otro campo, no el estado
+    written, deleted = repository.import_residencial(edit(populated, 'v2', {'E1-03': {'tamano': '200m²'}}))
+    assert (written, deleted) == (1, 0)
+    assert repository.get('E1-01').estado == 'Reservada'
+    assert repository.get('E1-03').estado == 'Reservada'
+    assert repository.get('E1-03').tamano == '200m²'
+
+
+def test_json_estado_change_wins(populated, repository):
+    repository.import_residencial(validate_residencial(populated, 'v1'))
+    repository.set_estados([('E1-01', 'Reservada')])
+    repository.import_residencial(edit(populated, 'v2', {'E1-01': {'estado': 'Disponible'}}))
+    assert repository.get('E1-01').estado == 'Disponible'
+
+
+def test_removed_houses_are_deleted(populated, repository):
+    repository.import_residencial(validate_residencial(populated, 'v1'))
+    written, deleted = repository.import_residencial(edit(populated, 'v2', {'E1-01': None, 'E2-05': None}))
+    assert (written, deleted) == (0, 2)
+    assert repository.get('E1-01') is None and repository.get('E2-05') is None
+    assert repository.get('E1-02') is not None
+
+
+def test_set_estados_returns_real_changes(populated, repository):
+    repository.import_residencial(validate_residencial(populated, 'v1'))
+    before = repository.get('E1-01').estado
+    other = next(estado for estado in ('Disponible', 'Ocupada') if estado != before)
+    applied = repository.set_estados([('E1-01', before), ('E1-01', other), ('E1-01', 'Reservada'),
+                                      ('E9-99', 'Ocupada')])
+    assert applied == [('E1-01', 'eucalipto_1', before, other), ('E1-01', 'eucalipto_1', other, 'Reservada')]
+    assert repository.get('E1-01').estado == 'Reservada'
+    assert repository.set_estados([('E1-01', 'Reservada')]) == []
+
+
+def test_find_and_distinct(populated, repository):
+    residencial = validate_residencial(populated, 'v1')
+    repository.import_residencial(residencial)
+    found = repository.find(condominio='eucalipto_2', estado='Ocupada')
+    assert [key for key, house in found] == sorted(
+        key for key, house in residencial.houses.items()
+        if house.condominio == 'eucalipto_2' and house.estado == 'Ocupada')
+    assert found and all(house.estado == 'Ocupada' for key, house in found)
+    # propietario es un prefijo sin distinguir mayúsculas; los comodines de LIKE son literales
+    assert {house.propietario for key, house in repository.find(propietario='familia g')} == {'Familia Gómez'}
+    assert repository.find(propietario='%') == []
+    assert len(repository.find(limit=5)) == 5
+    assert repository.distinct('tamano') == ['120m²', '90m²']
+    with pytest.raises(ValueError):
+        repository.distinct('direccion')
@@ -0,0 +1,130 @@
+import json
+
+import pytest
+
+from map_schema import SchemaError, fix_file, validate_residencial
+
+
+def problems_of(data):
+    with pytest.raises(SchemaError) as error:
+        validate_residencial(data)
+    return error.value.problems
+
+
+def test_valid_data_passes(data):
+    residencial = validate_residencial(data, 'v1')
+    assert residencial.version == 'v1'
+    assert set(residencial.houses) == set(data['houses'])
+    assert set(residencial.condominios) == set(data['condominios'])
+
+
+def test_empty_unknown_section_is_dropped(data):
+    data['extra'] = {}
+    validate_residencial(data)
+
+
+def test_unknown_section_with_content_fails(data):
+    data['extra'] = {'a': 1}
+    assert problems_of(data) == ["extra: sección desconocida"]
+
+
+def test_inverted_rect(data):
+    condo_id = next(iter(data['condominios']))
+    x0, y0, x1, y1 = data['condominios'][condo_id]['coords']
+    data['condominios'][condo_id]['coords'] = [x1, y0, x0, y1]
+    assert f"condominios.{condo_id}.coords: se esperaba x0 < x1 e y0 < y1" in problems_of(data)
+
+
+def test_house_fields(data):
+    house_id, house = next(iter(data['houses'].items()))
+    house['estado'] = 'Vendida'
+    del house['direccion']
+    problems = problems_of(data)
+    assert f"houses.{house_id}.estado: se esperaba Disponible o Ocupada o Reservada" in problems
+    assert f"houses.{house_id}.direccion: falta" in problems
+
+
+def test_house_id_must_match_key(data):
+    house_id, house = next(iter(data['houses'].items()))
+    house['id'] = house_id + 'X'
+    assert problems_of(data) == [f"houses.{house_id}.id: no coincide con la clave"]
+
+
+def test_house_number_outside_condominio(data):
+    house_id, house = next(iter(data['houses'].items()))
+    casas = data['condominios'][house['condominio']]['casas']
+    renamed = f"{house_id.rpartition('-')[0]}-{casas + 1:02d}"
+    data['houses'] = {renamed: dict(house, id=renamed)}
+    assert problems_of(data) == [f"houses.{renamed}: el condominio no tiene una casa número {casas + 1}"]
+
+
+def test_duplicate_house_number(data):
+    house_id, house = next(iter(data['houses'].items()))
+    prefix, _, number = house_id.rpartition('-')
+    duplicate = f"{prefix}-{int(number)}"
+    data['houses'][duplicate] = dict(house, id=duplicate)
+    assert problems_of(data) == [f"houses.{duplicate}: es la misma casa que houses.{house_id}"]
+
+
+def test_unknown_condominio(data):
+    house_id, house = next(iter(data['houses'].items()))
+    house['condominio'] = 'no_existe'
+    assert problems_of(data) == [f"houses.{house_id}.condominio: no existe 'no_existe'"]
+
+
+def test_empty_lines(data):
+    condo_id, condo = next((k, c) for k, c in data['condominios'].items() if c['orientacion'] == 'Horizontal')
+    condo['filas'] = condo['casas'] + 1
+    assert f"condominios.{condo_id}: {condo['casas'] + 1} líneas para {condo['casas']} casas dejan líneas vacías" \
+        in problems_of(data)
+
+
+def test_overlapping_condominios(data):
+    first, second = list(data['condominios'])[:2]
+    data['condominios'][second]['coords'] = list(data['condominios'][first]['coords'])
+    assert f"condominios.{second}: se superpone con condominios.{first}" in problems_of(data)
+
+
+def test_overlapping_layout_override(data):
+    condo_id, condo = next(iter(data['condominios'].items()))
+    data['layout'] = {f"{condo_id}-01": list(condo['coords'])}
+    problems = problems_of(data)
+    assert problems and all(problem.startswith('houses: la casa ') for problem in problems)
+
+
+@pytest.mark.parametrize('transform, problem', [
+    ([1, 2], "transform: se esperaba un objeto"),
+    ({'scale': 'x'}, "transform.scale: se esperaban 2 números distintos de cero [sx, sy]"),
+    ({'scale': [1]}, "transform.scale: se esperaban 2 números distintos de cero [sx, sy]"),
+    ({'scale': [0, 0]}, "transform.scale: se esperaban 2 números distintos de cero [sx, sy]"),
+    ({'scale': [2, 2], 'offset': [1, 'a']}, "transform.offset: se esperaban 2 números [x, y]"),
+])
+def test_bad_transform(data, transform, problem):
+    data['transform'] = transform
+    assert problems_of(data) == [problem]
+
+
+def test_transform_is_applied(data):
+    condo_id, condo = next(iter(data['condominios'].items()))
+    data['transform'] = {'scale': [2, 2], 'offset': [10, 0]}
+    x0, y0, x1, y1 = condo['coords']
+    assert validate_residencial(data).condominios[condo_id].coords == (2 * x0 + 10, 2 * y0, 2 * x1 + 10, 2 * y1)
+
+
+def test_reports_every_problem(data):
+    for house in data['houses'].values():
+        house['estado'] = 'Vendida'
+    error = pytest.raises(SchemaError, validate_residencial, data).value
+    assert len(error.problems) == len(data['houses'])
+    assert f"{len(data['houses'])} problemas en los datos" in str(error)
+
+
+def test_fix_file_removes_empty_unknown_sections(data, tmp_path):
+    path = tmp_path / 'houses_data.json'
+    data['extra'] = {}
+    path.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding='utf-8')
+    assert fix_file(str(path)) == ['extra']
+    fixed = json.loads(path.read_text(encoding='utf-8'))
+    assert 'extra' not in fixed
+    assert fixed == {key: value for key, value in data.items() if key != 'extra'}
+    assert fix_file(str(path)) == []
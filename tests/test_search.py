@@ -0,0 +1,81 @@
+import dataclasses
+
+import pytest
+
+from map_schema import validate_residencial
+from map_search import SearchIndex, build_search_index, normalize, tokenize
+
+
+@pytest.fixture
+def residencial(populated):
+    return validate_residencial(populated, 'v1')
+
+
+@pytest.fixture
+def index(residencial):
+    return build_search_index(residencial.houses, residencial.condominios)
+
+
+def test_normalize_and_tokenize():
+    assert normalize('Familia PÉREZ') == 'familia perez'
+    assert tokenize('Cond. Eucalipto 7, Casa 01') == ['cond', 'eucalipto', '7', 'casa', '1']
+    assert tokenize('  ,. ') == []
+
+
+def test_key_prefix(index):
+    # Los números también son prefijos: 'E7-01' es 'e7 1', que abarca de la casa 10 a la 17
+    assert index.search('E7-01') == ['E7-01'] + [f"E7-{n}" for n in range(10, 18)]
+    assert sorted(index.search('e7', limit=50)) == [f"E7-{n:02d}" for n in range(1, 18)]
+
+
+def test_address_and_condominio(index):
+    assert index.search('calle ceiba', limit=3) == ['E4-01', 'E4-10', 'E4-11']
+    # Palabras en otro orden: cada una es un prefijo y las casas deben tenerlas todas
+    assert index.search('casa 12 eucalipto 6') == ['E6-12']
+    assert index.search('condominio eucalipto 5 12') == ['E5-12']
+
+
+def test_owner_without_accents(index, residencial):
+    expected = sorted(key for key, house in residencial.houses.items() if house.propietario == 'Familia Gómez')
+    assert sorted(index.search('familia gomez', limit=100)) == expected
+    assert sorted(index.search('GÓM', limit=100)) == expected
+
+
+def test_exact_words_rank_first(index):
+    # '3' coincide completo con la casa 3 y como prefijo con la 30..34
+    assert index.search('eucalipto 1 3', limit=2)[0] == 'E1-03'
+
+
+def test_limit_and_misses(index):
+    assert len(index.search('casa', limit=7)) == 7
+    assert index.search('') == []
+    assert index.search('eucalipto roble') == []
+    assert index.search('zzz casa') == []
+
+
+def test_update(index, residencial):
+    house = residencial.houses['E1-01']
+    index.update('E1-01', dataclasses.replace(house, propietario='Familia Xool'))
+    assert index.search('xool') == ['E1-01']
+    index.update('E1-01', None)
+    assert index.search('xool') == []
+    assert 'E1-01' not in index.search('e1', limit=100)
+    index.update('E1-01', house)
+    assert index.search('E1-01')[0] == 'E1-01'
+    assert len(index) == len(residencial.houses)
+
+
+def test_incremental_index_matches_bulk(index, residencial):
+    incremental = SearchIndex(residencial.condominios)
+    for key in reversed(sorted(residencial.houses)):
+        incremental.update(key, residencial.houses[key])
+    for query in ('e2', 'calle caoba', 'familia', 'canul 3', 'eucalipto 4 casa 1'):
+        assert sorted(incremental.search(query, limit=500)) == sorted(index.search(query, limit=500))
+
+
+def test_removing_unknown_keys_does_not_grow_the_index(index, residencial):
+    numbers = len(index.keys)
+    for n in range(100):
+        index.update(f"Z9-{n:02d}", None)
+    assert len(index.keys) == numbers and len(index.numbers) == numbers
+    assert len(index) == len(residencial.houses)
@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+from map_data import residencial_to_dict
+from map_schema import validate_residencial
+from map_store import json_to_store, load_store, store_to_json, write_store
+
+
+def test_json_round_trip(data, tmp_path):
+    json_path = tmp_path / 'houses_data.json'
+    json_path.write_text(json.dumps(data, ensure_ascii=False), encoding='utf-8')
+    json_to_store(str(json_path), str(tmp_path / 'houses_data.rmap'))
+    store_to_json(str(tmp_path / 'houses_data.rmap'), str(tmp_path / 'copia.json'))
+    copia = json.loads((tmp_path / 'copia.json').read_text(encoding='utf-8'))
+    assert copia == residencial_to_dict(validate_residencial(data))
+
+
+def test_models_round_trip(data, tmp_path):
+    # Valores que el JSON de ejemplo no trae: None, deuda con decimales, pagos, ajustes y lienzo
+    house_id, house = next(iter(data['houses'].items()))
+    house['propietario'] = None
+    house['deuda_actual'] = 1250.5
+    house['historial_pagos'] = [{'fecha': '2026-01-05', 'monto': 3000, 'nota': 'Año nuevo'}]
+    x0, y0 = data['condominios'][house['condominio']]['coords'][:2]
+    data['layout'] = {f"{house['condominio']}-01": [x0, y0, x0 + 5, y0 + 5]}
+    data['bounds'] = [3000, 1800]
+    residencial = validate_residencial(data, 'v1')
+    write_store(residencial, str(tmp_path / 'r.rmap'))
+
+    loaded = load_store(str(tmp_path / 'r.rmap'))
+    assert loaded.version == 'v1'
+    assert loaded.bounds == (3000, 1800)
+    assert dict(loaded.condominios) == dict(residencial.condominios)
+    assert dict(loaded.areas) == dict(residencial.areas)
+    assert dict(loaded.calles) == dict(residencial.calles)
+    assert dict(loaded.layout) == dict(residencial.layout)
+    assert list(loaded.houses) == sorted(residencial.houses)
+    assert {key: loaded.houses[key] for key in loaded.houses} == dict(residencial.houses)
+    assert loaded.houses[house_id].propietario is None
+    assert loaded.houses[house_id].deuda_actual == 1250.5
+
+
+def test_house_lookup(data, tmp_path):
+    residencial = validate_residencial(data)
+    write_store(residencial, str(tmp_path / 'r.rmap'))
+    houses = load_store(str(tmp_path / 'r.rmap')).houses
+    key = sorted(residencial.houses)[-1]
+    assert len(houses) == len(residencial.houses)
+    assert key in houses and 'Z9-99' not in houses and 1 not in houses
+    assert houses.get(key) == residencial.houses[key]
+    with pytest.raises(KeyError):
+        houses['Z9-99']
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / 'r.rmap'
+    path.write_bytes(b'PK\x03\x04' + b'\0' * 60)
+    with pytest.raises(ValueError):
+        load_store(str(path))
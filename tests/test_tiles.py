@@ -0,0 +1,103 @@
+import os
+
+import pytest
+from PIL import Image
+
+from map_layout import compile_layout
+from map_live import PATCH_MARGIN
+from map_schema import validate_residencial
+from map_tiles import TilePyramid
+
+TILE_SIZE = 128
+ZOOMS = (1, 2, 3)
+
+
+@pytest.fixture
+def table(populated):
+    residencial = validate_residencial(populated, 'v1')
+    return compile_layout(residencial.condominios, residencial.layout, residencial.bounds)
+
+
+def blank(width, height, colors, clip):
+    return Image.new('RGB', (clip[2] - clip[0], clip[3] - clip[1]), 'white')
+
+
+def pyramid_for(table, directory, version='v1', render=blank):
+    return TilePyramid('r', version, table, render, ['#FFFFFF'] * len(table), str(directory), TILE_SIZE)
+
+
+def all_tiles(pyramid, zoom):
+    cols, rows = pyramid.tile_count(zoom)
+    return [(x, y) for y in range(rows) for x in range(cols)]
+
+
+def overlapping(rects, box):
+    # Casas cuyo rectángulo (bordes incluidos) se cruza con la caja semiabierta, una por una
+    left, top, right, bottom = box
+    return [i for i, (x0, y0, x1, y1) in enumerate(rects.tolist())
+            if x0 < right and x1 >= left and y0 < bottom and y1 >= top]
+
+
+def test_members_match_brute_force(table, tmp_path):
+    pyramid = pyramid_for(table, tmp_path)
+    for zoom in ZOOMS:
+        rects = pyramid._house_rects(zoom)
+        width, height = pyramid.level_size(zoom)
+        for x, y in all_tiles(pyramid, zoom):
+            left, top, right, bottom = pyramid.tile_box(zoom, x, y)
+            window = (max(left - PATCH_MARGIN, 0), max(top - PATCH_MARGIN, 0),
+                      min(right + PATCH_MARGIN, width), min(bottom + PATCH_MARGIN, height))
+            assert pyramid.members(zoom, x, y).tolist() == overlapping(rects, window)
+
+
+@pytest.mark.parametrize('house', ['eucalipto_1-01', 'eucalipto_4-12', 'eucalipto_3_nuevo-19', 'eucalipto_7-09'])
+def test_invalidate_removes_exactly_the_tiles_of_the_house(table, tmp_path, house):
+    pyramid = pyramid_for(table, tmp_path)
+    paths = {(zoom, x, y): pyramid.tile(zoom, x, y) for zoom in ZOOMS for x, y in all_tiles(pyramid, zoom)}
+    index = table.positions[house]
+
+    # La ventana de la tesela es su caja más el margen: la toca la casa si la casa más el margen toca la caja
+    expected = set()
+    for zoom in ZOOMS:
+        x0, y0, x1, y1 = pyramid._house_rects(zoom)[index].tolist()
+        box = (x0 - PATCH_MARGIN, y0 - PATCH_MARGIN, x1 + PATCH_MARGIN, y1 + PATCH_MARGIN)
+        for x, y in all_tiles(pyramid, zoom):
+            left, top, right, bottom = pyramid.tile_box(zoom, x, y)
+            if box[0] < right and box[2] >= left and box[1] < bottom and box[3] >= top:
+                expected.add((zoom, x, y))
+    assert expected == {key for key in paths if index in pyramid.members(*key)}
+
+    assert pyramid.invalidate(index) == len(expected)
+    for key, path in paths.items():
+        assert os.path.exists(os.path.join(str(tmp_path), path)) == (key not in expected)
+        assert (key in pyramid._tiles) == (key not in expected)
+
+
+def test_changed_color_gives_a_new_tile(table, tmp_path):
+    pyramid = pyramid_for(table, tmp_path)
+    index = table.positions['eucalipto_2-05']
+    zoom = 2
+    key = next(key for key in all_tiles(pyramid, zoom) if index in pyramid.members(zoom, *key))
+    other = next(key for key in all_tiles(pyramid, zoom) if index not in pyramid.members(zoom, *key))
+    before, unchanged = pyramid.tile(zoom, *key), pyramid.tile(zoom, *other)
+
+    pyramid.colors[index] = '#FF0000'
+    pyramid.invalidate(index)
+    after = pyramid.tile(zoom, *key)
+    assert after != before and pyramid.tile(zoom, *other) == unchanged
+    # Con los colores de antes vuelve el mismo nombre: lo que está en disco se reutiliza
+    pyramid.colors[index] = '#FFFFFF'
+    pyramid.invalidate(index)
+    assert pyramid.tile(zoom, *key) == before
+
+
+def test_tiles_of_other_versions_are_pruned(table, tmp_path):
+    old = pyramid_for(table, tmp_path, 'v1')
+    old_path = old.tile(1, 0, 0)
+    new = pyramid_for(table, tmp_path, 'v2')
+    assert not os.path.exists(os.path.join(str(tmp_path), old_path))
+    new_path = new.tile(1, 0, 0)
+    assert os.listdir(os.path.join(str(tmp_path), 'r')) == [new.version_dir]
+    pyramid_for(table, tmp_path, 'v2')
+    assert os.path.exists(os.path.join(str(tmp_path), new_path))
+
@@ -0,0 +1,94 @@
+import json
+import os
+
+import pytest
+
+import map_transform
+from map_schema import validate_residencial
+from map_transform import Transform, compose, transform_file
+
+CROP = (0, 440, 800, 900)
+
+
+@pytest.fixture
+def path(populated, tmp_path):
+    path = tmp_path / 'houses_data.json'
+    path.write_text(json.dumps(populated, indent=2, ensure_ascii=False), encoding='utf-8')
+    return path
+
+
+def read(path):
+    return json.loads(path.read_text(encoding='utf-8'))
+
+
+def test_compose_accumulates_scale():
+    transform, bounds = compose(Transform(), (1500, 900), [('scale', [1.12]), ('scale', [1.12])])
+    assert transform.scale == pytest.approx((1.2544, 1.2544))
+    assert transform.offset == (0, 0) and bounds == (1500, 900)
+    transform, bounds = compose(transform, bounds, [('translate', [10, -5]), ('crop', [100, 50, 700, 450])])
+    assert transform.scale == pytest.approx((1.2544, 1.2544))
+    assert transform.offset == pytest.approx((-90, -55))
+    assert bounds == (600, 400)
+
+
+def test_runs_compose_in_the_file(path, populated):
+    transform_file(str(path), [('scale', [1.12])])
+    transform_file(str(path), [('scale', [1.12])])
+    data = read(path)
+    assert data['transform']['scale'] == pytest.approx([1.2544, 1.2544])
+    # Sin hornear, las coordenadas del archivo no cambian y se aplican al cargar
+    assert data['condominios'] == populated['condominios']
+    x0, y0, x1, y1 = populated['condominios']['eucalipto_2']['coords']
+    coords = validate_residencial(data).condominios['eucalipto_2'].coords
+    assert coords == pytest.approx((x0 * 1.2544, y0 * 1.2544, x1 * 1.2544, y1 * 1.2544))
+
+
+def test_crop_and_bake(path, populated):
+    transform_file(str(path), [('crop', list(CROP))], bake=True)
+    data = read(path)
+    left, top, right, bottom = CROP
+    width, height = right - left, bottom - top
+    assert 'transform' not in data and data['bounds'] == [width, height]
+
+    # Se quitan los condominios que quedan fuera de la ventana, con sus casas; los que la tocan quedan completos
+    inside = {key for key, condo in populated['condominios'].items()
+              if condo['coords'][0] < right and condo['coords'][2] > left
+              and condo['coords'][1] < bottom and condo['coords'][3] > top}
+    assert set(data['condominios']) == inside == {'eucalipto_2', 'eucalipto_7'}
+    for key in inside:
+        x0, y0, x1, y1 = populated['condominios'][key]['coords']
+        assert data['condominios'][key]['coords'] == [x0 - left, y0 - top, x1 - left, y1 - top]
+    assert set(data['houses']) == {key for key, house in populated['houses'].items()
+                                   if house['condominio'] in inside}
+
+    # Áreas y calles que cruzan el borde se recortan a él
+    assert data['areas'] == {'area_parque_central': {**populated['areas']['area_parque_central'],
+                                                     'coords': [273, 25, 800, 166]}}
+    assert data['calles']['calle_caoba']['start'] == [273, 7] and data['calles']['calle_caoba']['end'] == [800, 7]
+    assert data['calles']['calle_chaca']['start'] == [257, 0]
+    assert 'calle_zapote' not in data['calles'] and 'calle_cacao' not in data['calles']
+    for calle in data['calles'].values():
+        assert all(0 <= x <= width and 0 <= y <= height for x, y in (calle['start'], calle['end']))
+    validate_residencial(data)
+
+
+def test_crop_without_bake_keeps_everything(path, populated):
+    transform_file(str(path), [('crop', list(CROP))])
+    data = read(path)
+    assert data['transform'] == {'scale': [1, 1], 'offset': [0, -440]}
+    assert data['condominios'] == populated['condominios'] and data['houses'] == populated['houses']
+
+
+@pytest.mark.parametrize('failing', ['replace', 'fsync'])
+def test_failed_write_leaves_original(path, monkeypatch, failing):
+    original = path.read_bytes()
+
+    def fail(*args):
+        raise OSError('disco lleno')
+
+    monkeypatch.setattr(map_transform.os, failing, fail)
+    with pytest.raises(OSError, match='disco lleno'):
+        transform_file(str(path), [('crop', list(CROP))], bake=True)
+    monkeypatch.undo()
+    assert path.read_bytes() == original
+    assert os.listdir(path.parent) == [path.name]
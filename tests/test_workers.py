@@ -0,0 +1,81 @@
+import threading
+import time
+
+import pytest
+
+from map_workers import RenderService
+
+
+def slow_square(value, delay=0.5):
+    time.sleep(delay)
+    return value * value
+
+
+def failing(message):
+    raise ValueError(message)
+
+
+@pytest.fixture
+def service():
+    service = RenderService(workers=2)
+    yield service
+    service.shutdown()
+
+
+def test_concurrent_identical_submits_share_one_future(service):
+    finished = []
+    futures = [None] * 8
+    barrier = threading.Barrier(len(futures))
+
+    def publish(result):
+        finished.append(result)
+        return result
+
+    def submit(i):
+        barrier.wait()
+        futures[i] = service.submit(('mapa', 3), slow_square, 3, then=publish)
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(len(futures))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(future is futures[0] for future in futures)
+    assert futures[0].result(timeout=60) == 9
+    # Se calculó y se publicó una sola vez
+    assert finished == [9]
+    assert service.pending == 0
+    # Ya terminada, la clave devuelve el mismo futuro sin enviar nada
+    assert service.submit(('mapa', 3), slow_square, 3) is futures[0]
+    assert service.get(('mapa', 3)) is futures[0]
+
+
+def test_different_keys_get_different_futures(service):
+    first = service.submit(('mapa', 2), slow_square, 2)
+    second = service.submit(('mapa', 4), slow_square, 4)
+    assert first is not second
+    assert (first.result(timeout=60), second.result(timeout=60)) == (4, 16)
+
+
+def test_worker_error_reaches_caller_and_is_not_kept(service):
+    future = service.submit('falla', failing, 'sin datos')
+    with pytest.raises(ValueError, match='sin datos'):
+        future.result(timeout=60)
+    assert service.get('falla') is None
+    # El siguiente pedido lo vuelve a intentar
+    retry = service.submit('falla', slow_square, 5, 0)
+    assert retry is not future and retry.result(timeout=60) == 25
+
+
+def test_then_error_reaches_caller(service):
+    future = service.submit('publicar', slow_square, 2, 0, then=lambda result: failing('disco lleno'))
+    with pytest.raises(ValueError, match='disco lleno'):
+        future.result(timeout=60)
+
+
+def test_discard_forgets_finished_result(service):
+    future = service.submit('mapa', slow_square, 6, 0)
+    assert future.result(timeout=60) == 36
+    service.discard('mapa')
+    assert service.get('mapa') is None
+    assert service.submit('mapa', slow_square, 6, 0) is not future